@@ -1,10 +1,52 @@
 const { app, BrowserWindow, ipcMain, Menu, Tray, screen } = require('electron');
-const { execFile } = require('child_process');
+const { spawn } = require('child_process');
 const path = require('path');
 
 let mainWindow;
 let tray = null;
 let pythonChild = null;
+let currentTool = null;
+
+// Python 引擎的二進位訊息協定 (見 python/ipc_channel.py)
+// 標頭: magic "GC" (2 bytes) | version (uint8) | type (uint8) | length (uint32 LE)
+const IPC_MAGIC = 'GC';
+const IPC_VERSION = 1;
+const IPC_HEADER_SIZE = 8;
+const MSG_HELLO = 1, MSG_TOOL = 2, MSG_PEN = 3, MSG_CURSOR = 4, MSG_TIMING = 5, MSG_BYE = 6;
+const TOOL_IDS = { 0: 'pen-tool', 1: 'eraser-tool' };
+
+// 將讀取到的區塊累積起來, 依照標頭的長度切出完整的訊息 (一個區塊可能包含多則或不完整的訊息)
+function createIpcDecoder(onMessage) {
+  let buffer = Buffer.alloc(0);
+  return (chunk) => {
+    buffer = buffer.length ? Buffer.concat([buffer, chunk]) : chunk;
+    while (buffer.length >= IPC_HEADER_SIZE) {
+      if (buffer.toString('latin1', 0, 2) !== IPC_MAGIC || buffer.readUInt8(2) !== IPC_VERSION) {
+        console.error('Invalid IPC frame from Python, dropping buffer');
+        buffer = Buffer.alloc(0);
+        return;
+      }
+      const length = buffer.readUInt32LE(4);
+      if (buffer.length < IPC_HEADER_SIZE + length) {
+        break;
+      }
+      onMessage(buffer.readUInt8(3), buffer.subarray(IPC_HEADER_SIZE, IPC_HEADER_SIZE + length));
+      buffer = buffer.subarray(IPC_HEADER_SIZE + length);
+    }
+  };
+}
+
+// 切換工具, 只有工具改變時才呼叫 executeJavaScript
+function applyTool(webContents, tool) {
+  const toolId = TOOL_IDS[tool];
+  if (toolId === undefined || toolId === currentTool) {
+    return;
+  }
+  currentTool = toolId;
+  if (mainWindow.isVisible()) {
+    webContents.executeJavaScript(`setActiveTool('${toolId}')`);
+  }
+}
 
 app.whenReady().then(() => {
   const { width, height } = screen.getPrimaryDisplay().bounds;
@@ -29,18 +71,36 @@ app.whenReady().then(() => {
   const pythonPath = path.join(__dirname, 'python', 'KMeans_LiveTest.py');
   console.log('執行 Python 檔案:', pythonPath);
 
-  pythonChild = execFile('python', ['-u', pythonPath]);
-
-  // 處理 Python 的輸出
-  pythonChild.stdout.on('data', (data) => {
-    console.log('Python output:', data);
-    if (mainWindow.isVisible()) {
-      if (data.trim() === '1') {
-        webContents.executeJavaScript("setActiveTool('eraser-tool')");
-      } else if (data.trim() === '0') {
-        webContents.executeJavaScript("setActiveTool('pen-tool')");
-      }
+  pythonChild = spawn('python', ['-u', pythonPath], { stdio: ['ignore', 'pipe', 'pipe'] });
+
+  // 處理 Python 的二進位訊息: 只有工具切換需要通知畫面, 其他訊息只做記錄
+  pythonChild.stdout.on('data', createIpcDecoder((type, payload) => {
+    switch (type) {
+      case MSG_TOOL:
+        applyTool(webContents, payload.readUInt8(0));
+        break;
+      case MSG_HELLO:
+        console.log(`Python engine connected: screen ${payload.readUInt16LE(0)}x${payload.readUInt16LE(2)}`);
+        break;
+      case MSG_TIMING:
+        console.log(`Python timing: frame ${payload.readUInt32LE(0)}, ` +
+                    `latency ${payload.readFloatLE(4).toFixed(1)} ms, ${payload.readFloatLE(8).toFixed(1)} fps`);
+        break;
+      case MSG_BYE:
+        console.log('Python engine closed the channel');
+        break;
+      case MSG_PEN:
+      case MSG_CURSOR:
+        // 畫筆狀態與游標位置目前由系統滑鼠事件處理
+        break;
+      default:
+        console.error('Unknown IPC message type:', type);
     }
+  }));
+
+  // Python 的文字輸出 (記錄與錯誤訊息) 都在 stderr
+  pythonChild.stderr.on('data', (data) => {
+    process.stderr.write(data);
   });
 
   mainWindow.loadFile('index.html');
@@ -64,6 +124,10 @@ app.whenReady().then(() => {
   // 視窗顯示時重新啟用 Python 輸入
   mainWindow.on('show', () => {
     console.log('視窗已顯示：準備接收 Python 輸入');
+    // Python 只在工具改變時送出訊息, 重新顯示時套用最後一次的工具
+    if (currentTool !== null) {
+      webContents.executeJavaScript(`setActiveTool('${currentTool}')`);
+    }
   });
 
   // 創建工作列圖示
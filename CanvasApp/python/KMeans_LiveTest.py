@@ -1,53 +1,240 @@
+import os
+import sys
+import time
+
+# 記錄啟動時間, 用來報告匯入模組與載入模型所花費的時間
+_start_time = time.perf_counter()
+
 import cv2
-import pyautogui
+import numpy as np
 
 from Models import _LoadSave as LoadSave
+from Models import _FusedInference as FusedInference
+from Models._PredictionGate import PredictionGate
 from LiveTest_DataProcessing import LiveTest_DataProcessing as DataProcessing
-from mouse_control import MouseController
+from ModelTraining.Data.HandTracker import ControlBinding
+from mouse_control import MouseController, MouseActuator
+from ipc_channel import IpcPublisher
+from ModelTraining.Data.Pipeline import Pipeline, Packet
+from ModelTraining.Data.StageTimer import StageTimer
+
+_import_time = time.perf_counter()
 
 class GestureCanvas_KMeans:
-    def __init__(self):
-        self.model = LoadSave.load_model("KMeans_2")
-        self.scaler = LoadSave.load_scaler("KMeans_2")
-        self.DataProcessing = DataProcessing()
+    def __init__(self, source= None, headless= False):
+        """
+        Args:
+            source (str | FrameSource, optional): 畫面來源, None 則使用攝影機, 例如 "video:session.mp4", "synthetic"
+            headless (bool): 是否不顯示畫面視窗 (沒有顯示器的環境), 預設為 False
+        """
+        # stdout 只輸出給 Electron 的二進位訊息 (工具切換、畫筆狀態、批次游標位置、計時資訊),
+        # 其他文字輸出 (包含載入模型等函式庫的輸出) 都導向 stderr
+        self.ipc = IpcPublisher.claim_stdout()
+
+        # 載入模型組合包 (模型、標準化器與類別標籤), 並編譯成融合預測器
+        self.bundle = LoadSave.load_bundle("KMeans_2")
+        self.model = self.bundle["model"]
+        self.scaler = self.bundle["scaler"]
+        self.predictor = FusedInference.compile_model(self.model, self.scaler)
+
+        # 手勢沒有明顯改變時沿用上一次的預測結果, 快取標籤最多保留 0.2 秒
+        self.gate = PredictionGate(self.predictor, threshold= 0.05, max_age= 0.2)
+        self._artifact_time = time.perf_counter()
+
+        # 設定環境變數 GESTURE_ROI=1 則只在上一幀手部附近的區域偵測,
+        # GESTURE_RENDER 設定除錯畫面的繪製模式 (off, overlay, side_by_side), GESTURE_RENDER_EVERY 設定每 N 幀繪製一次
+        # GESTURE_HANDS 設定最大偵測手部數量 (預設為 1), 大於 1 時所有手以一次批次預測分類,
+        # 並由 GESTURE_CONTROL_HAND 選擇控制游標與工具的手 (first, left, right 或追蹤編號, 預設為 first)
+        # GESTURE_REALTIME=1 則影片、圖片與合成來源依照 FPS 輸出 (也可以在來源描述字串結尾加上 ?realtime)
+        self.max_num_hands = int(os.environ.get("GESTURE_HANDS", "1"))
+        self.binding = ControlBinding(os.environ.get("GESTURE_CONTROL_HAND", "first"))
+        self.DataProcessing = DataProcessing(source= source, roi_tracking= os.environ.get("GESTURE_ROI") == "1",
+                                             render_mode= os.environ.get("GESTURE_RENDER", "overlay"),
+                                             render_every= int(os.environ.get("GESTURE_RENDER_EVERY", "1")),
+                                             max_num_hands= self.max_num_hands,
+                                             realtime= os.environ.get("GESTURE_REALTIME") == "1")
+        self.headless = headless
+
+        # 滑鼠指令由獨立的執行緒送出, 設定環境變數 GESTURE_MOUSE_INTERPOLATE=1 以螢幕更新率插值
+        self.mouse = MouseActuator(MouseController(),
+                                   interpolate= os.environ.get("GESTURE_MOUSE_INTERPOLATE") == "1")
 
-        self.mouse = MouseController()
+        # 定期輸出管線各階段的佇列長度、使用率與延遲, 以及每個階段內部的計時 (擷取、resize / cvtColor、MediaPipe、
+        # 正規化、預測、滑鼠、imshow / waitKey), 設定環境變數 GESTURE_PROFILE=1 或在視窗中按 p 切換
+        # 管線的每個執行緒同時處理不同的畫面, 因此每個執行緒使用自己的計時器, 偵測階段與 DataProcessing 共用
+        self.profile = os.environ.get("GESTURE_PROFILE") == "1"
+        self.timers = {
+            "capture": StageTimer(["capture"], enabled= self.profile, name= "capture"),
+            "detect": StageTimer(["prepare", "mediapipe", "normalize"], enabled= self.profile, name= "detect"),
+            "classify": StageTimer(["predict"], enabled= self.profile, name= "classify"),
+            "actuate": StageTimer(["mouse"], enabled= self.profile, name= "actuate"),
+            "display": StageTimer(["display"], enabled= self.profile, name= "display"),
+        }
+        self.DataProcessing.timer = self.timers["detect"]
+
+        self.ipc.hello(self.mouse.screen_width, self.mouse.screen_height)
+
+        self._init_time = time.perf_counter()
+        self._first_prediction = True
+        self._last_timestamp = 0.0
+        self._fps = 0.0
+
+    def startupReport(self) -> None:
+        """
+        顯示啟動時間報告 (匯入模組、載入模型、初始化攝影機與 MediaPipe、第一次預測)
+        輸出到 stderr, 避免與 stdout 上的手勢結果混在一起
+        """
+        now = time.perf_counter()
+        print(f"Startup: imports {_import_time - _start_time:.3f}s, "
+              f"artifacts {self._artifact_time - _import_time:.3f}s "
+              f"(bundle load {LoadSave.load_timings.get('KMeans_2', 0.0):.3f}s), "
+              f"camera/mediapipe {self._init_time - self._artifact_time:.3f}s, "
+              f"first prediction at {now - _start_time:.3f}s", file=sys.stderr)
 
     def __del__(self):
+        self.ipc.close()
+        self.mouse.close()
         cv2.destroyAllWindows()
 
-    def startCanvas(self):
-        print("Start Canvas")
+    def capture(self):
+        """畫面來源: 讀取下一個畫面"""
+        timer = self.timers["capture"]
+        timer.begin_frame()
+        captured = self.DataProcessing.source.read()
+        timer.mark("capture")
+        timer.end_frame()
+        return captured
 
-        while True:
-            frame, coords, Finger_pos = self.DataProcessing.getCoordData(draw=True)
-            if frame is not None:
-                cv2.imshow("Hand Recognition", frame)
-                
-            if cv2.waitKey(10) == ord('q'):
-                break
+    def detect(self, packet: Packet) -> tuple:
+        """偵測階段: 前處理、MediaPipe 偵測與正規化 (由 DataProcessing 標記各階段), 多手模式回傳 (frame, hands)"""
+        timer = self.timers["detect"]
+        timer.begin_frame()
+        try:
+            if self.max_num_hands > 1:
+                return self.DataProcessing.processFrameHands(packet.value, draw= not self.headless)
+            return self.DataProcessing.processFrame(packet.value, draw= not self.headless)
+        finally:
+            timer.end_frame()
 
+    def classify(self, packet: Packet) -> tuple:
+        """分類階段: 使用融合預測器進行預測, 手勢沒有改變時回傳快取的標籤"""
+        timer = self.timers["classify"]
+        timer.begin_frame()
+        try:
+            if self.max_num_hands > 1:
+                return self.classifyHands(packet)
+
+            frame, coords, Finger_pos = packet.value
             if coords is None:
-                pyautogui.mouseUp()
-                continue
-            else:
-                pyautogui.mouseDown(button="left")
-                pass
-
-            try:
-                coords = self.scaler.transform([coords])
-
-                prediction = self.model.predict(coords)
-                print(*prediction)
-
-                screen_x = int(Finger_pos[0] * self.mouse.screen_width)
-                screen_y = int(Finger_pos[1] * self.mouse.screen_height)
-                self.mouse.move_to(screen_x, screen_y, duration=0)
-            except Exception as e:
-                print(f"Error: {e}")
-                self.mouse.release()
-                continue
+                self.gate.reset()
+                return frame, None, None
+            prediction = self.gate.predict(coords, now= packet.timestamp)
+            return frame, Finger_pos, prediction[0]
+        finally:
+            timer.mark("predict")
+            timer.end_frame()
+
+    def classifyHands(self, packet: Packet) -> tuple:
+        """多手分類階段: 所有手以一次批次預測分類, 回傳控制用的手的食指位置與標籤"""
+        frame, hands = packet.value
+        if not hands:
+            self.gate.reset()
+            return frame, None, None
+
+        labels = self.gate.predict_batch(np.stack([hand.coords for hand in hands]),
+                                         [hand.track_id for hand in hands], now= packet.timestamp)
+        index = self.binding.select(hands)
+        if index is None:
+            return frame, None, None
+        return frame, hands[index].Finger_pos, labels[index]
+
+    def actuate(self, packet: Packet) -> np.ndarray:
+        """動作階段: 更新滑鼠目標並通知 Electron, 回傳要顯示的畫面"""
+        timer = self.timers["actuate"]
+        timer.begin_frame()
+        try:
+            return self._actuate(packet)
+        finally:
+            timer.mark("mouse")
+            timer.end_frame()
+
+    def _actuate(self, packet: Packet) -> np.ndarray:
+        frame, Finger_pos, label = packet.value
+
+        # 以畫面擷取時間估計處理速度, 作為計時資訊送給 Electron
+        if packet.timestamp > self._last_timestamp > 0:
+            self._fps = 0.9 * self._fps + 0.1 / (packet.timestamp - self._last_timestamp)
+        self._last_timestamp = packet.timestamp
+
+        if label is None:
+            self.mouse.release()
+            self.ipc.set_pen(False)
+            return frame
+
+        self.mouse.press(button="left")
+        self.ipc.set_pen(True)
+
+        # 只有工具改變時才通知 Electron
+        self.ipc.set_tool(label)
+
+        if self._first_prediction:
+            self._first_prediction = False
+            self.startupReport()
+
+        screen_x = int(Finger_pos[0] * self.mouse.screen_width)
+        screen_y = int(Finger_pos[1] * self.mouse.screen_height)
+        self.mouse.move_to(screen_x, screen_y)
+        self.ipc.cursor(screen_x, screen_y)
+
+        now = time.perf_counter()
+        self.ipc.timing(packet.seq, (now - packet.timestamp) * 1000, self._fps, now= now)
+        return frame
+
+    def startCanvas(self):
+        print("Start Canvas", file=sys.stderr)
+
+        # 畫面擷取、偵測、分類與滑鼠動作各自在獨立的執行緒中執行, 主執行緒只負責顯示畫面
+        # 佇列中的畫面可能被丟棄, 並排繪製模式 (GESTURE_RENDER=side_by_side) 不能環形重複使用緩衝區
+        self.DataProcessing.renderer.reuse_buffers = False
+        pipeline = Pipeline(self.capture,
+                            [("detect", self.detect), ("classify", self.classify), ("actuate", self.actuate)],
+                            reporting= self.profile)
+        pipeline.start()
+
+        display = self.timers["display"]
+        try:
+            for packet in pipeline:
+                if self.headless:
+                    continue
+                display.begin_frame()
+                if packet.value is not None:
+                    cv2.imshow("Hand Recognition", packet.value)
+
+                key = cv2.waitKey(1)
+                display.mark("display")
+                display.end_frame()
+                if key == ord('q'):
+                    break
+                if key == ord('p'):
+                    pipeline.reporting = not pipeline.reporting
+                    for timer in self.timers.values():
+                        timer.toggle()
+        finally:
+            pipeline.stop()
+            self.mouse.release()
+            print("Capture stats:", self.DataProcessing.captureStats(), file=sys.stderr)
+            print("Hand stats:", self.DataProcessing.handStats(), file=sys.stderr)
+            print("Prediction gate stats:", self.gate.stats(), file=sys.stderr)
+            print("Mouse stats:", self.mouse.stats(), file=sys.stderr)
+            print("IPC stats:", self.ipc.stats(), file=sys.stderr)
+            pipeline.report()
+            for timer in self.timers.values():
+                if timer.enabled:
+                    timer.report()
 
 if __name__ == "__main__":
-    canvas = GestureCanvas_KMeans()
+    # 畫面來源可以由參數或環境變數 GESTURE_SOURCE 指定 (例如 video:session.mp4, synthetic, video:session.mp4?realtime),
+    # 設定 GESTURE_HEADLESS=1 則不顯示畫面視窗
+    canvas = GestureCanvas_KMeans(source= sys.argv[1] if len(sys.argv) > 1 else os.environ.get("GESTURE_SOURCE"),
+                                  headless= os.environ.get("GESTURE_HEADLESS") == "1")
     canvas.startCanvas()
@@ -1,7 +1,11 @@
 import cv2
 import numpy as np
+from typing import Optional, Union
 
 from ModelTraining.Data.DataProcessBase import DataProcessBase
+from ModelTraining.Data.FrameSource import Frame, FrameSource, CameraSource, make_source
+from ModelTraining.Data.StageTimer import StageTimer
+from ModelTraining.Data.HandTracker import Hand, HandTracker
 
 import warnings
 warnings.filterwarnings("ignore", category= UserWarning)
@@ -10,33 +14,85 @@ class LiveTest_DataProcessing(DataProcessBase):
     """
     實時數據處理類別
 
-    此類別負責從攝影機獲取實時數據, 並將數據轉換為可用於模型預測的格式
+    此類別負責從畫面來源 (攝影機、影片檔、圖片資料夾或合成關鍵點) 獲取實時數據, 並將數據轉換為可用於模型預測的格式
 
     Attributes:
-        cap (cv2.VideoCapture): 影片擷取物件
+        source (FrameSource): 畫面來源, 預設為背景執行緒攝影機擷取
+        frame_seq (int): 最近一次處理的畫面序號
+        frame_timestamp (float): 最近一次處理的畫面擷取時間
+        timer (StageTimer): 每幀處理階段計時器, 預設停用
+        hand_tracker (HandTracker): 多手模式 (processFrameHands) 的追蹤編號分配器
+        hand_stats (dict): 偵測統計 (畫面數量、沒有偵測到手的畫面數量、偵測到的手的總數), 單手與多手模式共用
         mp_hands (mediapipe.solutions.hands.Hands): MediaPipe 偵測手部關鍵點的物件
         mp_drawing (mediapipe.solutions.drawing_utils): MediaPipe 繪圖工具
         data_transform (DataTransform): 資料轉換工具
     """
 
-    def __init__(self):
+    def __init__(self,
+                 source: Optional[Union[FrameSource, str]] = None,
+                 device: int = 0,
+                 fps: Optional[float] = None,
+                 fourcc: Optional[str] = "MJPG",
+                 buffer_size: Optional[int] = 1,
+                 roi_tracking: bool = False,
+                 inference_size: tuple[int, int] = (256, 256),
+                 render_mode: str = "side_by_side",
+                 render_every: int = 1,
+                 max_num_hands: int = 1,
+                 realtime: bool = False):
         """
         初始化實時數據處理類別
+
+        Args:
+            source (FrameSource | str, optional): 畫面來源或 make_source 的描述字串 (例如 "video:session.mp4", "synthetic"),
+                                                  None 則使用攝影機 (device, fps, fourcc, buffer_size)
+            device (int): 攝影機編號, 預設為 0
+            fps (float, optional): 要求的攝影機 FPS, None 則使用攝影機預設值
+            fourcc (str, optional): 影像編碼, 預設為 "MJPG"
+            buffer_size (int, optional): OpenCV 內部緩衝區大小, 預設為 1
+            roi_tracking (bool): 是否只在上一幀手部附近的區域偵測, 預設為 False
+            inference_size (tuple): 追蹤區域送入 MediaPipe 的大小 (寬, 高), 預設為 256x256
+            render_mode (str): draw=True 時繪製手部關鍵點的模式 ("off", "overlay", "side_by_side"), 預設為 "side_by_side"
+            render_every (int): 每 N 幀繪製一次, 預設為 1
+            max_num_hands (int): 最大偵測手部數量, 大於 1 時使用 processFrameHands 取得所有手, 預設為 1
+            realtime (bool): 以描述字串建立的影片、圖片與合成來源是否依照 FPS 輸出, 預設為 False (盡可能快速輸出)
         """
-        super().__init__(static_image_mode=False)
+        super().__init__(static_image_mode=False, roi_tracking=roi_tracking, roi_size=inference_size,
+                         render_mode=render_mode, render_every=render_every, max_num_hands=max_num_hands)
+
+        # 初始化畫面來源, 預設為背景擷取的攝影機, 並設定畫面大小為 640x480
+        if source is None:
+            source = CameraSource(device, 640, 480, fps=fps, fourcc=fourcc, buffer_size=buffer_size)
+        elif isinstance(source, str):
+            source = make_source(source, realtime=realtime)
+        self.source = source
+        self.frame_seq = 0
+        self.frame_timestamp = 0.0
 
-        # 初始化攝影機擷取物件, 並設定畫面大小為 640x480
-        self.cap = cv2.VideoCapture(0)
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        # 每幀處理階段計時器, 即時迴圈可以共用此計時器記錄後續階段
+        self.timer = StageTimer(["capture", "prepare", "mediapipe", "normalize"])
+        self.hand_tracker = HandTracker()
+        self.hand_stats = {"frames": 0, "no_hand": 0, "hands": 0}
     
     def __del__(self):
-        self.cap.release()
+        self.source.release()
         cv2.destroyAllWindows()
 
+    def captureStats(self) -> dict:
+        """
+        獲取畫面來源統計資訊 (已讀取、已丟棄的畫面數量)
+        """
+        return self.source.stats()
+
+    def handStats(self) -> dict:
+        """
+        獲取偵測統計資訊 (畫面數量、沒有偵測到手的畫面數量、偵測到的手的總數)
+        """
+        return dict(self.hand_stats)
+
     def getCoordData(self, draw=False) -> tuple[np.ndarray, np.ndarray, tuple[float, float]]:
         """
-        獲取攝影機畫面, 並將畫面轉換為可用於模型預測的格式
+        獲取畫面來源的畫面, 並將畫面轉換為可用於模型預測的格式
 
         Args:
             draw (bool, optional): 是否繪製手部關鍵點. 預設為 False
@@ -48,20 +104,56 @@ class LiveTest_DataProcessing(DataProcessBase):
         Notes:
             - 如果畫面中沒有偵測到手部關鍵點, 則 coords 回傳 None
             - 回傳的座標為一維陣列, 形狀為 (63,), 原本為 (3, 21, 3) 的三維陣列
+            - 畫面來源讀取到結尾時拋出 EOFError, 攝影機無法讀取時拋出 IOError
+            - 合成來源的畫面附有關鍵點, 會略過 MediaPipe 偵測
         """
 
-        # 讀取攝影機畫面, 如果無法讀取則拋出異常
-        ret, frame = self.cap.read()
-        if not ret or frame is None:
-            raise IOError("無法讀取攝影機畫面")
-        
+        # 讀取下一個畫面
+        captured = self.source.read()
+        self.frame_seq, self.frame_timestamp = captured.seq, captured.timestamp
+        self.timer.mark("capture")
+
+        return self.processFrame(captured, draw=draw)
+
+    def processFrame(self, captured: Frame, draw=False) -> tuple[np.ndarray, np.ndarray, tuple[float, float]]:
+        """
+        將畫面來源讀取到的畫面轉換為可用於模型預測的格式 (getCoordData 中讀取畫面之後的步驟)
+        可以在管線的偵測階段中單獨呼叫, 讀取畫面則由管線的畫面來源執行緒負責
+
+        Args:
+            captured (Frame): 畫面來源讀取到的畫面
+            draw (bool, optional): 是否繪製手部關鍵點. 預設為 False
+        Returns:
+            tuple: (frame, coords, Finger_pos), 與 getCoordData 相同
+        Notes:
+            - 繪製模式為 off 或這一幀不需要繪製 (每 N 幀繪製一次) 時, frame 回傳 None
+            - 偵測到多隻手時只使用第一隻手, 需要所有手時使用 processFrameHands
+            - 沒有偵測到手的畫面只記錄在統計資訊中 (handStats), 不會輸出訊息
+        """
+        frame, landmarks = captured.image, captured.landmarks
+        draw = draw and self.renderer.begin_frame()
+        self.hand_stats["frames"] += 1
+
+        # 合成來源直接提供原始關鍵點, 不需要前處理與 MediaPipe 偵測
+        if landmarks is not None:
+            landmarks = landmarks.reshape(-1, 21, 3)[0]
+            frame, coords = self.Normalize_Landmark_Array(landmarks, draw=draw, frame=frame)
+            self.timer.mark("normalize")
+            self.hand_stats["hands"] += 1
+            return frame, coords.reshape(-1), (float(landmarks[8][0]), float(landmarks[8][1]))
+
         # 將畫面處理過後, 並獲取手部關鍵點
-        frame, result = self.PreprocessImage(frame)
+        # 啟用追蹤時只轉換追蹤區域的顏色
+        frame, imgRGB = self.PrepareFrame(frame, convert= not self.roi_tracking)
+        self.timer.mark("prepare")
+        result = self.DetectHandsTracked(frame) if self.roi_tracking else self.DetectHands(imgRGB)
+        self.timer.mark("mediapipe")
 
         # 如果沒有偵測到手部關鍵點, 則回傳 None
         if result.multi_hand_landmarks is None:
-            print("No hand detected.")
-            return frame, None, None
+            self.hand_stats["no_hand"] += 1
+            return frame if draw else None, None, None
+        self.hand_stats["hands"] += 1
         
         # 獲取食指關鍵點的螢幕相對位置
         Finger_pos = (result.multi_hand_landmarks[0].landmark[8].x, 
@@ -69,6 +161,64 @@ class LiveTest_DataProcessing(DataProcessBase):
 
         # 正規化關鍵點座標並將其轉換為一維陣列, 形狀為 (63,)
         frame, coords = self.Normalize_Landmark_Coords(result.multi_hand_landmarks[0], draw=draw, frame=frame)
+        self.timer.mark("normalize")
 
         # 回傳畫面和關鍵點座標
-        return frame, coords.reshape(-1), Finger_pos
\ No newline at end of file
+        return frame, coords.reshape(-1), Finger_pos
+
+    def processFrameHands(self, captured: Frame, draw=False) -> tuple[Optional[np.ndarray], list[Hand]]:
+        """
+        將畫面來源讀取到的畫面轉換為畫面中所有手的預測資料 (多手模式)
+
+        1. 一次 MediaPipe 偵測取得所有手 (最多 max_num_hands 隻) 與左右手判斷
+        2. 所有手合併為 (N, 21, 3) 的陣列, 以一次批次正規化處理
+        3. 以手部中心點分配跨畫面穩定的追蹤編號
+
+        Args:
+            captured (Frame): 畫面來源讀取到的畫面
+            draw (bool, optional): 是否繪製手部關鍵點. 預設為 False
+        Returns:
+            tuple: (frame, hands)
+            - frame (np.ndarray): 繪製後的畫面, 不需要繪製時為 None
+            - hands (list[Hand]): 每隻手的追蹤編號、左右手、正規化座標 (63,) 與食指位置, 沒有偵測到手時為空列表
+        Notes:
+            - 所有手的座標可以用 np.stack([hand.coords for hand in hands]) 合併後一次預測
+            - 合成來源的關鍵點形狀可以是 (21, 3) 或 (N, 21, 3), 沒有左右手判斷 ("Unknown")
+            - 並排繪製模式只繪製第一隻手, 疊加模式繪製所有手
+        """
+        frame, landmarks = captured.image, captured.landmarks
+        draw = draw and self.renderer.begin_frame()
+        self.hand_stats["frames"] += 1
+
+        if landmarks is not None:
+            raw_coords = np.asarray(landmarks, dtype=np.float64).reshape(-1, 21, 3)
+            handedness = [("Unknown", 0.0)] * len(raw_coords)
+        else:
+            frame, imgRGB = self.PrepareFrame(frame, convert= not self.roi_tracking)
+            self.timer.mark("prepare")
+            result = self.DetectHandsTracked(frame) if self.roi_tracking else self.DetectHands(imgRGB)
+            self.timer.mark("mediapipe")
+
+            if result.multi_hand_landmarks is None:
+                # 沒有偵測到手的畫面只記錄在統計資訊中 (handStats), 避免每一幀都輸出訊息
+                self.hand_stats["no_hand"] += 1
+                self.hand_tracker.update(np.empty((0, 2)), [])
+                return frame if draw else None, []
+
+            raw_coords = np.array([self.Landmarks_To_Array(hand) for hand in result.multi_hand_landmarks])
+            handedness = self.Result_Handedness(result)
+
+        # 所有手一次正規化, 繪製時使用未四捨五入的座標, 預測使用四捨五入到小數點後 4 位的座標
+        coords, centers = self.Normalize_Landmark_Batch(raw_coords, decimals=None)
+        if draw:
+            for i in range(len(raw_coords) if self.renderer.mode == "overlay" else 1):
+                frame = self.Render_Landmarks(frame, centers[i], coords[i], raw_coords[i] - centers[i])
+        coords = np.round(coords, 4).reshape(len(coords), -1)
+
+        track_ids = self.hand_tracker.update(centers, [side for side, _ in handedness])
+        self.hand_stats["hands"] += len(track_ids)
+        self.timer.mark("normalize")
+
+        hands = [Hand(track_id, side, score, coords[i], (float(raw_coords[i, 8, 0]), float(raw_coords[i, 8, 1])), centers[i])
+                 for i, (track_id, (side, score)) in enumerate(zip(track_ids, handedness))]
+        return frame if draw else None, hands
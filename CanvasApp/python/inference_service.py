@@ -0,0 +1,465 @@
+"""
+本機手勢推論服務 (Unix domain socket, 動態微批次)
+
+讓其他程序 (不同的前端、工作階段伺服器、測試工具) 不需要內嵌整個即時迴圈, 只要送出正規化後的關鍵點
+(與 Normalize_Landmark_Coords 相同的 63 維座標) 就能取得標籤與信心值, 所有用戶端共用同一個已載入的模型:
+
+- 同時到達的請求合併為一個微批次, 批次大小達到 max_batch 或第一筆請求等待超過 max_wait 時立即預測,
+  一次 predict_confidence 呼叫的固定開銷由批次中的所有請求分攤
+- 記錄排隊等待時間與批次大小的直方圖, 以及每次批次預測的時間
+
+訊息使用 ipc_channel 的標頭格式 (magic | version | type | length), 內容為 little-endian:
+
+    INFO    (16) 伺服器 -> 用戶端: UTF-8 JSON {"bundle", "classes", "n_features", "max_batch", "max_wait_ms"}, 連線後立即送出
+    PREDICT (17) 用戶端 -> 伺服器: uint32 請求編號, uint16 筆數 N, N x n_features 個 float64 座標
+    RESULT  (18) 伺服器 -> 用戶端: uint32 請求編號, uint16 筆數 N, N 組 (uint16 類別索引, float32 信心值)
+    ERROR   (19) 伺服器 -> 用戶端: uint32 請求編號, UTF-8 錯誤訊息
+    STATS   (20) 用戶端 -> 伺服器: 無內容; 伺服器回傳相同類型, 內容為 UTF-8 JSON 統計資訊
+
+類別索引對應 INFO 中的 classes, 同一個連線可以連續送出多個請求, 回應依照請求編號對應 (不保證順序)
+
+使用方式:
+    python inference_service.py serve --bundle KMeans_2 --max-batch 32 --max-wait 2
+    python inference_service.py bench --clients 8 --requests 500
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import struct
+import asyncio
+import tempfile
+import argparse
+import threading
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+from Models import _LoadSave as LoadSave
+from Models import _FusedInference as FusedInference
+from ipc_channel import HEADER, MAGIC, PROTOCOL_VERSION, encode
+
+MSG_INFO = 16
+MSG_PREDICT = 17
+MSG_RESULT = 18
+MSG_ERROR = 19
+MSG_STATS = 20
+
+_REQUEST = struct.Struct("<IH")
+_ERROR = struct.Struct("<I")
+_RESULT_ROW = np.dtype([("index", "<u2"), ("confidence", "<f4")])
+
+# 預設的 socket 路徑, 可以由環境變數 GESTURE_INFERENCE_SOCKET 指定
+DEFAULT_SOCKET = os.environ.get("GESTURE_INFERENCE_SOCKET", os.path.join(tempfile.gettempdir(), "gesture_inference.sock"))
+
+class Histogram:
+    """
+    固定區間的直方圖
+
+    Attributes:
+        bounds (np.ndarray): 每個區間的上限 (包含), 最後一個區間為超過最大上限的值
+        counts (np.ndarray): 每個區間的次數
+        total (float): 所有值的總和
+    """
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = np.asarray(bounds, dtype=np.float64)
+        self.counts = np.zeros(len(self.bounds) + 1, dtype=np.int64)
+        self.total = 0.0
+
+    def add(self, values: Any) -> None:
+        """加入一個或多個值"""
+        values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+        np.add.at(self.counts, np.searchsorted(self.bounds, values, side="left"), 1)
+        self.total += float(values.sum())
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            dict: buckets (區間上限的字串 -> 次數, 超過最大上限為 "+Inf"), count, mean
+        """
+        labels = [f"{bound:g}" for bound in self.bounds] + ["+Inf"]
+        count = int(self.counts.sum())
+        return {"buckets": dict(zip(labels, self.counts.tolist())), "count": count,
+                "mean": self.total / count if count else 0.0}
+
+class _Pending:
+    """等待預測的請求 (座標、送出請求的連線、加入佇列的時間與回應用的 future)"""
+
+    __slots__ = ("rows", "client", "enqueued", "future")
+
+    def __init__(self, rows: np.ndarray, client: int, future: asyncio.Future):
+        self.rows = rows
+        self.client = client
+        self.enqueued = time.perf_counter()
+        self.future = future
+
+class InferenceService:
+    """
+    以動態微批次處理多個用戶端請求的推論服務
+
+    Attributes:
+        predictor (FusedPredictor): 融合預測器
+        max_batch (int): 每個批次最多的筆數
+        max_wait (float): 批次中第一筆請求最多等待的秒數
+        queue_wait_ms (Histogram): 請求加入佇列到開始預測的等待時間 (毫秒)
+        batch_size (Histogram): 每個批次的筆數
+        predict_ms (Histogram): 每個批次的預測時間 (毫秒)
+    Notes:
+        - 單一請求的筆數超過剩餘空間時, 整個請求放入下一個批次, 單一請求超過 max_batch 時單獨成為一個批次
+        - 所有連線中的用戶端都已經有請求在批次中時不再等待 (同步用戶端在收到回應前不會送出下一個請求)
+        - 預測在事件迴圈中直接執行 (融合預測器一個批次只需要數十微秒), 不需要額外的執行緒
+    """
+
+    def __init__(self,
+                 predictor: FusedInference.FusedPredictor,
+                 max_batch: int = 32,
+                 max_wait: float = 0.002,
+                 bundle_name: str = ""):
+        """
+        Args:
+            predictor (FusedPredictor): 融合預測器
+            max_batch (int): 每個批次最多的筆數, 預設為 32
+            max_wait (float): 批次中第一筆請求最多等待的秒數, 預設為 2 毫秒
+            bundle_name (str): 模型組合包名稱, 只用於 INFO 訊息
+        """
+        self.predictor = predictor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.n_features = int(predictor.n_features_in_)
+        self.info = json.dumps({"bundle": bundle_name, "classes": np.asarray(predictor.classes_).tolist(),
+                                "n_features": self.n_features, "max_batch": max_batch,
+                                "max_wait_ms": max_wait * 1000}).encode("utf-8")
+
+        self.queue_wait_ms = Histogram([0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100])
+        self.batch_size = Histogram([1, 2, 4, 8, 16, 32, 64, 128])
+        self.predict_ms = Histogram([0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5])
+        self.requests = 0
+        self.rows = 0
+        self.errors = 0
+        self.clients = 0
+        self._next_client = 0
+
+    async def _batcher(self) -> None:
+        """批次迴圈: 等待第一筆請求, 收集到 max_batch 筆或等待超過 max_wait 後一次預測"""
+        carry: Optional[_Pending] = None
+        while True:
+            first = carry if carry is not None else await self._queue.get()
+            carry = None
+            batch, rows, clients = [first], len(first.rows), {first.client}
+
+            # 收集同一個批次的請求, 期限從第一筆請求加入佇列的時間開始計算
+            deadline = first.enqueued + self.max_wait
+            while rows < self.max_batch and len(clients) < self.clients:
+                try:
+                    pending = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        pending = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if rows + len(pending.rows) > self.max_batch:
+                    carry = pending
+                    break
+                batch.append(pending)
+                rows += len(pending.rows)
+                clients.add(pending.client)
+
+            self._run_batch(batch)
+            await asyncio.sleep(0)
+
+    def _run_batch(self, batch: list[_Pending]) -> None:
+        """對一個批次執行一次預測, 並將結果切分回每個請求"""
+        start = time.perf_counter()
+        self.queue_wait_ms.add([(start - pending.enqueued) * 1000 for pending in batch])
+        X = batch[0].rows if len(batch) == 1 else np.concatenate([pending.rows for pending in batch])
+
+        try:
+            # 與 predict_confidence 相同, 但回傳類別索引 (用戶端以 INFO 中的 classes 對應標籤)
+            scores = self.predictor.class_scores(X)
+            index = np.argmax(scores, axis=1)
+            confidence = scores[np.arange(len(scores)), index]
+        except Exception as error:
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(error)
+            return
+
+        self.predict_ms.add((time.perf_counter() - start) * 1000)
+        self.batch_size.add(len(X))
+
+        offset = 0
+        for pending in batch:
+            n = len(pending.rows)
+            result = np.empty(n, dtype=_RESULT_ROW)
+            result["index"] = index[offset:offset + n]
+            result["confidence"] = confidence[offset:offset + n]
+            offset += n
+            if not pending.future.done():
+                pending.future.set_result(result)
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """用戶端連線: 讀取請求並加入批次佇列, 預測完成後由 future 的回呼寫回結果"""
+        self.clients += 1
+        client = self._next_client
+        self._next_client += 1
+        writer.write(encode(MSG_INFO, self.info))
+
+        def reply(request_id: int, future: asyncio.Future) -> None:
+            if writer.is_closing():
+                return
+            if future.exception() is not None:
+                self.errors += 1
+                writer.write(encode(MSG_ERROR, _ERROR.pack(request_id) + str(future.exception()).encode("utf-8")))
+                return
+            result = future.result()
+            writer.write(encode(MSG_RESULT, _REQUEST.pack(request_id, len(result)) + result.tobytes()))
+
+        try:
+            while True:
+                header = await reader.readexactly(HEADER.size)
+                magic, version, msg_type, length = HEADER.unpack(header)
+                if magic != MAGIC or version != PROTOCOL_VERSION:
+                    break
+                payload = await reader.readexactly(length)
+
+                if msg_type == MSG_STATS:
+                    writer.write(encode(MSG_STATS, json.dumps(self.stats()).encode("utf-8")))
+                    continue
+                if msg_type != MSG_PREDICT:
+                    continue
+
+                # 驗證請求長度: 標頭不完整或特徵資料不是 float64 的整數倍時回傳錯誤, 不中斷連線
+                # 標頭不完整時無法得知請求編號, 能讀取時使用前 4 bytes, 否則為 0
+                if len(payload) < _REQUEST.size or (len(payload) - _REQUEST.size) % 8 != 0:
+                    request_id = _ERROR.unpack_from(payload)[0] if len(payload) >= _ERROR.size else 0
+                    self.errors += 1
+                    message = f"Malformed request payload of {len(payload)} bytes"
+                    writer.write(encode(MSG_ERROR, _ERROR.pack(request_id) + message.encode("utf-8")))
+                    continue
+
+                request_id, count = _REQUEST.unpack_from(payload)
+                values = np.frombuffer(payload, dtype="<f8", offset=_REQUEST.size)
+                if count == 0 or values.size != count * self.n_features:
+                    self.errors += 1
+                    message = f"Expected {count} x {self.n_features} float64 values, got {values.size}"
+                    writer.write(encode(MSG_ERROR, _ERROR.pack(request_id) + message.encode("utf-8")))
+                    continue
+
+                self.requests += 1
+                self.rows += count
+                future = asyncio.get_running_loop().create_future()
+                future.add_done_callback(lambda done, request_id=request_id: reply(request_id, done))
+                self._queue.put_nowait(_Pending(values.reshape(count, self.n_features), client, future))
+
+                # 寫入緩衝區過大 (用戶端沒有讀取回應) 時等待, 避免記憶體無限增加
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    async def serve(self, path: str = DEFAULT_SOCKET, ready: Optional[threading.Event] = None) -> None:
+        """
+        在 Unix domain socket 上提供服務, 直到工作被取消
+
+        Args:
+            path (str): socket 路徑, 已存在的檔案會被取代
+            ready (threading.Event, optional): 開始接受連線後設定, 讓其他執行緒可以等待服務啟動
+        """
+        if os.path.exists(path):
+            os.unlink(path)
+        self._queue: asyncio.Queue = asyncio.Queue()
+        batcher = asyncio.create_task(self._batcher())
+        server = await asyncio.start_unix_server(self._handle_client, path=path)
+        print(f"Inference service listening on {path}", file=sys.stderr)
+
+        # SIGTERM 時取消服務, 讓 finally 移除 socket 檔案
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        except (NotImplementedError, RuntimeError):
+            pass
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def stats(self) -> dict:
+        """
+        獲取服務統計資訊
+
+        Returns:
+            dict: requests, rows, errors, clients, queue_wait_ms, batch_size, predict_ms (直方圖)
+        """
+        return {
+            "requests": self.requests,
+            "rows": self.rows,
+            "errors": self.errors,
+            "clients": self.clients,
+            "queue_wait_ms": self.queue_wait_ms.to_dict(),
+            "batch_size": self.batch_size.to_dict(),
+            "predict_ms": self.predict_ms.to_dict(),
+        }
+
+class InferenceClient:
+    """
+    推論服務的同步用戶端 (阻塞式 socket), 每個執行緒應使用自己的用戶端
+
+    Attributes:
+        classes (np.ndarray): 伺服器的類別標籤, 回應中的類別索引對應此陣列
+        n_features (int): 每筆座標的特徵數量
+    """
+
+    def __init__(self, path: str = DEFAULT_SOCKET, timeout: Optional[float] = 5.0):
+        """
+        Args:
+            path (str): socket 路徑
+            timeout (float, optional): 等待回應的秒數, None 則不限制
+        """
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(path)
+        self._file = self._socket.makefile("rb")
+        self._next_id = 0
+
+        msg_type, payload = self._read()
+        if msg_type != MSG_INFO:
+            raise IOError(f"Expected INFO message, got type {msg_type}")
+        self.info = json.loads(payload)
+        self.classes = np.array(self.info["classes"])
+        self.n_features = int(self.info["n_features"])
+
+    def _read(self) -> tuple[int, bytes]:
+        """讀取一則完整的訊息"""
+        header = self._file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise EOFError("Inference service closed the connection")
+        magic, version, msg_type, length = HEADER.unpack(header)
+        if magic != MAGIC or version != PROTOCOL_VERSION:
+            raise ValueError(f"Bad message header {header!r}")
+        return msg_type, self._file.read(length)
+
+    def predict(self, coords: Any) -> tuple[np.ndarray, np.ndarray]:
+        """
+        預測一筆或多筆正規化座標的標籤與信心值
+
+        Args:
+            coords: 單筆 (63,) / (21, 3) 或多筆 (n, 63) / (n, 21, 3) 的正規化座標
+        Returns:
+            tuple: (labels, confidence), 形狀皆為 (n,)
+        Notes:
+            - 伺服器回傳錯誤時拋出 ValueError
+        """
+        rows = np.ascontiguousarray(coords, dtype="<f8").reshape(-1, self.n_features)
+        request_id = self._next_id
+        self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+        self._socket.sendall(encode(MSG_PREDICT, _REQUEST.pack(request_id, len(rows)) + rows.tobytes()))
+
+        while True:
+            msg_type, payload = self._read()
+            if msg_type == MSG_ERROR and _ERROR.unpack_from(payload)[0] == request_id:
+                raise ValueError(payload[_ERROR.size:].decode("utf-8"))
+            if msg_type == MSG_RESULT and _REQUEST.unpack_from(payload)[0] == request_id:
+                result = np.frombuffer(payload, dtype=_RESULT_ROW, offset=_REQUEST.size)
+                return self.classes[result["index"]], result["confidence"].astype(np.float64)
+
+    def stats(self) -> dict:
+        """獲取伺服器的統計資訊"""
+        self._socket.sendall(encode(MSG_STATS))
+        while True:
+            msg_type, payload = self._read()
+            if msg_type == MSG_STATS:
+                return json.loads(payload)
+
+    def close(self) -> None:
+        self._file.close()
+        self._socket.close()
+
+def load_service(bundle_name: str, max_batch: int, max_wait: float) -> InferenceService:
+    """載入模型組合包並編譯成融合預測器, 建立推論服務"""
+    bundle = LoadSave.load_bundle(bundle_name)
+    predictor = FusedInference.compile_model(bundle["model"], bundle["scaler"])
+    return InferenceService(predictor, max_batch= max_batch, max_wait= max_wait, bundle_name= bundle_name)
+
+def bench(path: str, clients: int, requests: int, rows: int) -> None:
+    """
+    以多個執行緒 (每個執行緒一個用戶端) 連續送出請求, 顯示吞吐量、請求延遲與伺服器的直方圖
+
+    座標由合成手部關鍵點經過 Normalize_Landmark_Batch 產生, 與即時迴圈的輸入相同
+    """
+    from ModelTraining.Data.FrameSource import SyntheticLandmarkSource
+    from ModelTraining.Data.DataProcessBase import DataProcessBase
+
+    source = SyntheticLandmarkSource()
+    poses = np.array([source.hand_pose(i / source.fps) for i in range(256)])
+    coords = DataProcessBase.Normalize_Landmark_Batch(poses)[0].reshape(len(poses), -1)
+
+    latencies = [[] for _ in range(clients)]
+
+    def run(worker: int) -> None:
+        client = InferenceClient(path)
+        for i in range(requests):
+            start = (worker * requests + i) * rows % (len(coords) - rows)
+            begin = time.perf_counter()
+            client.predict(coords[start:start + rows])
+            latencies[worker].append(time.perf_counter() - begin)
+        client.close()
+
+    threads = [threading.Thread(target=run, args=(worker,)) for worker in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latency = np.concatenate(latencies) * 1000
+    print(f"{clients} clients x {requests} requests x {rows} rows: {clients * requests / elapsed:.0f} requests/s, "
+          f"latency p50 {np.percentile(latency, 50):.2f} ms p95 {np.percentile(latency, 95):.2f} ms")
+
+    client = InferenceClient(path)
+    stats = client.stats()
+    client.close()
+    for name in ("queue_wait_ms", "batch_size", "predict_ms"):
+        histogram = stats[name]
+        buckets = ", ".join(f"<={label}: {count}" for label, count in histogram["buckets"].items() if count)
+        print(f"  {name} (mean {histogram['mean']:.3f}): {buckets}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local gesture inference service with dynamic micro-batching")
+    parser.add_argument("command", choices=("serve", "bench"))
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix domain socket path")
+    parser.add_argument("--bundle", default="KMeans_2", help="model bundle name (serve)")
+    parser.add_argument("--max-batch", type=int, default=32, help="maximum rows per micro-batch (serve)")
+    parser.add_argument("--max-wait", type=float, default=2.0, help="maximum queue wait in milliseconds (serve)")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients (bench)")
+    parser.add_argument("--requests", type=int, default=500, help="requests per client (bench)")
+    parser.add_argument("--rows", type=int, default=1, help="landmark vectors per request (bench)")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        bench(args.socket, args.clients, args.requests, args.rows)
+        return
+
+    service = load_service(args.bundle, args.max_batch, args.max_wait / 1000)
+    try:
+        asyncio.run(service.serve(args.socket))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    finally:
+        print("Inference service stats:", json.dumps(service.stats()), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
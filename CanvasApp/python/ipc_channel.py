@@ -0,0 +1,367 @@
+"""
+Python 引擎與 Electron 之間的二進位訊息通道
+
+每則訊息由固定 8 bytes 的標頭與內容組成 (little-endian):
+
+    magic (2 bytes, b"GC") | version (uint8) | type (uint8) | length (uint32) | payload (length bytes)
+
+訊息類型與內容:
+    HELLO   (1): uint16 螢幕寬度, uint16 螢幕高度
+    TOOL    (2): uint8 工具 (0 畫筆, 1 橡皮擦)
+    PEN     (3): uint8 是否按下 (1 按下, 0 放開)
+    CURSOR  (4): float64 時間戳, uint16 數量 N, N 組 (uint16 x, uint16 y)
+    TIMING  (5): uint32 畫面序號, float32 擷取到送出的延遲 (毫秒), float32 FPS
+    BYE     (6): 無內容
+
+只有狀態改變 (工具切換、畫筆按下 / 放開) 時才送出事件, 游標位置依照螢幕更新率批次送出,
+讓 Electron 端不需要逐行解析文字輸出, 也只在工具改變時呼叫 executeJavaScript
+
+使用方式 (本機替代消費端, 用來測試):
+    python ipc_channel.py -- python KMeans_LiveTest.py synthetic:300
+"""
+
+import os
+import sys
+import time
+import struct
+import threading
+from typing import Any, BinaryIO, Iterator, NamedTuple, Optional
+
+MAGIC = b"GC"
+PROTOCOL_VERSION = 1
+
+MSG_HELLO = 1
+MSG_TOOL = 2
+MSG_PEN = 3
+MSG_CURSOR = 4
+MSG_TIMING = 5
+MSG_BYE = 6
+
+MESSAGE_NAMES = {MSG_HELLO: "hello", MSG_TOOL: "tool", MSG_PEN: "pen",
+                 MSG_CURSOR: "cursor", MSG_TIMING: "timing", MSG_BYE: "bye"}
+
+HEADER = struct.Struct("<2sBBI")
+_HELLO = struct.Struct("<HH")
+_FLAG = struct.Struct("<B")
+_CURSOR_HEADER = struct.Struct("<dH")
+_POINT = struct.Struct("<HH")
+_TIMING = struct.Struct("<Iff")
+
+# 單則游標訊息最多包含的位置數量
+MAX_CURSOR_BATCH = 0xFFFF
+
+class Message(NamedTuple):
+    """
+    解碼後的訊息
+
+    Attributes:
+        type (int): 訊息類型 (MSG_*)
+        fields (dict): 訊息內容
+    """
+    type: int
+    fields: dict
+
+    @property
+    def name(self) -> str:
+        return MESSAGE_NAMES.get(self.type, str(self.type))
+
+def encode(msg_type: int, payload: bytes = b"") -> bytes:
+    """
+    編碼一則訊息 (標頭 + 內容)
+
+    Args:
+        msg_type (int): 訊息類型
+        payload (bytes): 訊息內容
+    Returns:
+        bytes: 編碼後的訊息
+    """
+    return HEADER.pack(MAGIC, PROTOCOL_VERSION, msg_type, len(payload)) + payload
+
+def decode_payload(msg_type: int, payload: bytes) -> dict:
+    """
+    解碼訊息內容
+
+    Args:
+        msg_type (int): 訊息類型
+        payload (bytes): 訊息內容
+    Returns:
+        dict: 訊息內容, 未知的類型回傳 {"raw": payload}
+    """
+    if msg_type == MSG_HELLO:
+        width, height = _HELLO.unpack(payload)
+        return {"width": width, "height": height}
+    if msg_type == MSG_TOOL:
+        return {"tool": _FLAG.unpack(payload)[0]}
+    if msg_type == MSG_PEN:
+        return {"down": bool(_FLAG.unpack(payload)[0])}
+    if msg_type == MSG_CURSOR:
+        timestamp, count = _CURSOR_HEADER.unpack_from(payload)
+        points = [_POINT.unpack_from(payload, _CURSOR_HEADER.size + i * _POINT.size) for i in range(count)]
+        return {"timestamp": timestamp, "points": points}
+    if msg_type == MSG_TIMING:
+        seq, latency_ms, fps = _TIMING.unpack(payload)
+        return {"seq": seq, "latency_ms": latency_ms, "fps": fps}
+    if msg_type == MSG_BYE:
+        return {}
+    return {"raw": payload}
+
+class IpcDecoder:
+    """
+    串流解碼器, 處理跨讀取區塊的訊息 (一個區塊可能包含多則或不完整的訊息)
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> list[Message]:
+        """
+        加入新讀取的資料, 並回傳所有完整的訊息
+
+        Args:
+            data (bytes): 讀取到的資料
+        Returns:
+            list[Message]: 解碼後的訊息
+        Notes:
+            - magic 或版本不符時拋出 ValueError
+        """
+        self._buffer += data
+        messages = []
+        while len(self._buffer) >= HEADER.size:
+            magic, version, msg_type, length = HEADER.unpack_from(self._buffer)
+            if magic != MAGIC:
+                raise ValueError(f"Bad IPC magic {bytes(magic)!r}")
+            if version != PROTOCOL_VERSION:
+                raise ValueError(f"Unsupported IPC protocol version {version}")
+            end = HEADER.size + length
+            if len(self._buffer) < end:
+                break
+            messages.append(Message(msg_type, decode_payload(msg_type, bytes(self._buffer[HEADER.size:end]))))
+            del self._buffer[:end]
+        return messages
+
+class IpcPublisher:
+    """
+    訊息發布端, 將狀態改變事件與批次游標位置寫入串流 (預設為 stdout)
+
+    Attributes:
+        display_rate (float): 游標批次送出的頻率 (Hz), 通常為螢幕更新率
+        timing_interval (float): TIMING 訊息的最短間隔秒數
+        messages (dict): 每種訊息已送出的數量
+        bytes_sent (int): 已送出的位元組數
+    Notes:
+        - 使用此發布端時, stdout 只能輸出二進位訊息, 其他文字輸出都必須寫到 stderr (可使用 claim_stdout)
+    """
+
+    def __init__(self,
+                 stream: Optional[BinaryIO] = None,
+                 display_rate: float = 60.0,
+                 timing_interval: float = 1.0):
+        """
+        Args:
+            stream (BinaryIO, optional): 輸出串流, 預設為 sys.stdout.buffer
+            display_rate (float): 游標批次送出的頻率 (Hz), 預設為 60
+            timing_interval (float): TIMING 訊息的最短間隔秒數, 預設為 1 秒
+        """
+        self.stream = stream if stream is not None else sys.stdout.buffer
+        self.display_rate = display_rate
+        self.timing_interval = timing_interval
+
+        self._lock = threading.Lock()
+        self._tool: Optional[int] = None
+        self._pen: Optional[bool] = None
+        self._points: list[tuple[int, int]] = []
+        self._batch_start = 0.0
+        self._last_timing = 0.0
+        self._closed = False
+
+        self.messages = {name: 0 for name in MESSAGE_NAMES.values()}
+        self.bytes_sent = 0
+
+    @classmethod
+    def claim_stdout(cls, **kwargs: Any) -> "IpcPublisher":
+        """
+        建立寫入原本 stdout 的發布端, 並將行程的 stdout (包含函式庫與 C 擴充模組的輸出) 導向 stderr,
+        避免其他文字輸出混入二進位訊息
+
+        Args:
+            **kwargs: IpcPublisher 的其他參數
+        Returns:
+            IpcPublisher: 發布端
+        """
+        sys.stdout.flush()
+        stream = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+        sys.stdout = sys.stderr
+        return cls(stream, **kwargs)
+
+    def _write(self, msg_type: int, payload: bytes = b"") -> None:
+        """寫入一則訊息 (呼叫端需持有鎖)"""
+        data = encode(msg_type, payload)
+        try:
+            self.stream.write(data)
+            self.stream.flush()
+        except (BrokenPipeError, ValueError):
+            # Electron 端已關閉, 停止輸出
+            self._closed = True
+            return
+        self.messages[MESSAGE_NAMES[msg_type]] += 1
+        self.bytes_sent += len(data)
+
+    def _flush_cursor(self) -> None:
+        """送出累積的游標位置 (呼叫端需持有鎖)"""
+        if not self._points or self._closed:
+            return
+        points = self._points[-MAX_CURSOR_BATCH:]
+        payload = _CURSOR_HEADER.pack(time.perf_counter(), len(points)) + b"".join(_POINT.pack(*p) for p in points)
+        self._points = []
+        self._write(MSG_CURSOR, payload)
+
+    def hello(self, screen_width: int, screen_height: int) -> None:
+        """送出連線資訊 (螢幕大小)"""
+        with self._lock:
+            self._write(MSG_HELLO, _HELLO.pack(screen_width, screen_height))
+
+    def set_tool(self, tool: int) -> bool:
+        """
+        更新工具 (0 畫筆, 1 橡皮擦), 只有改變時才送出
+
+        Returns:
+            bool: 是否送出訊息
+        """
+        tool = int(tool)
+        with self._lock:
+            if tool == self._tool or self._closed:
+                return False
+            # 先送出累積的游標位置, 保持事件順序
+            self._flush_cursor()
+            self._tool = tool
+            self._write(MSG_TOOL, _FLAG.pack(tool))
+            return True
+
+    def set_pen(self, down: bool) -> bool:
+        """
+        更新畫筆狀態 (按下 / 放開), 只有改變時才送出
+
+        Returns:
+            bool: 是否送出訊息
+        """
+        down = bool(down)
+        with self._lock:
+            if down == self._pen or self._closed:
+                return False
+            self._flush_cursor()
+            self._pen = down
+            self._write(MSG_PEN, _FLAG.pack(down))
+            return True
+
+    def cursor(self, x: int, y: int, now: Optional[float] = None) -> None:
+        """
+        加入游標位置, 距離上一次送出超過一個螢幕更新間隔時批次送出
+
+        Args:
+            x, y (int): 游標螢幕座標
+            now (float, optional): 目前時間 (time.perf_counter 秒數)
+        """
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            if not self._points:
+                self._batch_start = now
+            self._points.append((min(max(int(x), 0), 0xFFFF), min(max(int(y), 0), 0xFFFF)))
+            if now - self._batch_start >= 1.0 / self.display_rate:
+                self._flush_cursor()
+
+    def timing(self, seq: int, latency_ms: float, fps: float, now: Optional[float] = None) -> None:
+        """
+        送出計時資訊, 距離上一次送出未超過 timing_interval 時忽略
+
+        Args:
+            seq (int): 畫面序號
+            latency_ms (float): 畫面擷取到送出的延遲 (毫秒)
+            fps (float): 目前的處理速度
+            now (float, optional): 目前時間 (time.perf_counter 秒數)
+        """
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            if now - self._last_timing < self.timing_interval or self._closed:
+                return
+            self._last_timing = now
+            self._write(MSG_TIMING, _TIMING.pack(seq & 0xFFFFFFFF, latency_ms, fps))
+
+    def flush(self) -> None:
+        """送出累積的游標位置"""
+        with self._lock:
+            self._flush_cursor()
+
+    def close(self) -> None:
+        """送出累積的游標位置與 BYE 訊息"""
+        with self._lock:
+            if self._closed:
+                return
+            self._flush_cursor()
+            self._write(MSG_BYE)
+            self._closed = True
+
+    def stats(self) -> dict:
+        """
+        獲取發布統計資訊 (每種訊息數量、總位元組數)
+        """
+        with self._lock:
+            return {"messages": dict(self.messages), "bytes": self.bytes_sent}
+
+def consume(stream: BinaryIO, chunk_size: int = 4096) -> Iterator[Message]:
+    """
+    從串流讀取並解碼訊息, 直到串流結束或收到 BYE
+
+    Args:
+        stream (BinaryIO): 輸入串流
+        chunk_size (int): 每次讀取的位元組數
+    Yields:
+        Message: 解碼後的訊息
+    """
+    decoder = IpcDecoder()
+    read = getattr(stream, "read1", stream.read)
+    while True:
+        data = read(chunk_size)
+        if not data:
+            return
+        for message in decoder.feed(data):
+            yield message
+            if message.type == MSG_BYE:
+                return
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """
+    本機替代消費端: 啟動 Python 引擎 (或讀取 stdin), 顯示解碼後的訊息與統計
+    """
+    import argparse
+    import subprocess
+
+    parser = argparse.ArgumentParser(description="Stand-in consumer for the GestureCanvas IPC channel")
+    parser.add_argument("--quiet", action="store_true", help="only print the summary")
+    parser.add_argument("command", nargs=argparse.REMAINDER, help="engine command to spawn (default: read stdin)")
+    args = parser.parse_args(argv)
+
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+    process: Any = subprocess.Popen(command, stdout=subprocess.PIPE) if command else None
+    stream = process.stdout if process is not None else sys.stdin.buffer
+
+    counts = {name: 0 for name in MESSAGE_NAMES.values()}
+    points = 0
+    start = time.perf_counter()
+    try:
+        for message in consume(stream):
+            counts[message.name] = counts.get(message.name, 0) + 1
+            if message.type == MSG_CURSOR:
+                points += len(message.fields["points"])
+            if not args.quiet:
+                print(message.name, message.fields)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    elapsed = time.perf_counter() - start
+    print(f"Received {sum(counts.values())} messages in {elapsed:.2f}s: {counts}, {points} cursor points")
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,239 @@
-import pyautogui
+import os
+import json
+import threading
 import time
 import sys
 
-# 設置 pyautogui 的安全設置
-pyautogui.FAILSAFE = False  # 將滑鼠移動到螢幕左上角會觸發 FailSafe
-pyautogui.PAUSE = 0  # 每次操作間隔 0.1 秒
+class PyAutoGuiBackend:
+    """
+    pyautogui 滑鼠後端 (跨平台, 作為其他後端無法使用時的備案)
+    """
+
+    name = "pyautogui"
 
-class MouseController:
     def __init__(self):
+        import pyautogui
+
+        # 設置 pyautogui 的安全設置
+        pyautogui.FAILSAFE = False  # 將滑鼠移動到螢幕左上角會觸發 FailSafe
+        pyautogui.PAUSE = 0  # 每次操作間隔 0.1 秒
+        self.pyautogui = pyautogui
+
+    def size(self):
+        return tuple(self.pyautogui.size())
+
+    def move(self, x, y):
+        self.pyautogui.moveTo(x, y)
+
+    def button(self, button, down):
+        if down:
+            self.pyautogui.mouseDown(button=button)
+        else:
+            self.pyautogui.mouseUp(button=button)
+
+    def position(self):
+        return tuple(self.pyautogui.position())
+
+    def close(self):
+        pass
+
+class XTestBackend:
+    """
+    X11 XTest 滑鼠後端 (Linux), 直接透過 python-xlib 送出事件, 每個事件的延遲比 pyautogui 低
+    """
+
+    name = "xtest"
+    BUTTONS = {"left": 1, "middle": 2, "right": 3}
+
+    def __init__(self):
+        from Xlib import X, display
+        from Xlib.ext import xtest
+
+        self.X = X
+        self.xtest = xtest
+        self.display = display.Display()
+        self.root = self.display.screen().root
+
+    def size(self):
+        screen = self.display.screen()
+        return screen.width_in_pixels, screen.height_in_pixels
+
+    def move(self, x, y):
+        self.xtest.fake_input(self.display, self.X.MotionNotify, x=x, y=y)
+        self.display.flush()
+
+    def button(self, button, down):
+        event = self.X.ButtonPress if down else self.X.ButtonRelease
+        self.xtest.fake_input(self.display, event, self.BUTTONS[button])
+        self.display.flush()
+
+    def position(self):
+        pointer = self.root.query_pointer()
+        return pointer.root_x, pointer.root_y
+
+    def close(self):
+        self.display.close()
+
+class UInputBackend:
+    """
+    uinput 絕對座標滑鼠後端 (Linux), 透過 evdev 建立虛擬輸入裝置, 不依賴 X11 / Wayland
+    需要 /dev/uinput 的寫入權限, 無法查詢游標位置, 回傳最後送出的位置
+    """
+
+    name = "uinput"
+
+    def __init__(self, screen_size=(1920, 1080)):
+        from evdev import UInput, AbsInfo, ecodes
+
+        self.ecodes = ecodes
+        self.width, self.height = screen_size
+        self.BUTTONS = {"left": ecodes.BTN_LEFT, "middle": ecodes.BTN_MIDDLE, "right": ecodes.BTN_RIGHT}
+        capabilities = {
+            ecodes.EV_KEY: list(self.BUTTONS.values()),
+            ecodes.EV_ABS: [(ecodes.ABS_X, AbsInfo(0, 0, self.width, 0, 0, 0)),
+                            (ecodes.ABS_Y, AbsInfo(0, 0, self.height, 0, 0, 0))],
+        }
+        self.device = UInput(capabilities, name="GestureCanvas Mouse")
+        self._position = (0, 0)
+
+    def size(self):
+        return self.width, self.height
+
+    def move(self, x, y):
+        self.device.write(self.ecodes.EV_ABS, self.ecodes.ABS_X, x)
+        self.device.write(self.ecodes.EV_ABS, self.ecodes.ABS_Y, y)
+        self.device.syn()
+        self._position = (x, y)
+
+    def button(self, button, down):
+        self.device.write(self.ecodes.EV_KEY, self.BUTTONS[button], 1 if down else 0)
+        self.device.syn()
+
+    def position(self):
+        return self._position
+
+    def close(self):
+        self.device.close()
+
+class NullBackend:
+    """
+    不送出任何事件的滑鼠後端, 用於沒有顯示器的環境
+    """
+
+    name = "null"
+
+    def __init__(self, screen_size=(1920, 1080)):
+        self.width, self.height = screen_size
+        self._position = (0, 0)
+
+    def size(self):
+        return self.width, self.height
+
+    def move(self, x, y):
+        self._position = (x, y)
+
+    def button(self, button, down):
+        pass
+
+    def position(self):
+        return self._position
+
+    def close(self):
+        pass
+
+class RecordingBackend(NullBackend):
+    """
+    記錄事件的滑鼠後端, 不送出任何事件, 只以時間戳記錄原本會送出的事件
+    用於在沒有顯示器的環境測試與比較游標行為
+
+    events: [(timestamp, "move", x, y), (timestamp, "down" / "up", button), ...]
+    """
+
+    name = "recording"
+
+    def __init__(self, screen_size=(1920, 1080), path=None):
+        """
+        screen_size: 模擬的螢幕大小
+        path: 關閉時將事件寫入的 JSON Lines 檔案, None 則不寫入
+        """
+        super().__init__(screen_size)
+        self.path = path
+        self.events = []
+
+    def move(self, x, y):
+        super().move(x, y)
+        self.events.append((time.perf_counter(), "move", x, y))
+
+    def button(self, button, down):
+        self.events.append((time.perf_counter(), "down" if down else "up", button))
+
+    def save(self, path):
+        """
+        將事件寫入 JSON Lines 檔案, 每行一個事件
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            for timestamp, event, *args in self.events:
+                file.write(json.dumps({"t": timestamp, "event": event, "args": args}) + "\n")
+
+    def close(self):
+        if self.path is not None:
+            self.save(self.path)
+
+# 可用的滑鼠後端, auto 時依序嘗試
+BACKENDS = {
+    "pyautogui": PyAutoGuiBackend,
+    "xtest": XTestBackend,
+    "uinput": UInputBackend,
+    "null": NullBackend,
+    "recording": RecordingBackend,
+}
+
+def create_backend(backend="auto"):
+    """
+    建立滑鼠後端
+    backend: 後端名稱 (auto, pyautogui, xtest, uinput, null, recording) 或後端物件
+             auto 在 Linux 上依序嘗試 xtest (有 DISPLAY 時)、uinput, 最後使用 pyautogui
+    """
+    if not isinstance(backend, str):
+        return backend
+    if backend != "auto":
+        return BACKENDS[backend]()
+
+    candidates = []
+    if sys.platform.startswith("linux"):
+        if os.environ.get("DISPLAY"):
+            candidates.append(XTestBackend)
+        if os.access("/dev/uinput", os.W_OK):
+            candidates.append(UInputBackend)
+    for candidate in candidates:
+        try:
+            return candidate()
+        except Exception as e:
+            print(f"Mouse backend {candidate.name} unavailable: {e}", file=sys.stderr)
+    return PyAutoGuiBackend()
+
+class MouseController:
+    def __init__(self, backend=None):
+        """
+        backend: 滑鼠後端名稱或後端物件, None 則使用環境變數 GESTURE_MOUSE_BACKEND (預設為 auto)
+        """
+        self.backend = create_backend(backend or os.environ.get("GESTURE_MOUSE_BACKEND", "auto"))
+
         # 獲取螢幕尺寸
-        self.screen_width, self.screen_height = pyautogui.size()
-        print(f"Screen size: {self.screen_width}x{self.screen_height}")
+        self.screen_width, self.screen_height = self.backend.size()
+        print(f"Screen size: {self.screen_width}x{self.screen_height} ({self.backend.name})", file=sys.stderr)
+
+    def _glide(self, x, y, duration):
+        """
+        在 duration 秒內以 60 Hz 逐步移動到目標位置, duration 為 0 時直接移動
+        """
+        steps = int(duration * 60)
+        if steps > 1:
+            start_x, start_y = self.backend.position()
+            for i in range(1, steps):
+                self.backend.move(round(start_x + (x - start_x) * i / steps), round(start_y + (y - start_y) * i / steps))
+                time.sleep(duration / steps)
+        self.backend.move(x, y)
 
     def move_to(self, x, y, duration=0.2):
         """
@@ -20,12 +243,12 @@ class MouseController:
         """
         try:
             # 確保座標在螢幕範圍內
-            x = max(0, min(x, self.screen_width))
-            y = max(0, min(y, self.screen_height))
-            pyautogui.moveTo(x, y, duration=duration)
+            x = int(max(0, min(x, self.screen_width)))
+            y = int(max(0, min(y, self.screen_height)))
+            self._glide(x, y, duration)
             return True
         except Exception as e:
-            print(f"Error moving mouse: {e}")
+            print(f"Error moving mouse: {e}", file=sys.stderr)
             return False
 
     def move_relative(self, dx, dy, duration=0.03):
@@ -35,10 +258,10 @@ class MouseController:
         duration: 移動持續時間（秒）
         """
         try:
-            pyautogui.moveRel(dx, dy, duration=duration)
-            return True
+            x, y = self.backend.position()
+            return self.move_to(x + dx, y + dy, duration=duration)
         except Exception as e:
-            print(f"Error moving mouse: {e}")
+            print(f"Error moving mouse: {e}", file=sys.stderr)
             return False
 
     def get_position(self):
@@ -46,10 +269,10 @@ class MouseController:
         獲取當前滑鼠位置
         """
         try:
-            x, y = pyautogui.position()
+            x, y = self.backend.position()
             return x, y
         except Exception as e:
-            print(f"Error getting mouse position: {e}")
+            print(f"Error getting mouse position: {e}", file=sys.stderr)
             return None
 
     def click(self, x=None, y=None, button='left'):
@@ -61,10 +284,11 @@ class MouseController:
         try:
             if x is not None and y is not None:
                 self.move_to(x, y)
-            pyautogui.click(button=button)
+            self.backend.button(button, True)
+            self.backend.button(button, False)
             return True
         except Exception as e:
-            print(f"Error clicking mouse: {e}")
+            print(f"Error clicking mouse: {e}", file=sys.stderr)
             return False
 
     def drag_to(self, x, y, duration=0.2, button='left'):
@@ -75,24 +299,247 @@ class MouseController:
         button: 使用的滑鼠按鍵
         """
         try:
-            pyautogui.dragTo(x, y, duration=duration, button=button)
+            self.backend.button(button, True)
+            self.move_to(x, y, duration=duration)
+            self.backend.button(button, False)
             return True
         except Exception as e:
-            print(f"Error dragging mouse: {e}")
+            print(f"Error dragging mouse: {e}", file=sys.stderr)
             return False
-        
+
+    def press(self, button='left'):
+        """
+        按下滑鼠按鍵
+        button: 'left', 'right', 'middle'
+        """
+        try:
+            self.backend.button(button, True)
+            return True
+        except Exception as e:
+            print(f"Error pressing mouse: {e}", file=sys.stderr)
+            return False
+
     def release(self, button='left'):
         """
         釋放滑鼠按鍵
         button: 'left', 'right', 'middle'
         """
         try:
-            pyautogui.mouseUp(button=button)
+            self.backend.button(button, False)
             return True
         except Exception as e:
-            print(f"Error releasing mouse: {e}")
+            print(f"Error releasing mouse: {e}", file=sys.stderr)
             return False
 
+    def close(self):
+        """
+        關閉滑鼠後端 (記錄後端會在此時寫入事件)
+        """
+        self.backend.close()
+
+class MouseActuator:
+    """
+    非同步滑鼠動作執行緒
+
+    滑鼠指令由獨立的執行緒送出, 即時迴圈只需要更新目標, 緩慢的系統滑鼠事件不會拖慢畫面處理:
+    1. 移動指令只保留最新的目標位置, 執行緒來不及送出的舊目標會被合併
+    2. 按鍵只有在狀態改變時才會送出 (按下 / 放開)
+    3. 可選擇以螢幕更新率在兩次目標之間插值, 讓游標移動更平滑
+    """
+
+    def __init__(self, controller=None, interpolate=False, refresh_rate=60.0):
+        """
+        controller: 實際送出滑鼠事件的 MouseController, None 則建立新的 MouseController
+        interpolate: 是否在兩次目標之間插值
+        refresh_rate: 插值的更新頻率 (Hz), 通常為螢幕更新率
+        """
+        self.controller = controller if controller is not None else MouseController()
+        self.screen_width = self.controller.screen_width
+        self.screen_height = self.controller.screen_height
+        self.interpolate = interpolate
+        self.refresh_rate = refresh_rate
+
+        self._cond = threading.Condition()
+        self._target = None          # 最新的目標位置
+        self._new_target = False     # 目標是否尚未被執行緒處理
+        self._buttons = {}           # 即時迴圈要求的按鍵狀態 (True 為按下)
+        self._button_state = {}      # 已送出的按鍵狀態
+        self._position = None        # 最後送出的游標位置
+        self._busy = False
+        self._running = True
+
+        # 統計資訊
+        self.moves_requested = 0
+        self.moves_coalesced = 0
+        self.moves_sent = 0
+        self.buttons_requested = 0
+        self.buttons_sent = 0
+
+        self._thread = threading.Thread(target=self._run, name="MouseActuator", daemon=True)
+        self._thread.start()
+
+    def move_to(self, x, y):
+        """
+        更新游標的目標位置 (不會等待滑鼠實際移動)
+        x, y: 目標座標
+        """
+        with self._cond:
+            self.moves_requested += 1
+            if self._new_target:
+                self.moves_coalesced += 1
+            self._target = (int(x), int(y))
+            self._new_target = True
+            self._cond.notify()
+
+    def move_relative(self, dx, dy):
+        """
+        相對最新的目標位置移動游標
+        dx, dy: 相對移動距離
+        """
+        with self._cond:
+            base = self._target or self._position
+        if base is None:
+            base = self.controller.get_position() or (0, 0)
+        self.move_to(base[0] + dx, base[1] + dy)
+
+    def set_button(self, down, button='left'):
+        """
+        設定按鍵狀態, 只有狀態改變時才會送出事件
+        down: True 為按下, False 為放開
+        button: 'left', 'right', 'middle'
+        """
+        with self._cond:
+            if self._buttons.get(button) == down:
+                return
+            self.buttons_requested += 1
+            self._buttons[button] = down
+            self._cond.notify()
+
+    def press(self, button='left'):
+        """按下滑鼠按鍵"""
+        self.set_button(True, button)
+
+    def release(self, button='left'):
+        """放開滑鼠按鍵"""
+        self.set_button(False, button)
+
+    def drag_to(self, x, y, button='left'):
+        """
+        按住按鍵並移動到指定位置
+        x, y: 目標座標
+        button: 使用的滑鼠按鍵
+        """
+        self.press(button)
+        self.move_to(x, y)
+
+    def flush(self, timeout=1.0):
+        """
+        等待所有待處理的指令 (包含插值) 送出
+        timeout: 最長等待秒數
+        回傳: 是否在時間內完成
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending() and not self._busy, timeout)
+
+    def stats(self):
+        """
+        獲取統計資訊 (要求、合併、送出的移動與按鍵指令數量)
+        """
+        with self._cond:
+            return {
+                "moves_requested": self.moves_requested,
+                "moves_coalesced": self.moves_coalesced,
+                "moves_sent": self.moves_sent,
+                "buttons_requested": self.buttons_requested,
+                "buttons_sent": self.buttons_sent,
+            }
+
+    def close(self, release=True):
+        """
+        停止執行緒並關閉滑鼠後端
+        release: 是否放開所有按下的按鍵
+        """
+        if release:
+            for button, down in list(self._buttons.items()):
+                if down:
+                    self.release(button)
+            self.flush()
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join(timeout=1.0)
+        self.controller.close()
+
+    def _pending(self):
+        """是否有尚未處理的目標或按鍵狀態"""
+        return self._new_target or any(self._button_state.get(b) != d for b, d in self._buttons.items())
+
+    def _run(self):
+        tick = 1.0 / self.refresh_rate
+        interval = tick           # 估計的目標更新間隔, 作為插值時間
+        last_target_time = None
+        segment = None            # 插值線段 (起點, 終點, 開始時間, 持續時間)
+
+        while True:
+            with self._cond:
+                self._busy = segment is not None
+                if not self._busy:
+                    self._cond.notify_all()
+                while self._running and segment is None and not self._pending():
+                    self._cond.wait()
+                if not self._running:
+                    break
+                if segment is not None and not self._pending():
+                    # 插值中: 等待下一次更新或新的指令
+                    self._cond.wait(tick)
+
+                target = self._target if self._new_target else None
+                self._new_target = False
+                buttons = [(b, d) for b, d in self._buttons.items() if self._button_state.get(b) != d]
+                self._button_state.update(buttons)
+                self._busy = True
+
+            # 在鎖外送出系統滑鼠事件, 避免阻塞即時迴圈
+            # 按鍵狀態改變前先完成目前的插值, 讓按下 / 放開發生在正確的位置
+            if buttons and segment is not None:
+                self._send_move(segment[1])
+                segment = None
+            for button, down in buttons:
+                if down:
+                    self.controller.press(button)
+                else:
+                    self.controller.release(button)
+                self.buttons_sent += 1
+
+            now = time.perf_counter()
+            if target is not None:
+                if last_target_time is not None:
+                    interval = 0.8 * interval + 0.2 * min(now - last_target_time, 0.1)
+                last_target_time = now
+
+                if self.interpolate and self._position is not None:
+                    # 從目前位置開始插值, 第一步立即送出
+                    segment = (self._position, target, now - tick, interval)
+                else:
+                    segment = None
+                    self._send_move(target)
+
+            if segment is not None:
+                start, end, t0, duration = segment
+                ratio = min(1.0, (now - t0) / duration) if duration > 0 else 1.0
+                position = (round(start[0] + (end[0] - start[0]) * ratio),
+                            round(start[1] + (end[1] - start[1]) * ratio))
+                if position != self._position:
+                    self._send_move(position)
+                if ratio >= 1.0:
+                    segment = None
+
+    def _send_move(self, position):
+        """送出移動事件並記錄位置"""
+        self.controller.move_to(position[0], position[1], duration=0)
+        self._position = position
+        self.moves_sent += 1
+
 def demo():
     """
     展示所有滑鼠控制功能的示例
@@ -0,0 +1,384 @@
+"""
+多攝影機工作階段伺服器
+
+在同一台機器上同時服務多個畫面來源 (例如多台展示機的攝影機), 每個畫面來源稱為一個工作階段 (session):
+
+- 每個工作階段由獨立的工作程序負責讀取畫面、MediaPipe 偵測與分類, 偵測的吞吐量隨 CPU 核心數增加
+- 所有工作程序共用同一份融合預測器, 不需要各自載入 joblib 模型:
+    fork: 主程序編譯預測器後 fork 工作程序, 預測器的陣列以寫入時複製 (copy-on-write) 的分頁共用,
+          預測只會讀取陣列, 分頁不會被複製 (參考計數只會寫入物件標頭, 不會寫入陣列資料)
+    mmap: 主程序將編譯後的預測器存成未壓縮的 joblib 檔, 工作程序以 mmap_mode='r' 載入,
+          所有陣列對應到同一份唯讀的檔案分頁 (不支援 fork 的平台, 例如 Windows, 使用此模式)
+- 每個工作階段最多有 queue_size 筆結果等待主程序處理 (背壓):
+    drop: 主程序跟不上時丟棄最新的結果並計數, 偵測不會停下來
+    block: 工作程序等待主程序處理, 攝影機來源在背景執行緒擷取並只保留最新畫面, 等待期間舊畫面會被捨棄而不會累積延遲
+- 工作程序定期回報統計資訊 (畫面數、FPS、延遲百分位數、丟棄數量), 主程序以 stats() / report() 查詢
+
+使用方式:
+    python session_server.py synthetic:600 synthetic:600 --share mmap
+    python session_server.py camera:0 camera:1 --bundle KMeans_2 --hands 2
+"""
+
+import sys
+import time
+import queue
+import argparse
+import collections
+import multiprocessing as mp
+from typing import Any, Iterator, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from Models import _LoadSave as LoadSave
+from Models import _FusedInference as FusedInference
+from Models._PredictionGate import PredictionGate
+
+# 延遲統計保留的最近樣本數
+LATENCY_WINDOW = 1000
+
+class SessionResult(NamedTuple):
+    """
+    工作階段的一筆畫面結果
+
+    Attributes:
+        session (int): 工作階段編號 (畫面來源的順序)
+        seq (int): 畫面序號
+        timestamp (float): 畫面擷取時間 (time.perf_counter 秒數)
+        hands (list): 每隻手的 (追蹤編號, 左右手, 標籤, 食指位置), 沒有偵測到手時為空列表
+        latency_ms (float): 擷取到分類完成的延遲 (毫秒)
+    """
+    session: int
+    seq: int
+    timestamp: float
+    hands: list
+    latency_ms: float
+
+class SessionStats:
+    """
+    工作程序內的工作階段統計
+
+    Attributes:
+        frames (int): 已處理的畫面數量
+        hands (int): 偵測到的手的總數
+        dropped (int): 因背壓 (drop 模式) 丟棄的結果數量
+        errors (int): 讀取畫面失敗的次數
+    """
+
+    def __init__(self):
+        self.frames = 0
+        self.hands = 0
+        self.dropped = 0
+        self.errors = 0
+        self.start = time.perf_counter()
+        self.latency = collections.deque(maxlen=LATENCY_WINDOW)
+
+    def snapshot(self, gate: Optional[PredictionGate] = None, capture: Optional[dict] = None) -> dict:
+        """
+        獲取可以傳送到主程序的統計資訊
+
+        Args:
+            gate (PredictionGate, optional): 工作階段的預測閘門
+            capture (dict, optional): 畫面來源的統計資訊
+        Returns:
+            dict: frames, hands, dropped, errors, fps, latency_p50_ms, latency_p95_ms, gate, capture
+        """
+        elapsed = time.perf_counter() - self.start
+        latency = np.array(self.latency) if self.latency else np.zeros(1)
+        return {
+            "frames": self.frames,
+            "hands": self.hands,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "fps": self.frames / elapsed if elapsed > 0 else 0.0,
+            "latency_p50_ms": float(np.percentile(latency, 50)),
+            "latency_p95_ms": float(np.percentile(latency, 95)),
+            "gate": gate.stats() if gate is not None else {},
+            "capture": capture or {},
+        }
+
+def _session_worker(session: int,
+                    spec: str,
+                    predictor: Optional[FusedInference.FusedPredictor],
+                    predictor_path: Optional[str],
+                    config: dict,
+                    results: Any,
+                    credits: Any,
+                    metrics: Any,
+                    stop: Any) -> None:
+    """
+    工作程序: 讀取畫面、偵測所有手、以共用的預測器分類, 並將結果送回主程序
+
+    Args:
+        session (int): 工作階段編號
+        spec (str): 畫面來源描述字串 (make_source)
+        predictor (FusedPredictor, optional): fork 模式由主程序繼承的預測器
+        predictor_path (str, optional): mmap 模式要載入的預測器檔案
+        config (dict): max_num_hands, backpressure, report_every, threshold, max_age
+        results (multiprocessing.Queue): 所有工作階段共用的結果佇列
+        credits (multiprocessing.Semaphore): 此工作階段還可以送出的結果數量 (背壓)
+        metrics (multiprocessing.Queue): 統計資訊佇列, 內容為 (session, snapshot, done)
+        stop (multiprocessing.Event): 停止訊號
+    """
+    import cv2
+    from threadpoolctl import threadpool_limits
+    from LiveTest_DataProcessing import LiveTest_DataProcessing as DataProcessing
+
+    # 每個工作程序只使用一個運算執行緒, 平行化由多個程序負責, 避免執行緒數量超過核心數
+    threadpool_limits(1)
+    cv2.setNumThreads(1)
+
+    stats = SessionStats()
+    gate, processing = None, None
+    try:
+        if predictor is None:
+            predictor = FusedInference.load_compiled(predictor_path, mmap_mode='r')
+        gate = PredictionGate(predictor, threshold= config["threshold"], max_age= config["max_age"])
+        processing = DataProcessing(source= spec, max_num_hands= config["max_num_hands"], render_mode= "off")
+        stats.start = last_report = time.perf_counter()
+
+        while not stop.is_set():
+            try:
+                captured = processing.source.read()
+            except EOFError:
+                break
+            except IOError:
+                stats.errors += 1
+                continue
+
+            # 所有手一次批次預測, 標籤轉換為 Python 值以減少傳送的資料量
+            _, hands = processing.processFrameHands(captured)
+            output = []
+            if hands:
+                labels = gate.predict_batch(np.stack([hand.coords for hand in hands]),
+                                            [hand.track_id for hand in hands], now= captured.timestamp)
+                output = [(hand.track_id, hand.handedness, label.item(), hand.Finger_pos)
+                          for hand, label in zip(hands, labels)]
+            else:
+                gate.reset()
+
+            now = time.perf_counter()
+            latency_ms = (now - captured.timestamp) * 1000
+            stats.frames += 1
+            stats.hands += len(hands)
+            stats.latency.append(latency_ms)
+
+            # 背壓: 取得送出額度才送出結果, drop 模式取不到時丟棄, block 模式等待 (同時檢查停止訊號)
+            if config["backpressure"] == "block":
+                while not credits.acquire(timeout=0.1):
+                    if stop.is_set():
+                        break
+                else:
+                    results.put(SessionResult(session, captured.seq, captured.timestamp, output, latency_ms))
+            elif credits.acquire(block=False):
+                results.put(SessionResult(session, captured.seq, captured.timestamp, output, latency_ms))
+            else:
+                stats.dropped += 1
+
+            if now - last_report >= config["report_every"]:
+                metrics.put((session, stats.snapshot(gate, processing.captureStats()), False))
+                last_report = now
+    finally:
+        capture = processing.captureStats() if processing is not None else None
+        metrics.put((session, stats.snapshot(gate, capture), True))
+
+class SessionServer:
+    """
+    多畫面來源的工作階段伺服器
+
+    Attributes:
+        sources (list[str]): 每個工作階段的畫面來源描述字串
+        share (str): 預測器共用方式 ("fork" 或 "mmap")
+        queue_size (int): 每個工作階段最多等待處理的結果數量
+        backpressure (str): 結果佇列已滿時的處理方式 ("drop" 或 "block")
+        metrics (dict): 每個工作階段最近一次回報的統計資訊
+    Notes:
+        - 工作程序只在 start() 之後建立, MediaPipe 物件在各自的程序中建立, 不會跨程序共用
+        - 所有工作階段的結果都由 results() 依照完成順序取出
+    """
+
+    def __init__(self,
+                 sources: Sequence[str],
+                 bundle_name: str = "KMeans_2",
+                 share: Optional[str] = None,
+                 queue_size: int = 4,
+                 backpressure: str = "drop",
+                 max_num_hands: int = 1,
+                 report_every: float = 1.0,
+                 threshold: float = 0.05,
+                 max_age: float = 0.2):
+        """
+        Args:
+            sources (Sequence[str]): 畫面來源描述字串, 例如 ["camera:0", "camera:1"]
+            bundle_name (str): 模型組合包名稱, 預設為 "KMeans_2"
+            share (str, optional): 預測器共用方式, None 則在支援 fork 的平台使用 "fork", 否則使用 "mmap"
+            queue_size (int): 每個工作階段最多等待處理的結果數量, 預設為 4
+            backpressure (str): "drop" (丟棄最新的結果) 或 "block" (工作程序等待), 預設為 "drop"
+            max_num_hands (int): 每個畫面最多偵測的手部數量, 預設為 1
+            report_every (float): 工作程序回報統計資訊的間隔秒數, 預設為 1 秒
+            threshold (float): 預測閘門的距離門檻, 預設為 0.05
+            max_age (float): 預測閘門快取標籤的最大存活秒數, 預設為 0.2 秒
+        """
+        if share is None:
+            share = "fork" if "fork" in mp.get_all_start_methods() else "mmap"
+        if share not in ("fork", "mmap"):
+            raise ValueError(f"Unknown share mode: {share}")
+        if backpressure not in ("drop", "block"):
+            raise ValueError(f"Unknown backpressure mode: {backpressure}")
+
+        self.sources = list(sources)
+        self.bundle_name = bundle_name
+        self.share = share
+        self.queue_size = queue_size
+        self.backpressure = backpressure
+        self.config = {"max_num_hands": max_num_hands, "backpressure": backpressure, "report_every": report_every,
+                       "threshold": threshold, "max_age": max_age}
+
+        # fork 模式使用 fork 建立工作程序, mmap 模式使用 spawn (工作程序只繼承預測器檔案路徑)
+        self._context = mp.get_context("fork" if share == "fork" else "spawn")
+        self._processes: list = []
+        self._done: set[int] = set()
+        self.metrics: dict[int, dict] = {}
+        self.received = [0] * len(self.sources)
+
+    def start(self) -> None:
+        """載入並編譯預測器, 然後為每個畫面來源啟動一個工作程序"""
+        bundle = LoadSave.load_bundle(self.bundle_name)
+        predictor = FusedInference.compile_model(bundle["model"], bundle["scaler"])
+
+        predictor_path = None
+        if self.share == "mmap":
+            predictor_path = FusedInference.save_compiled(predictor, self.bundle_name)
+            predictor = None
+
+        context = self._context
+        self._results = context.Queue()
+        self._metrics = context.Queue()
+        self._stop = context.Event()
+        self._credits = [context.Semaphore(self.queue_size) for _ in self.sources]
+        self._start_time = time.perf_counter()
+
+        for session, spec in enumerate(self.sources):
+            process = context.Process(target=_session_worker, name=f"session-{session}", daemon=True,
+                                      args=(session, spec, predictor, predictor_path, self.config,
+                                            self._results, self._credits[session], self._metrics, self._stop))
+            process.start()
+            self._processes.append(process)
+
+    def _drain_metrics(self) -> None:
+        """讀取工作程序回報的統計資訊, 並記錄已經結束的工作階段"""
+        while True:
+            try:
+                session, snapshot, done = self._metrics.get_nowait()
+            except queue.Empty:
+                break
+            self.metrics[session] = snapshot
+            if done:
+                self._done.add(session)
+
+        # 異常結束 (沒有回報結束) 的工作程序也視為結束
+        for session, process in enumerate(self._processes):
+            if not process.is_alive() and process.exitcode not in (0, None):
+                self._done.add(session)
+
+    def results(self, timeout: float = 0.1) -> Iterator[SessionResult]:
+        """
+        依照完成順序取出所有工作階段的結果, 直到所有工作階段結束 (或呼叫 stop)
+
+        Args:
+            timeout (float): 等待結果的秒數, 逾時後檢查工作階段是否結束
+        Yields:
+            SessionResult: 工作階段的一筆畫面結果
+        """
+        while not self._stop.is_set():
+            # 所有工作階段結束後只取出佇列中剩下的結果
+            finished = len(self._done) == len(self._processes)
+            try:
+                result = self._results.get(timeout=0 if finished else timeout)
+            except queue.Empty:
+                if finished:
+                    break
+                self._drain_metrics()
+                continue
+
+            # 歸還送出額度, 讓該工作階段可以送出下一筆結果
+            self._credits[result.session].release()
+            self.received[result.session] += 1
+            yield result
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """通知所有工作程序停止, 等待結束後收集最後的統計資訊"""
+        self._stop.set()
+
+        # 清空結果佇列並歸還額度, 讓 block 模式中等待的工作程序可以結束
+        deadline = time.perf_counter() + timeout
+        for process in self._processes:
+            while process.is_alive() and time.perf_counter() < deadline:
+                try:
+                    result = self._results.get(timeout=0.05)
+                    self._credits[result.session].release()
+                except queue.Empty:
+                    pass
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        self._drain_metrics()
+
+    def stats(self) -> dict:
+        """
+        獲取所有工作階段的統計資訊
+
+        Returns:
+            dict: sessions (每個工作階段最近一次回報的統計資訊與主程序收到的結果數量), total_fps, share, backpressure
+        """
+        self._drain_metrics()
+        sessions = {session: {**self.metrics.get(session, {}), "received": self.received[session],
+                              "source": self.sources[session]}
+                    for session in range(len(self.sources))}
+        return {
+            "sessions": sessions,
+            "total_fps": sum(snapshot.get("fps", 0.0) for snapshot in sessions.values()),
+            "share": self.share,
+            "backpressure": self.backpressure,
+        }
+
+    def report(self) -> None:
+        """將所有工作階段的統計資訊輸出到 stderr"""
+        stats = self.stats()
+        print(f"Sessions: {len(self.sources)} (share={stats['share']}, backpressure={stats['backpressure']}), "
+              f"total {stats['total_fps']:.1f} FPS", file=sys.stderr)
+        for session, snapshot in stats["sessions"].items():
+            print(f"  [{session}] {snapshot['source']}: {snapshot.get('frames', 0)} frames, "
+                  f"{snapshot.get('fps', 0.0):.1f} FPS, latency p50 {snapshot.get('latency_p50_ms', 0.0):.1f} ms "
+                  f"p95 {snapshot.get('latency_p95_ms', 0.0):.1f} ms, hands {snapshot.get('hands', 0)}, "
+                  f"received {snapshot['received']}, dropped {snapshot.get('dropped', 0)}, "
+                  f"errors {snapshot.get('errors', 0)}", file=sys.stderr)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve several frame sources with one shared classifier")
+    parser.add_argument("sources", nargs="+", help="frame sources, e.g. camera:0 camera:1 synthetic:600")
+    parser.add_argument("--bundle", default="KMeans_2", help="model bundle name")
+    parser.add_argument("--share", choices=("fork", "mmap"), help="how workers share the predictor")
+    parser.add_argument("--queue-size", type=int, default=4, help="pending results allowed per session")
+    parser.add_argument("--backpressure", choices=("drop", "block"), default="drop")
+    parser.add_argument("--hands", type=int, default=1, help="maximum hands per frame")
+    parser.add_argument("--report", type=float, default=2.0, help="seconds between reports (0 disables)")
+    args = parser.parse_args()
+
+    server = SessionServer(args.sources, bundle_name= args.bundle, share= args.share, queue_size= args.queue_size,
+                           backpressure= args.backpressure, max_num_hands= args.hands)
+    server.start()
+
+    last_report = time.perf_counter()
+    try:
+        for _ in server.results():
+            if args.report and time.perf_counter() - last_report >= args.report:
+                server.report()
+                last_report = time.perf_counter()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        server.report()
+
+if __name__ == "__main__":
+    main()
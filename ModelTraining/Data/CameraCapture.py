@@ -0,0 +1,158 @@
+import cv2
+import time
+import threading
+import numpy as np
+from typing import Optional, NamedTuple
+
+class CapturedFrame(NamedTuple):
+    """
+    擷取到的單一畫面
+
+    Attributes:
+        seq (int): 畫面序號, 從 1 開始遞增
+        timestamp (float): 擷取時間 (time.perf_counter 秒數)
+        image (np.ndarray): BGR 畫面
+    """
+    seq: int
+    timestamp: float
+    image: np.ndarray
+
+class CameraCapture:
+    """
+    背景執行緒攝影機擷取類別
+
+    此類別在獨立執行緒上持續呼叫 cv2.VideoCapture.read(), 並只保留最新的一張畫面 (單一槽位),
+    讓偵測迴圈永遠處理最新的畫面, 而不是排在 OpenCV 緩衝區裡的舊畫面
+
+    Attributes:
+        cap (cv2.VideoCapture): 影片擷取物件
+        frames_captured (int): 已擷取的畫面數量
+        frames_dropped (int): 尚未被讀取就被新畫面覆蓋的畫面數量
+    """
+
+    def __init__(self,
+                 device: int = 0,
+                 width: int = 640,
+                 height: int = 480,
+                 fps: Optional[float] = None,
+                 fourcc: Optional[str] = "MJPG",
+                 buffer_size: Optional[int] = 1):
+        """
+        初始化攝影機並啟動擷取執行緒
+
+        Args:
+            device (int): 攝影機編號, 預設為 0
+            width (int): 畫面寬度, 預設為 640
+            height (int): 畫面高度, 預設為 480
+            fps (float, optional): 要求的攝影機 FPS, None 則使用攝影機預設值
+            fourcc (str, optional): 影像編碼 (例如 "MJPG"), None 則使用攝影機預設值
+            buffer_size (int, optional): OpenCV 內部緩衝區大小, 預設為 1 以避免舊畫面堆積
+        """
+
+        # 初始化攝影機擷取物件, 並依照設定調整攝影機參數
+        self.cap = cv2.VideoCapture(device)
+        if fourcc is not None:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps is not None:
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+        if buffer_size is not None:
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+
+        # 最新畫面的單一槽位, 以 Condition 保護並通知等待中的讀取者
+        self._cond = threading.Condition()
+        self._latest: Optional[CapturedFrame] = None
+        self._last_read_seq = 0
+        self._running = True
+        self._error: Optional[Exception] = None
+
+        # 統計資訊
+        self.frames_captured = 0
+        self.frames_dropped = 0
+
+        # 啟動背景擷取執行緒
+        self._thread = threading.Thread(target=self._capture_loop, name="CameraCapture", daemon=True)
+        self._thread.start()
+
+    def __del__(self):
+        self.release()
+
+    def _capture_loop(self) -> None:
+        """
+        背景擷取迴圈, 持續讀取畫面並覆蓋最新槽位
+        """
+        while self._running:
+            ret, image = self.cap.read()
+            timestamp = time.perf_counter()
+
+            with self._cond:
+                if not ret or image is None:
+                    # 讀取失敗則記錄錯誤並喚醒讀取者, 由讀取者決定是否拋出異常
+                    self._error = IOError("無法讀取攝影機畫面")
+                    self._running = False
+                    self._cond.notify_all()
+                    break
+
+                # 如果上一張畫面還沒被讀取就被覆蓋, 則計入丟棄數量
+                if self._latest is not None and self._latest.seq > self._last_read_seq:
+                    self.frames_dropped += 1
+
+                self.frames_captured += 1
+                self._latest = CapturedFrame(self.frames_captured, timestamp, image)
+                self._cond.notify_all()
+
+    def read(self, timeout: Optional[float] = 1.0) -> CapturedFrame:
+        """
+        讀取最新的畫面, 若最新畫面已經讀取過則等待下一張
+
+        Args:
+            timeout (float, optional): 等待新畫面的秒數, None 表示無限等待
+        Returns:
+            CapturedFrame: (seq, timestamp, image)
+        Notes:
+            - 攝影機讀取失敗或等待逾時會拋出 IOError
+        """
+        with self._cond:
+            ready = self._cond.wait_for(
+                lambda: (self._latest is not None and self._latest.seq > self._last_read_seq)
+                        or not self._running,
+                timeout=timeout)
+
+            if self._latest is not None and self._latest.seq > self._last_read_seq:
+                self._last_read_seq = self._latest.seq
+                return self._latest
+
+            if self._error is not None:
+                raise self._error
+            if not ready:
+                raise IOError("等待攝影機畫面逾時")
+            raise IOError("攝影機已關閉")
+
+    def stats(self) -> dict:
+        """
+        獲取擷取統計資訊
+
+        Returns:
+            dict: 包含 captured (已擷取), dropped (已丟棄), last_seq (最後讀取的序號)
+        """
+        with self._cond:
+            return {
+                "captured": self.frames_captured,
+                "dropped": self.frames_dropped,
+                "last_seq": self._last_read_seq,
+            }
+
+    def release(self) -> None:
+        """
+        停止擷取執行緒並釋放攝影機
+        """
+        thread = getattr(self, "_thread", None)
+        if thread is None:
+            return
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=1.0)
+        self.cap.release()
@@ -1,4 +1,7 @@
+import os
 import numpy as np
+from numpy.lib.format import open_memmap
+from typing import Callable, Optional, Sequence
 
 class HandDataAugmentation:
     """
@@ -51,6 +54,203 @@ class HandDataAugmentation:
         scale = np.random.uniform(*self.scale_range)
         return data * scale
 
+class Noise:
+    """對每個關鍵點加入常態分布噪聲"""
+
+    def __init__(self, std: float = 0.002):
+        self.std = std
+
+    def __call__(self, batch: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        return batch + rng.normal(0.0, self.std, size= batch.shape)
+
+class Shift:
+    """每筆資料整體隨機平移"""
+
+    def __init__(self, shift_range: tuple[float, float] = (-0.01, 0.01)):
+        self.shift_range = shift_range
+
+    def __call__(self, batch: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        return batch + rng.uniform(*self.shift_range, size= (len(batch), 1, 3))
+
+class Scale:
+    """每筆資料整體隨機縮放"""
+
+    def __init__(self, scale_range: tuple[float, float] = (0.95, 1.05)):
+        self.scale_range = scale_range
+
+    def __call__(self, batch: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        return batch * rng.uniform(*self.scale_range, size= (len(batch), 1, 1))
+
+class Rotate:
+    """以每筆資料的中心點為軸, 在影像平面上 (繞 z 軸) 小角度隨機旋轉"""
+
+    def __init__(self, max_degrees: float = 10.0):
+        self.max_degrees = max_degrees
+
+    def __call__(self, batch: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        angle = np.deg2rad(rng.uniform(-self.max_degrees, self.max_degrees, size= len(batch)))
+        cos, sin = np.cos(angle), np.sin(angle)
+
+        # 批次 z 軸旋轉矩陣, 形狀為 (M, 3, 3)
+        R = np.zeros((len(batch), 3, 3))
+        R[:, 0, 0], R[:, 0, 1] = cos, -sin
+        R[:, 1, 0], R[:, 1, 1] = sin, cos
+        R[:, 2, 2] = 1.0
+
+        center = batch.mean(axis= 1, keepdims= True)
+        return np.einsum("nij,nkj->nki", R, batch - center) + center
+
+class FingerJitter:
+    """
+    每根手指隨機偏移, 偏移量由手指根部到指尖逐漸增加 (根部 1/4, 指尖完整偏移), 手腕不動
+    """
+
+    # 每根手指的關鍵點 (根部 → 指尖) 與偏移權重
+    FINGERS = np.array([[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12], [13, 14, 15, 16], [17, 18, 19, 20]])
+    WEIGHTS = np.array([0.25, 0.5, 0.75, 1.0])
+
+    def __init__(self, std: float = 0.005):
+        self.std = std
+
+    def __call__(self, batch: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        offsets = rng.normal(0.0, self.std, size= (len(batch), len(self.FINGERS), 1, 3))
+        batch = batch.copy()
+        batch[:, self.FINGERS] += offsets * self.WEIGHTS[:, np.newaxis]
+        return batch
+
+class BatchAugmentation:
+    """
+    批次手部關鍵點資料增強類別
+
+    一次對 (N, 21, 3) 的資料產生每筆 K 個增強版本, 所有轉換都以向量化方式處理整批資料,
+    並使用指定種子的 np.random.Generator, 相同的種子與資料會得到相同的結果
+
+    Attributes:
+        transforms (list): 轉換列表, 每個轉換為 transform(batch, rng) -> batch
+        variants (int): 每筆資料產生的增強版本數量 K
+        mode (str): 轉換的組合方式
+            - "compose": 每個增強版本依序套用所有轉換
+            - "cycle": 第 k 個增強版本只套用第 k % len(transforms) 個轉換 (與 HandDataAugmentation 相同)
+        include_original (bool): 輸出中是否包含原始資料
+        decimals (int, optional): 四捨五入的小數位數
+    Notes:
+        - 輸出的順序為每筆資料 [原始, 增強1, ..., 增強K], 與 DataProcessor 原本的資料格式相同
+    """
+
+    MODES = ("compose", "cycle")
+
+    def __init__(self,
+                 transforms: Optional[Sequence[Callable[[np.ndarray, np.random.Generator], np.ndarray]]] = None,
+                 variants: int = 3,
+                 mode: str = "compose",
+                 seed: Optional[int] = None,
+                 include_original: bool = True,
+                 decimals: Optional[int] = 4):
+        """
+        Args:
+            transforms (Sequence, optional): 轉換列表, None 則使用 Noise, Shift, Scale, Rotate, FingerJitter
+            variants (int): 每筆資料產生的增強版本數量, 預設為 3
+            mode (str): "compose" 或 "cycle", 預設為 "compose"
+            seed (int, optional): 亂數種子, None 則每次執行結果不同
+            include_original (bool): 輸出中是否包含原始資料, 預設為 True
+            decimals (int, optional): 四捨五入的小數位數, None 則不進行四捨五入, 預設為 4
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown augmentation mode: {mode}, expected one of {self.MODES}")
+        self.transforms = list(transforms) if transforms is not None else [Noise(), Shift(), Scale(), Rotate(), FingerJitter()]
+        self.variants = variants
+        self.mode = mode
+        self.seed = seed
+        self.include_original = include_original
+        self.decimals = decimals
+        self.rng = np.random.default_rng(seed)
+
+    @classmethod
+    def legacy(cls, seed: Optional[int] = None) -> "BatchAugmentation":
+        """與 HandDataAugmentation 相同的增強方式 (噪聲、平移、縮放各一個版本), 但為批次處理並可指定種子"""
+        return cls([Noise(0.002), Shift((-0.01, 0.01)), Scale((0.95, 1.05))], variants= 3, mode= "cycle", seed= seed)
+
+    @property
+    def multiplicity(self) -> int:
+        """每筆輸入資料對應的輸出資料數量"""
+        return self.variants + int(self.include_original)
+
+    def __call__(self, data: np.ndarray) -> np.ndarray:
+        """對手部關鍵點資料進行批次增強, 詳見 augment"""
+        return self.augment(data)
+
+    def augment(self, data: np.ndarray) -> np.ndarray:
+        """
+        對手部關鍵點資料進行批次增強
+
+        Args:
+            data (np.ndarray): 手部關鍵點資料, 形狀為 (N, 21, 3) 或單筆 (21, 3)
+        Returns:
+            np.ndarray: 增強後的資料, 形狀為 (N * multiplicity, 21, 3)
+        """
+        data = np.asarray(data, dtype= np.float64).reshape(-1, 21, 3)
+
+        # 每筆資料複製 K 份, 形狀為 (N * K, 21, 3), 第 i 筆資料的第 k 個版本位於 i * K + k
+        variants = np.repeat(data, self.variants, axis= 0)
+        if self.mode == "compose":
+            for transform in self.transforms:
+                variants = transform(variants, self.rng)
+        else:
+            version = np.tile(np.arange(self.variants), len(data)) % len(self.transforms)
+            for i, transform in enumerate(self.transforms):
+                selected = version == i
+                if selected.any():
+                    variants[selected] = transform(variants[selected], self.rng)
+
+        # 依照每筆資料 [原始, 增強1, ..., 增強K] 的順序排列
+        output = variants.reshape(len(data), self.variants, 21, 3)
+        if self.include_original:
+            output = np.concatenate([data[:, np.newaxis], output], axis= 1)
+        output = output.reshape(-1, 21, 3)
+
+        return np.round(output, self.decimals) if self.decimals is not None else output
+
+    def augment_to_disk(self,
+                        data: np.ndarray,
+                        labels: Sequence,
+                        path: str,
+                        chunk_size: int = 4096,
+                        dtype: type = np.float32) -> str:
+        """
+        分批增強資料並直接寫入 npy 資料夾格式 (data.npy 與 labels.npy), 不需要將整個增強後的資料集放在記憶體中
+
+        Args:
+            data (np.ndarray): 手部關鍵點資料, 形狀為 (N, 21, 3), 可以是 mmap 陣列
+            labels (Sequence): 每筆資料的標籤, 長度為 N
+            path (str): 輸出的資料夾路徑
+            chunk_size (int): 每批處理的輸入資料數量, 預設為 4096
+            dtype (type): 輸出資料的型別, 預設為 np.float32
+        Returns:
+            str: 輸出的資料夾路徑
+        Notes:
+            - 相同的種子與 chunk_size 會得到相同的結果
+            - 輸出可以使用 LoadSave.load_dataset(mmap_mode='r') 或 iter_dataset 讀取
+        """
+        labels = np.asarray(labels)
+        if len(labels) != len(data):
+            raise ValueError(f"Data length not match: {len(labels)} != {len(data)}")
+
+        os.makedirs(path, exist_ok= True)
+        total = len(data) * self.multiplicity
+        data_out = open_memmap(os.path.join(path, "data.npy"), mode= "w+", dtype= dtype, shape= (total, 21, 3))
+        labels_out = open_memmap(os.path.join(path, "labels.npy"), mode= "w+", dtype= labels.dtype, shape= (total,))
+
+        for begin in range(0, len(data), chunk_size):
+            end = min(begin + chunk_size, len(data))
+            out_begin, out_end = begin * self.multiplicity, end * self.multiplicity
+            data_out[out_begin:out_end] = self.augment(np.asarray(data[begin:end]))
+            labels_out[out_begin:out_end] = np.repeat(labels[begin:end], self.multiplicity)
+
+        data_out.flush()
+        labels_out.flush()
+        del data_out, labels_out
+        return path
+
 if __name__ == "__main__":
     data = np.random.rand(21, 3)  # 模擬手部關鍵點資料
     aug = HandDataAugmentation()
@@ -58,4 +258,11 @@ if __name__ == "__main__":
     print(f"原始資料形狀: {data.shape}")
     print(data)
     print(f"增強後資料形狀: {augmented.shape}")  # 應為 (3, 21, 3)
-    print(augmented)
\ No newline at end of file
+    print(augmented)
+
+    # 批次增強: 100 筆資料, 每筆 5 個版本, 使用相同的種子會得到相同的結果
+    batch = np.random.rand(100, 21, 3)
+    batch_aug = BatchAugmentation(variants= 5, seed= 0)
+    augmented = batch_aug(batch)
+    print(f"批次增強後資料形狀: {augmented.shape}")  # 應為 (600, 21, 3)
+    print("相同種子結果相同:", np.array_equal(augmented, BatchAugmentation(variants= 5, seed= 0)(batch)))
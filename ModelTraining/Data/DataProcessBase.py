@@ -1,11 +1,31 @@
 import cv2
+import json
+import hashlib
 import numpy as np
-from typing import Optional, Tuple, Any
+import mediapipe
+from typing import Optional, Tuple, List, Any, Sequence, Union
 from mediapipe.python.solutions import hands
 
+from ModelTraining.Data.LandmarkRenderer import LandmarkRenderer
+
 # 初始化 mediapipe 模組
 mp_hands = hands
 
+# 前處理與正規化流程的版本, 修改 PreprocessImage 或 Normalize_Landmark_Batch 的輸出時需要遞增,
+# 讓依賴正規化結果的快取與模型能夠發現不一致
+NORMALIZATION_VERSION = 1
+
+def config_hash(config: dict) -> str:
+    """
+    計算設定的雜湊值
+
+    Args:
+        config (dict): 可以轉換為 JSON 的設定
+    Returns:
+        str: 16 字元的十六進位雜湊值
+    """
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
 class DataProcessBase:
     """
     手部關鍵點資料處理基類
@@ -17,26 +37,75 @@ class DataProcessBase:
     3. 繪製手部關鍵點並對比原始影像
     """
 
-    def __init__(self, static_image_mode: bool = True):
+    def __init__(self,
+                 static_image_mode: bool = True,
+                 input_size: Tuple[int, int] = (640, 480),
+                 roi_tracking: bool = False,
+                 roi_size: Tuple[int, int] = (256, 256),
+                 roi_margin: float = 0.6,
+                 render_mode: str = "side_by_side",
+                 render_every: int = 1,
+                 max_num_hands: int = 1):
         """
         初始化 MediaPipe 偵測手部關鍵點的物件
         Args:
             static_image_mode (bool): 是否使用靜態圖片模式, 預設為 True
+            input_size (tuple): 前處理後的畫面大小 (寬, 高), 預設為 640x480
+            roi_tracking (bool): 是否啟用手部區域追蹤, 只在上一幀手部附近的區域偵測, 預設為 False
+            roi_size (tuple): 追蹤區域送入 MediaPipe 的大小 (寬, 高), 預設為 256x256
+            roi_margin (float): 追蹤區域在手部邊界框每一側額外擴張的比例, 預設為 0.6
+            render_mode (str): 繪製手部關鍵點的模式 ("off", "overlay", "side_by_side"), 預設為 "side_by_side"
+            render_every (int): 每 N 幀繪製一次, 預設為 1
+            max_num_hands (int): 最大偵測手部數量, 預設為 1
         """
-
-        # 宣告 MediaPipe 偵測手部關鍵點的物件
-        self.mp_hands = mp_hands.Hands(
-            static_image_mode=static_image_mode,    # 設定為靜態圖片模式
-            max_num_hands=1,                        # 設定最大偵測手部數量為 1
-            min_detection_confidence=0.5,           # 最小偵測信心值
-            min_tracking_confidence=0.5             # 最小追蹤信心值
-        )
+        self.input_size = tuple(input_size)
+        self.roi_tracking = roi_tracking
+        self.roi_size = tuple(roi_size)
+        self.roi_margin = roi_margin
+
+        # 追蹤區域 (x0, y0, x1, y1) 像素座標, None 表示沒有追蹤中的手
+        self._roi: Optional[Tuple[int, int, int, int]] = None
+        self.roi_stats = {"tracked": 0, "lost": 0, "full_frame": 0}
+
+        # 手部關鍵點繪製器 (預先配置輸出緩衝區)
+        self.renderer = LandmarkRenderer(render_mode, render_every, size=self.input_size)
+
+        # MediaPipe 偵測手部關鍵點的設定
+        self.detection_config = {
+            "static_image_mode": static_image_mode,    # 設定為靜態圖片模式
+            "max_num_hands": max_num_hands,            # 設定最大偵測手部數量, 預設為 1
+            "min_detection_confidence": 0.5,           # 最小偵測信心值
+            "min_tracking_confidence": 0.5             # 最小追蹤信心值
+        }
+
+        # 宣告 MediaPipe 偵測手部關鍵點的物件, 追蹤區域使用另一個物件, 避免與整張畫面的追蹤狀態互相干擾
+        self.mp_hands = mp_hands.Hands(**self.detection_config)
+        self.mp_hands_roi = mp_hands.Hands(**self.detection_config) if roi_tracking else None
 
     def __del__(self):
         """
         釋放 MediaPipe 偵測手部關鍵點的物件
         """
         self.mp_hands.close()
+        if self.mp_hands_roi is not None:
+            self.mp_hands_roi.close()
+
+    def Pipeline_Config(self) -> dict:
+        """
+        獲取影響關鍵點輸出的所有設定 (MediaPipe 版本、偵測設定、前處理大小、正規化版本)
+
+        Returns:
+            dict: 可以轉換為 JSON 的設定, 可搭配 config_hash 計算雜湊值
+        """
+        config = {
+            "mediapipe": mediapipe.__version__,
+            "input_size": list(self.input_size),
+            "normalization_version": NORMALIZATION_VERSION,
+            **self.detection_config,
+        }
+        if self.roi_tracking:
+            config.update({"roi_size": list(self.roi_size), "roi_margin": self.roi_margin})
+        return config
 
     def Normalize_Landmark_Coords(self,
                                 landmarks: Any,
@@ -60,39 +129,135 @@ class DataProcessBase:
             - coords (numpy.ndarray): 歸一化後的手部關鍵點座標, 形狀為 (21, 3), 每個關鍵點包含 (x, y, z) 座標
         """
 
-        # 提取所有關鍵點的 x, y, z 座標為 numpy 陣列 格式為 [[x, y, z], ...], 並四捨五入到小數點後 4 位
-        coords = np.array([[lm.x, lm.y, lm.z] for lm in landmarks.landmark])
+        # 提取所有關鍵點的 x, y, z 座標為 numpy 陣列 格式為 [[x, y, z], ...]
+        raw_coords = self.Landmarks_To_Array(landmarks)
 
-        # 計算中心點
-        center = np.mean(coords, axis=0)
-        coords = coords - center
+        return self.Normalize_Landmark_Array(raw_coords, draw=draw, frame=frame)
 
-        # 計算手掌方向向量 (從手腕到中指根部)
-        direction_vector = coords[9] - coords[0]
+    def Normalize_Landmark_Array(self,
+                                 raw_coords: np.ndarray,
+                                 draw: bool = False,
+                                 frame: Optional[np.ndarray] = None) -> Tuple[Optional[np.ndarray], np.ndarray]:
+        """
+        歸一化以 numpy 陣列表示的手部關鍵點座標, 處理流程與 Normalize_Landmark_Coords 相同
 
-        # 計算Z軸旋轉角度 (使手掌朝右)
-        angle_z = np.arctan2(direction_vector[1], direction_vector[0])
+        Args:
+            raw_coords (numpy.ndarray): 原始手部關鍵點座標, 形狀為 (21, 3)
+            draw: 是否繪製關鍵點到影像上
+            frame: 若 draw=True 時要繪製的影像
+        Returns:
+            tuple: (frame, coords)
+            - frame (numpy.ndarray): 繪製後的影像, 如果 draw=False 則為 None
+            - coords (numpy.ndarray): 歸一化後的手部關鍵點座標, 形狀為 (21, 3)
+        """
 
-        # Z軸旋轉矩陣
-        Rz = np.array([
-            [np.cos(angle_z), -np.sin(angle_z), 0],
-            [np.sin(angle_z), np.cos(angle_z), 0],
-            [0, 0, 1]
-        ])
+        # 利用批次正規化處理單一手部 (N = 1), 繪製時保留未四捨五入的座標
+        decimals = None if draw and frame is not None else 4
+        coords, centers = self.Normalize_Landmark_Batch(raw_coords[np.newaxis], decimals=decimals)
 
-        # 如果有要繪製的影像, 則保留原始座標作為對比使用
-        origin_coords = coords.copy() if draw and frame is not None else None
+        # 如果有要繪製, 則將關鍵點及原始座標繪製到影像上
+        if draw and frame is not None:
+            origin_coords = raw_coords - centers[0]
+            frame = self.Render_Landmarks(frame, centers[0], coords[0], origin_coords)
+            return frame, coords[0]
+        else:
+            # 回傳歸一化後的座標, 已四捨五入到小數點後 4 位
+            return None, coords[0]
 
-        # 應用旋轉矩陣
-        coords = coords @ Rz
+    @staticmethod
+    def Landmarks_To_Array(landmarks: Any) -> np.ndarray:
+        """
+        將 MediaPipe 偵測到的手部關鍵點轉換為 numpy 陣列
 
-        # 如果有要繪製, 則將關鍵點及原始座標繪製到影像上
-        if draw and frame is not None and origin_coords is not None:
-            frame = self.Render_Landmarks(frame, center, coords, origin_coords)
-            return frame, coords
+        Args:
+            landmarks: 由 MediaPipe 偵測到的手部關鍵點
+        Returns:
+            numpy.ndarray: 關鍵點座標, 形狀為 (21, 3)
+        """
+        points = landmarks.landmark
+        return np.fromiter((v for lm in points for v in (lm.x, lm.y, lm.z)),
+                           dtype=np.float64, count=len(points) * 3).reshape(-1, 3)
+
+    @staticmethod
+    def Result_Handedness(result: Any) -> List[Tuple[str, float]]:
+        """
+        獲取 MediaPipe 偵測結果中每隻手的左右手判斷
+
+        Args:
+            result: MediaPipe 偵測結果
+        Returns:
+            list: 每隻手的 (左右手, 信心值), 順序與 multi_hand_landmarks 相同, 沒有判斷結果時為 ("Unknown", 0.0)
+        Notes:
+            - MediaPipe 假設輸入為鏡像 (自拍) 畫面, 攝影機畫面沒有水平翻轉時左右手會相反
+        """
+        landmarks = result.multi_hand_landmarks or []
+        handedness = getattr(result, "multi_handedness", None) or []
+        labels = [(h.classification[0].label, float(h.classification[0].score)) for h in handedness]
+        return labels + [("Unknown", 0.0)] * (len(landmarks) - len(labels))
+
+    @classmethod
+    def Normalize_Landmark_Batch(cls,
+                                 hands: Union[np.ndarray, Sequence[Any]],
+                                 decimals: Optional[int] = 4) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        批次歸一化手部關鍵點座標
+
+        與 Normalize_Landmark_Coords 相同的處理流程, 但一次對 N 隻手進行向量化運算:
+        1. 將每隻手的關鍵點平移使中心點置中
+        2. 計算每隻手從手腕到中指根部的方向角度
+        3. 以批次旋轉矩陣 (einsum) 將每隻手旋轉到固定方向
+
+        Args:
+            hands: 形狀為 (N, 21, 3) 的座標陣列, 或 MediaPipe 偵測結果 / 手部關鍵點的列表
+            decimals (int, optional): 四捨五入的小數位數, None 則不進行四捨五入, 預設為 4
+        Returns:
+            tuple: (coords, centers)
+            - coords (numpy.ndarray): 歸一化後的座標, 形狀為 (N, 21, 3)
+            - centers (numpy.ndarray): 每隻手的中心點, 形狀為 (N, 3)
+        Notes:
+            - 傳入 MediaPipe 偵測結果時, 會依序取出每個結果中的所有手, 沒有偵測到手的結果會被略過
+        """
+
+        # 將輸入統一轉換為 (N, 21, 3) 的陣列
+        if isinstance(hands, np.ndarray):
+            coords = np.asarray(hands, dtype=np.float64)
         else:
-            # 回傳歸一化後的座標, 並四捨五入到小數點後 4 位
-            return None, np.round(coords, 4)
+            landmark_lists = []
+            for item in hands:
+                if hasattr(item, "multi_hand_landmarks"):
+                    landmark_lists.extend(item.multi_hand_landmarks or [])
+                else:
+                    landmark_lists.append(item)
+            coords = np.array([cls.Landmarks_To_Array(lms) for lms in landmark_lists],
+                              dtype=np.float64).reshape(-1, 21, 3)
+
+        if coords.ndim != 3 or coords.shape[1:] != (21, 3):
+            raise ValueError(f"Landmark batch shape must be (N, 21, 3), got {coords.shape}")
+
+        # 計算每隻手的中心點並平移
+        centers = coords.mean(axis=1)
+        coords = coords - centers[:, np.newaxis, :]
+
+        # 計算每隻手的手掌方向向量 (從手腕到中指根部) 與 Z 軸旋轉角度
+        direction = coords[:, 9] - coords[:, 0]
+        angle_z = np.arctan2(direction[:, 1], direction[:, 0])
+        cos_z, sin_z = np.cos(angle_z), np.sin(angle_z)
+
+        # 建立批次 Z 軸旋轉矩陣, 形狀為 (N, 3, 3)
+        Rz = np.zeros((len(coords), 3, 3))
+        Rz[:, 0, 0] = cos_z
+        Rz[:, 0, 1] = -sin_z
+        Rz[:, 1, 0] = sin_z
+        Rz[:, 1, 1] = cos_z
+        Rz[:, 2, 2] = 1.0
+
+        # 應用旋轉矩陣 (每隻手的座標 @ 該手的旋轉矩陣)
+        coords = np.einsum("nij,njk->nik", coords, Rz)
+
+        if decimals is not None:
+            coords = np.round(coords, decimals)
+
+        return coords, centers
 
     def Render_Landmarks(self,
                         frame: np.ndarray,
@@ -102,7 +267,8 @@ class DataProcessBase:
         """
         在畫面上渲染手部關鍵點。
 
-        該函數在給定的影像幀上繪製手部關鍵點, 包括原始關鍵點和處理後的關鍵點, 並將兩種結果並排顯示。
+        該函數在給定的影像幀上繪製手部關鍵點, 包括原始關鍵點和處理後的關鍵點,
+        依照 renderer 的模式疊加在畫面上或將兩種結果並排顯示 (見 LandmarkRenderer)。
 
         Args:
             frame (numpy.ndarray): 要繪製關鍵點的影像幀。
@@ -110,46 +276,14 @@ class DataProcessBase:
             coords (numpy.ndarray): 處理後的手部關鍵點座標, 形狀為 (n, 3), 每個關鍵點包含 (x, y, z) 座標。
             origin_coords (numpy.ndarray): 原始手部關鍵點座標，形狀為 (n, 3), 每個關鍵點包含 (x, y, z) 座標。
         Returns:
-            numpy.ndarray: 繪製後的影像幀, 包含處理後的關鍵點和原始關鍵點。
+            numpy.ndarray: 繪製後的影像幀, 包含處理後的關鍵點和原始關鍵點, 模式為 off 時回傳 None。
         Notes:
             - 處理後的關鍵點使用綠色 (128, 255, 0) 顯示。
             - 原始關鍵點使用黃色 (0, 255, 255) 顯示。
             - 手部中心點在兩個畫面中都用藍色 (255, 0, 0) 顯示。
         """
 
-        # 獲取畫面的高、寬、色彩
-        height, width, _ = frame.shape
-        origin_frame = frame.copy()
-
-        # 獲取手部中心點座標
-        center_x, center_y, center_z = center
-
-        # 獲取手部中心點在畫面中的像素位置, 並繪製在畫面上
-        handCenter_x, handCenter_y = int(
-            center_x * width), int(center_y * height)  # 手部中心點在畫面中的像素位置
-
-        # 繪製原始手部關鍵點
-        cv2.circle(origin_frame, (handCenter_x, handCenter_y),
-                   5, (255, 0, 0), -1)
-        if origin_coords is not None:
-            Pos = np.array([[int((center_x + x) * width), int((center_y + y) * height)]
-                           for x, y, z in origin_coords])
-            for p in Pos:
-                cv2.circle(origin_frame, p, 5, (0, 255, 255), -1)
-
-        # 繪製處理後的手部關鍵點
-        cv2.circle(frame, (handCenter_x, handCenter_y), 5, (255, 0, 0), -1)
-        Pos = np.array([[int((center_x + x) * width),
-                       int((center_y + y) * height)] for x, y, z in coords])
-        for p in Pos:
-            cv2.circle(frame, p, 5, (128, 255, 0), -1)
-
-        # 將兩個畫面並排顯示
-        origin_frame = cv2.resize(origin_frame, (640, 480))
-        frame = cv2.resize(frame, (640, 480))
-        frame = cv2.hconcat([frame, origin_frame])
-
-        return frame
+        return self.renderer.render(frame, center, coords, origin_coords)
 
     def PreprocessImage(self, frame: np.ndarray) -> Tuple[np.ndarray, Any]:
         """
@@ -163,16 +297,127 @@ class DataProcessBase:
             - result (mp.solutions.hands.Hands): MediaPipe 偵測結果, 包含手部關鍵點資訊
         """
 
+        # 啟用追蹤時只需要轉換追蹤區域的顏色, 不轉換整張畫面
+        if self.roi_tracking:
+            frame, _ = self.PrepareFrame(frame, convert=False)
+            return frame, self.DetectHandsTracked(frame)
+
+        # 旋轉、調整大小並轉換為 RGB 格式
+        frame, imgRGB = self.PrepareFrame(frame)
+
+        # 利用 MediaPipe 偵測手部關鍵點
+        result = self.DetectHands(imgRGB)
+
+        return frame, result
+
+    def PrepareFrame(self, frame: np.ndarray, convert: bool = True) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        將圖片統一旋轉為橫向、調整大小為 input_size (預設 640x480), 並轉換為 RGB 格式
+
+        Args:
+            frame (numpy.ndarray): 要處理的 BGR 圖片
+            convert (bool): 是否轉換為 RGB 格式, 預設為 True
+        Returns:
+            tuple: (frame, imgRGB)
+            - frame (numpy.ndarray): 處理後的 BGR 圖片
+            - imgRGB (numpy.ndarray): 處理後的 RGB 圖片, 用於 MediaPipe 偵測, convert=False 時為 None
+        Notes:
+            - 圖片已經是 input_size 大小時 (例如攝影機設定為 640x480) 不會重新調整大小
+        """
+
         # 獲取圖片的高、寬、色彩, 並將圖片統一旋轉為橫向
         height, width, _ = frame.shape
         if height > width:
             frame = cv2.rotate(frame, cv2.ROTATE_90_COUNTERCLOCKWISE)
+            height, width = width, height
 
-        # 將圖片轉換為 RGB 格式, 並將圖片大小統一為 640x480以加速處理
-        frame = cv2.resize(frame, (640, 480))
-        imgRGB = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        # 將圖片大小統一為 input_size 以加速處理, 已經是目標大小時略過
+        if (width, height) != self.input_size:
+            frame = cv2.resize(frame, self.input_size)
 
-        # 利用 MediaPipe 偵測手部關鍵點
-        result = self.mp_hands.process(imgRGB)
+        # 將圖片轉換為 RGB 格式
+        imgRGB = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) if convert else None
 
-        return frame, result
+        return frame, imgRGB
+
+    def DetectHands(self, imgRGB: np.ndarray) -> Any:
+        """
+        利用 MediaPipe 偵測手部關鍵點
+
+        Args:
+            imgRGB (numpy.ndarray): RGB 圖片
+        Returns:
+            mp.solutions.hands.Hands: MediaPipe 偵測結果, 包含手部關鍵點資訊
+        """
+        return self.mp_hands.process(imgRGB)
+
+    def DetectHandsTracked(self, frame: np.ndarray) -> Any:
+        """
+        利用手部區域追蹤偵測手部關鍵點
+
+        1. 上一幀有偵測到手時, 只裁切手部附近擴張後的正方形區域, 縮放到 roi_size 後送入 MediaPipe
+        2. 將區域中的關鍵點座標換算回整張畫面的相對座標, 讓後續的正規化與繪製不需要修改
+        3. 沒有追蹤中的手或區域中找不到手時, 改為偵測整張畫面
+
+        Args:
+            frame (numpy.ndarray): PrepareFrame 處理後的 BGR 圖片
+        Returns:
+            mp.solutions.hands.Hands: MediaPipe 偵測結果, 關鍵點為整張畫面的相對座標
+        """
+        height, width = frame.shape[:2]
+
+        result = None
+        if self._roi is not None:
+            x0, y0, x1, y1 = self._roi
+            crop = cv2.resize(frame[y0:y1, x0:x1], self.roi_size)
+            result = self.mp_hands_roi.process(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
+
+            if result.multi_hand_landmarks:
+                # 將區域中的相對座標換算回整張畫面的相對座標 (z 與 x 使用相同的比例)
+                crop_width, crop_height = x1 - x0, y1 - y0
+                for hand in result.multi_hand_landmarks:
+                    for lm in hand.landmark:
+                        lm.x = (x0 + lm.x * crop_width) / width
+                        lm.y = (y0 + lm.y * crop_height) / height
+                        lm.z = lm.z * crop_width / width
+                self.roi_stats["tracked"] += 1
+            else:
+                self.roi_stats["lost"] += 1
+                result = None
+
+        # 追蹤失敗時偵測整張畫面
+        if result is None:
+            result = self.DetectHands(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            self.roi_stats["full_frame"] += 1
+
+        self._roi = self._Track_ROI(result, width, height)
+        return result
+
+    def _Track_ROI(self, result: Any, width: int, height: int) -> Optional[Tuple[int, int, int, int]]:
+        """
+        以所有偵測到的手的關鍵點計算下一幀的追蹤區域 (涵蓋所有手的邊界框)
+
+        Args:
+            result: MediaPipe 偵測結果 (整張畫面的相對座標)
+            width (int): 畫面寬度
+            height (int): 畫面高度
+        Returns:
+            tuple: 正方形追蹤區域 (x0, y0, x1, y1), 沒有偵測到手或區域接近整張畫面 (裁切沒有好處) 時回傳 None
+        """
+        if not result.multi_hand_landmarks:
+            return None
+
+        coords = np.concatenate([self.Landmarks_To_Array(hand) for hand in result.multi_hand_landmarks])
+        xs, ys = coords[:, 0] * width, coords[:, 1] * height
+        center_x, center_y = (xs.min() + xs.max()) / 2, (ys.min() + ys.max()) / 2
+
+        # 以手部邊界框較長的一邊擴張後作為正方形區域的邊長, 並限制最小邊長避免區域過小
+        side = int(max(xs.max() - xs.min(), ys.max() - ys.min()) * (1 + 2 * self.roi_margin))
+        side = max(side, min(self.roi_size))
+        if side > 0.75 * min(width, height):
+            return None
+
+        # 將區域平移到畫面內
+        x0 = int(min(max(center_x - side / 2, 0), width - side))
+        y0 = int(min(max(center_y - side / 2, 0), height - side))
+        return x0, y0, x0 + side, y0 + side
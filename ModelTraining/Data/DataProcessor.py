@@ -1,18 +1,74 @@
 import cv2
 import os
+import sys
+import multiprocessing
 import numpy as np
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
 
-from ModelTraining.Data.DataProcessBase import DataProcessBase
-from ModelTraining.Data.DataAugmentation import HandDataAugmentation
+from Models import _LoadSave as LoadSave
+from ModelTraining.Data.DataProcessBase import DataProcessBase, config_hash
+from ModelTraining.Data.LandmarkCache import LandmarkCache, CacheEntry
+from ModelTraining.Data.DataAugmentation import BatchAugmentation
 
 # 設定資料夾路徑
 DIR_PATH = os.path.dirname(os.path.abspath(__file__))
 UNPROCESSDATA_PATH = os.path.join(DIR_PATH, "RawImgs")
 DATASETS_PATH = os.path.join(DIR_PATH, "DataSets")
+CACHE_PATH = os.path.join(DIR_PATH, "Cache", "landmarks.npz")
 
 # 設定 numpy 的印出格式, 關閉科學記號表示法
 np.set_printoptions(suppress=True)
 
+def _detect_image(processor: DataProcessBase, img_path: str, show: bool = False,
+                  content: Optional[bytes] = None) -> Optional[np.ndarray]:
+    """
+    讀取單張圖片並偵測手部關鍵點
+
+    Args:
+        processor (DataProcessBase): 用來偵測手部關鍵點的物件
+        img_path (str): 圖片路徑
+        show (bool): 是否顯示正規化後的關鍵點
+        content (bytes, optional): 已讀取的圖片檔案內容, 提供時直接解碼而不重新讀取檔案
+    Returns:
+        np.ndarray: 原始 (未正規化) 手部關鍵點, 形狀為 (n_hands, 21, 3), 沒有偵測到手時 n_hands 為 0
+        None: 圖片讀取失敗
+    """
+
+    # 讀取圖片, 如果圖片轉換失敗則回傳 None
+    if content is not None:
+        frame = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), cv2.IMREAD_COLOR)
+    else:
+        frame = cv2.imread(img_path)
+    if frame is None:
+        return None
+
+    # 將圖片進行預處理
+    frame, result = processor.PreprocessImage(frame)
+    if result.multi_hand_landmarks is None:
+        return np.empty((0, 21, 3))
+
+    if show:
+        # 如果有要繪製的影像, 則顯示處理後的影像
+        for hand_lmks in result.multi_hand_landmarks:
+            frame, _ = processor.Normalize_Landmark_Coords(hand_lmks, draw= show, frame= frame)
+            cv2.imshow("HandRecognition", frame)
+
+    return np.array([processor.Landmarks_To_Array(hand_lmks) for hand_lmks in result.multi_hand_landmarks])
+
+# 平行處理時, 每個工作行程擁有自己的 MediaPipe Hands 物件
+_worker_processor: Optional[DataProcessBase] = None
+
+def _init_worker() -> None:
+    """初始化工作行程的 MediaPipe Hands 物件"""
+    global _worker_processor
+    _worker_processor = DataProcessBase(static_image_mode= True)
+
+def _detect_worker(img_path: str) -> Optional[np.ndarray]:
+    """工作行程的偵測函數, 詳見 _detect_image"""
+    assert _worker_processor is not None
+    return _detect_image(_worker_processor, img_path)
+
 class HandRecognition_DataTransform(DataProcessBase):
     """
     手部關鍵點資料處理類別
@@ -26,18 +82,31 @@ class HandRecognition_DataTransform(DataProcessBase):
     4. 儲存處理後的資料
 
     Attributes:
-        augmentation (DataAugmentation.HandDataAugmentation): 資料增強工具
+        augmentation (DataAugmentation.BatchAugmentation): 資料增強工具 (與原本相同的噪聲、平移、縮放各一個版本)
+        seed (int, optional): 資料增強的亂數種子
+        cache (LandmarkCache): 手部關鍵點快取, 停用快取時為 None
         labels (list[str]): 訓練標籤
         category_labels (list[str]): 所有資料類別的名稱
         unProcessData (list[list[str]]): 所有資料類別的訓練資料
         processedData (np.ndarray): 處理後的資料
+        baseData (np.ndarray): 增強前的正規化資料, 用於 saveAugmentedData
+        baseLabels (list[str]): 增強前的標籤
     """
 
-    def __init__(self):
+    def __init__(self, use_cache: bool = True, seed: Optional[int] = 0):
+        """
+        Args:
+            use_cache (bool): 是否使用手部關鍵點快取, 預設為 True
+            seed (int, optional): 資料增強的亂數種子, 相同的種子會產生相同的資料集, None 則每次不同, 預設為 0
+        """
         super().__init__(static_image_mode= True)
 
         # 宣告資料增強工具
-        self.augmentation = HandDataAugmentation()
+        self.seed = seed
+        self.augmentation = BatchAugmentation.legacy(seed= seed)
+
+        # 宣告手部關鍵點快取, 以偵測與正規化設定的雜湊值區分快取版本
+        self.cache = LandmarkCache(CACHE_PATH, config_hash(self.Pipeline_Config())) if use_cache else None
 
         # 訓練標籤
         self.labels: list[str] = []
@@ -52,28 +121,35 @@ class HandRecognition_DataTransform(DataProcessBase):
         
         # 準備儲存處理後的資料
         self.processedData: np.ndarray = np.empty((0, 21, 3), dtype= np.float32)
+        self.baseData: np.ndarray = np.empty((0, 21, 3))
+        self.baseLabels: list[str] = []
 
-    def ProcessingImages(self, show: bool = False) -> None:
+    def ProcessingImages(self, show: bool = False, workers: Optional[int] = None) -> None:
         """
         處理原始手勢資料，將其轉換為機器學習模型可用的格式
         
         此函數執行以下步驟：
         1. 檢查所需資料夾是否存在
         2. 遍歷每個類別的圖像數據
-        3. 對每張圖像執行手部關鍵點檢測
-        4. 標準化關鍵點座標
-        5. 進行數據增強
+        3. 以圖片內容雜湊值查詢快取, 只對新增或修改過的圖像執行手部關鍵點檢測
+        4. 以 Normalize_Landmark_Batch 一次批次標準化新偵測到的關鍵點座標
+        5. 以快取或新偵測的正規化座標進行數據增強
         6. 將處理後的數據存入類別變數中
         
         Args:
             show (bool): 是否顯示處理過程的可視化結果, 預設為 False
+            workers (int, optional): 平行處理的行程數量, None 或 1 則在目前行程中依序處理
         Returns:
             None: 處理結果儲存在類別變數 processedData 和 labels 中
         Notes:
             - 使用.saveData()方法來儲存處理後的數據
             - 如果 show=True, 將會顯示處理過程的可視化結果,
-              並在每次處理完一張圖片後等待使用者按下任意鍵確認
+              並在每次處理完一張圖片後等待使用者按下任意鍵確認 (偵測、顯示與確認依序對每張圖片進行,
+              快取命中的圖片以快取中的關鍵點繪製)
             - 如果 show=False, 則在處理完成後顯示總結資訊
+            - 平行模式 (workers > 1) 只在 show=False 時使用, 每個行程擁有自己的 MediaPipe Hands 物件,
+              結果依照原本的圖片順序合併, 因此資料與標籤的順序與依序處理時相同
+            - 沒有偵測到手的圖片會記錄在快取中並略過, 不再移動到 .NoHand 資料夾
         """
 
         # 檢查資料夾是否存在
@@ -85,83 +161,165 @@ class HandRecognition_DataTransform(DataProcessBase):
         # 顯示所有類別
         print("Categorys:", self.category_labels)
 
-        # 依照類別處理轉換影像
-        for category, images in zip(self.category_labels, self.unProcessData):
-            # 略過放置沒有手的資料夾, 之後會將沒有手的資料移到這裡
-            if category == ".NoHand":
+        # 依照類別收集所有要處理的圖片 (類別, 圖片名稱, 圖片路徑), 略過放置沒有手的資料夾
+        tasks: list[tuple[str, str, str]] = [
+            (category, img, os.path.join(UNPROCESSDATA_PATH, category, img))
+            for category, images in zip(self.category_labels, self.unProcessData)
+            if category != ".NoHand"
+            for img in images
+        ]
+
+        # 讀取每張圖片的內容並查詢快取
+        contents: list[Optional[bytes]] = []
+        keys: list[Optional[str]] = []
+        entries: list[Optional[CacheEntry]] = []
+        for _, _, img_path in tasks:
+            try:
+                with open(img_path, "rb") as file:
+                    content = file.read()
+            except OSError:
+                content = None
+            key = LandmarkCache.Key(content) if content is not None and self.cache is not None else None
+            contents.append(content)
+            keys.append(key)
+            entries.append(self.cache.get(key) if key is not None and self.cache is not None else None)
+
+        # 只對快取未命中的圖片偵測手部關鍵點, 平行模式下結果順序與輸入相同
+        # show=True 時在下面的迴圈中逐張偵測並顯示, 讓畫面與處理訊息同步
+        pending = [i for i, entry in enumerate(entries) if entry is None and contents[i] is not None and not show]
+        if workers is not None and workers > 1 and not show:
+            detections = self._DetectParallel([tasks[i][2] for i in pending], workers)
+        else:
+            detections = [_detect_image(self, tasks[i][2], False, contents[i]) for i in pending]
+
+        # 將新偵測到的手部關鍵點一次批次正規化, 並寫入快取
+        detected = [(i, hands_coords) for i, hands_coords in zip(pending, detections) if hands_coords is not None]
+        if detected:
+            counts = [len(hands_coords) for _, hands_coords in detected]
+            normalized, _ = self.Normalize_Landmark_Batch(np.concatenate([coords for _, coords in detected]))
+            for (i, hands_coords), start, end in zip(detected, np.cumsum([0] + counts[:-1]), np.cumsum(counts)):
+                entries[i] = CacheEntry(hands_coords, normalized[start:end])
+                if self.cache is not None and keys[i] is not None:
+                    self.cache.put(keys[i], hands_coords, normalized[start:end])
+
+        # 依照原本的圖片順序收集正規化後的手部座標與對應類別
+        normalized_hands: list[np.ndarray] = []
+        hand_categories: list[str] = []
+
+        for (category, img, img_path), content, key, entry in zip(tasks, contents, keys, entries):
+            # 逐張偵測 (快取未命中) 或繪製快取中的關鍵點, 並顯示這一張圖片
+            if show and content is not None:
+                entry = self._ShowImage(img_path, content, key, entry)
+
+            # 如果圖片讀取失敗則發出警告並跳過
+            if entry is None:
+                print(f"Error: Error in reading {img_path}")
                 continue
 
-            # 獲取目前類別的資料夾路徑
-            category_path = os.path.join(UNPROCESSDATA_PATH, category)
-
-            # 依序讀取每一張圖片
-            for img in images:
-                # 獲取圖片路徑
-                img_path = os.path.join(category_path, img)
-
-                # 讀取圖片, 如果圖片轉換失敗則發出警告並跳過
-                frame = cv2.imread(img_path)
-                if frame is None:
-                    print(f"Error: Error in reading {img_path}")
-                    continue
-
-                # 將圖片進行預處理
-                frame, result = self.PreprocessImage(frame)
-
-                if result is None:
-                    # 如果沒有偵測到手部關鍵點, 則發出警告
-                    print(f"Warning: No hand in {img}")
-
-                    # 並將圖片移到沒有手的資料夾
-                    os.rename(img_path, os.path.join(UNPROCESSDATA_PATH, ".NoHand", img))
-                    continue
-
-                # 如果偵測到手部關鍵點, 則進行處理
-                # 將偵測到的每一個手依序處理 (目前只支援單手)
-                for hand_lmks in result.multi_hand_landmarks:
-                    # 使用 Normalize_Landmark_Coords 將手部關鍵點座標進行標準化處理
-                    frame, landmarks = self.Normalize_Landmark_Coords(hand_lmks, draw= show, frame= frame)
-                    if frame is not None:
-                        # 如果有要繪製的影像, 則顯示處理後的影像
-                        cv2.imshow("HandRecognition", frame)
-
-                    # 將標準化後的手部資料進行增強處理
-                    augmented_landmarks = np.append([landmarks], self.augmentation(landmarks), axis= 0)
-                    augmented_landmarks = np.round(augmented_landmarks, 4)
-
-                    # 將增強後的資料加入到 processedData 中, 等待儲存
-                    self.processedData = np.append(self.processedData, augmented_landmarks, axis= 0)
-
-                    # 將 len(augmented_landmarks) 個標籤加入到 labels 中
-                    # 這裡的 len(augmented_landmarks) 是經過資料增強後的資料筆數
-                    for _ in range(len(augmented_landmarks)):
-                        self.labels.append(category)
-                
-                # 顯示處理完成的訊息
-                print(f"Info: Data {img} processed.")
-
-                # show= True: 按任何按鍵繼續, False: 直接往下進行
-                cv2.waitKey(0) if show else cv2.waitKey(1)
-        
+            # 如果沒有偵測到手部關鍵點, 則發出警告並跳過 (結果已記錄在快取中, 不再移動圖片)
+            if len(entry.raw) == 0:
+                print(f"Warning: No hand in {img}")
+                continue
+
+            # 將偵測到的每一個手依序加入 (目前只支援單手)
+            normalized_hands.extend(entry.normalized)
+            hand_categories.extend([category] * len(entry.normalized))
+
+            # 顯示處理完成的訊息
+            print(f"Info: Data {img} processed.")
+
+            # show= True: 按任何按鍵繼續, False: 直接往下進行
+            if show:
+                cv2.waitKey(0)
+
         # 關閉所有視窗
         cv2.destroyAllWindows()
 
+        # 儲存快取並顯示命中統計
+        if self.cache is not None:
+            self.cache.save()
+            print("Info: Landmark cache", self.cache.stats())
+
+        # 將標準化後的手部資料一次批次增強, 每筆資料為 [原始, 增強1, 增強2, ...] (已四捨五入到小數點後 4 位)
+        base = np.array(normalized_hands, dtype= np.float64).reshape(-1, 21, 3)
+        self.baseData = np.concatenate([self.baseData, base], axis= 0)
+        self.baseLabels.extend(hand_categories)
+
+        # 每筆資料對應 multiplicity 個標籤 (原始加上增強後的資料筆數)
+        self.labels.extend(np.repeat(hand_categories, self.augmentation.multiplicity).tolist())
+
+        # 將增強後的資料合併到 processedData 中, 等待儲存
+        self.processedData = np.concatenate([self.processedData, self.augmentation(base)], axis= 0)
+
         # 如果不顯示處理過程, 則顯示處理完成的訊息
         if not show:
             print(f"Info: {len(self.processedData)} data processed.")
 
-    def saveData(self) -> None:
+    def _ShowImage(self, img_path: str, content: bytes, key: Optional[str],
+                   entry: Optional[CacheEntry]) -> Optional[CacheEntry]:
+        """
+        顯示單張圖片的處理結果 (show=True 時使用), 快取未命中時偵測並寫入快取
+
+        Args:
+            img_path (str): 圖片路徑
+            content (bytes): 圖片檔案內容
+            key (str, optional): 快取鍵值
+            entry (CacheEntry, optional): 快取中的結果, None 則重新偵測
+        Returns:
+            CacheEntry: 這張圖片的原始與正規化關鍵點, 圖片讀取失敗時為 None
+        """
+        if entry is None:
+            hands_coords = _detect_image(self, img_path, True, content)
+            if hands_coords is None:
+                return None
+            normalized = self.Normalize_Landmark_Batch(hands_coords)[0] if len(hands_coords) else hands_coords
+            entry = CacheEntry(hands_coords, normalized)
+            if self.cache is not None and key is not None:
+                self.cache.put(key, hands_coords, normalized)
+            return entry
+
+        # 快取命中: 以快取中的原始關鍵點在前處理後的圖片上繪製
+        frame = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is not None and len(entry.raw):
+            frame, _ = self.PrepareFrame(frame, convert=False)
+            for raw_coords in entry.raw:
+                frame, _ = self.Normalize_Landmark_Array(raw_coords, draw=True, frame=frame)
+            cv2.imshow("HandRecognition", frame)
+        return entry
+
+    def _DetectParallel(self, img_paths: list[str], workers: int) -> list[Optional[np.ndarray]]:
+        """
+        以行程池平行偵測多張圖片的手部關鍵點
+
+        Args:
+            img_paths (list[str]): 圖片路徑
+            workers (int): 行程數量
+        Returns:
+            list: 與 img_paths 順序相同的偵測結果, 詳見 _detect_image
+        """
+        if not img_paths:
+            return []
+
+        # 每個行程處理數張圖片後再回傳, 以減少行程間通訊的次數
+        # 使用 spawn 啟動行程, 避免 fork 複製到主行程中已初始化的 MediaPipe 物件
+        chunksize = max(1, len(img_paths) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            return list(executor.map(_detect_worker, img_paths, chunksize=chunksize))
+
+    def saveData(self, npy_layout: bool = False) -> None:
         """
         儲存處理後的資料到檔案中
 
         此函數將處理後的資料儲存為 .npz 格式的檔案, 以便於後續使用。
 
         Args:
-            None
+            npy_layout (bool): 是否同時儲存為 npy 資料夾格式 (可使用 mmap_mode 零複製載入), 預設為 False
         Returns:
             None
         Notes:
             - 儲存的檔案名稱為 handData_{資料筆數}_.npz
+            - npy 資料夾格式為 handData_{資料筆數}_/data.npy 與 labels.npy
             - 儲存的資料包含 labels 和 processedData
             - 如果 labels 和 processedData 的長度不一致, 則會引發 ValueError
         """
@@ -182,10 +340,50 @@ class HandRecognition_DataTransform(DataProcessBase):
         if not(np.array_equal(test_data['labels'], self.labels) and np.array_equal(test_data['data'], self.processedData)):
             raise ValueError("Data not saved correctly")
         
+        # 同時儲存為 npy 資料夾格式, 讓訓練程式可以使用 mmap 載入
+        if npy_layout:
+            LoadSave.save_dataset_npy(file_name[:-len(".npz")], self.processedData, self.labels)
+
         # 顯示儲存完成的訊息
         print(f"\nDataSet saved to {file_path}")
 
+    def saveAugmentedData(self,
+                          variants: int = 10,
+                          augmentation: Optional[BatchAugmentation] = None,
+                          chunk_size: int = 4096) -> str:
+        """
+        以增強前的資料產生更大的增強資料集, 分批直接寫入 npy 資料夾格式, 記憶體用量不隨資料集大小增加
+
+        Args:
+            variants (int): 每筆資料產生的增強版本數量, 預設為 10
+            augmentation (BatchAugmentation, optional): 資料增強工具, None 則使用所有轉換 (包含旋轉與手指偏移) 並使用 self.seed
+            chunk_size (int): 每批處理的資料數量, 預設為 4096
+        Returns:
+            str: 資料集資料夾路徑
+        Notes:
+            - 必須先執行 ProcessingImages
+            - 資料集名稱為 handData_{資料筆數}_aug{K}s{種子} (沒有種子時省略 s{種子}), 可以使用 LoadSave.load_dataset 或 iter_dataset 讀取
+        """
+        if len(self.baseData) == 0:
+            raise ValueError("No processed data, run ProcessingImages first")
+
+        augmentation = augmentation or BatchAugmentation(variants= variants, seed= self.seed)
+        total = len(self.baseData) * augmentation.multiplicity
+        name = f"handData_{total}_aug{augmentation.variants}" + ("" if augmentation.seed is None else f"s{augmentation.seed}")
+        path = augmentation.augment_to_disk(self.baseData, self.baseLabels, os.path.join(DATASETS_PATH, name),
+                                            chunk_size= chunk_size)
+
+        print(f"\nAugmented dataset ({total} data) saved to {path}")
+        return path
+
 if __name__ == "__main__":
+    # 可以指定平行處理的行程數量, 例如: python DataProcessor.py 4 (平行模式不顯示處理過程)
+    # 第二個參數為額外產生的增強資料集每筆資料的版本數量, 例如: python DataProcessor.py 4 20
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    variants = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
     handRecognition = HandRecognition_DataTransform()
-    handRecognition.ProcessingImages(show= True)
-    handRecognition.saveData()
\ No newline at end of file
+    handRecognition.ProcessingImages(show= workers is None, workers= workers)
+    handRecognition.saveData()
+    if variants is not None:
+        handRecognition.saveAugmentedData(variants= variants)
\ No newline at end of file
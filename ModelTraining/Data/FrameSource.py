@@ -0,0 +1,316 @@
+import os
+import cv2
+import time
+import numpy as np
+from typing import Optional, NamedTuple
+
+from ModelTraining.Data.CameraCapture import CameraCapture
+
+class Frame(NamedTuple):
+    """
+    畫面來源輸出的單一畫面
+
+    Attributes:
+        seq (int): 畫面序號, 從 1 開始遞增
+        timestamp (float): 畫面產生時間 (time.perf_counter 秒數)
+        image (np.ndarray): BGR 畫面
+        landmarks (np.ndarray, optional): 合成的原始手部關鍵點, 形狀為 (21, 3) (多手時為 (N, 21, 3)), 只有合成來源會提供
+    """
+    seq: int
+    timestamp: float
+    image: np.ndarray
+    landmarks: Optional[np.ndarray] = None
+
+class FrameSource:
+    """
+    畫面來源基類
+
+    所有畫面來源都提供 read() / stats() / release(), 讀取到結尾時 read() 拋出 EOFError
+
+    Attributes:
+        realtime (bool): 是否依照 fps 控制輸出速度 (即時模式), False 則盡可能快速輸出
+        fps (float): 即時模式下的輸出速度
+        frames_read (int): 已輸出的畫面數量
+    """
+
+    def __init__(self, fps: float = 30.0, realtime: bool = False):
+        self.fps = fps
+        self.realtime = realtime
+        self.frames_read = 0
+        self._start: Optional[float] = None
+
+    def __del__(self):
+        self.release()
+
+    def _pace(self) -> float:
+        """
+        即時模式下等待到下一幀應該輸出的時間, 並回傳目前時間
+        """
+        now = time.perf_counter()
+        if self._start is None:
+            self._start = now
+        if self.realtime and self.fps > 0:
+            target = self._start + self.frames_read / self.fps
+            if target > now:
+                time.sleep(target - now)
+                now = time.perf_counter()
+        return now
+
+    def _emit(self, image: np.ndarray, landmarks: Optional[np.ndarray] = None) -> Frame:
+        """依照輸出速度產生下一個 Frame"""
+        timestamp = self._pace()
+        self.frames_read += 1
+        return Frame(self.frames_read, timestamp, image, landmarks)
+
+    def read(self, timeout: Optional[float] = 1.0) -> Frame:
+        """
+        讀取下一個畫面
+
+        Args:
+            timeout (float, optional): 等待畫面的秒數 (只有攝影機來源使用)
+        Returns:
+            Frame: (seq, timestamp, image, landmarks)
+        Notes:
+            - 讀取到結尾時拋出 EOFError, 讀取失敗時拋出 IOError
+        """
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        """
+        獲取畫面來源統計資訊
+        """
+        return {"read": self.frames_read, "dropped": 0}
+
+    def release(self) -> None:
+        """
+        釋放畫面來源
+        """
+        pass
+
+class CameraSource(FrameSource):
+    """
+    攝影機畫面來源, 以 CameraCapture 在背景執行緒擷取最新的畫面
+    """
+
+    def __init__(self,
+                 device: int = 0,
+                 width: int = 640,
+                 height: int = 480,
+                 fps: Optional[float] = None,
+                 fourcc: Optional[str] = "MJPG",
+                 buffer_size: Optional[int] = 1):
+        """
+        Args:
+            device (int): 攝影機編號, 預設為 0
+            width (int): 畫面寬度, 預設為 640
+            height (int): 畫面高度, 預設為 480
+            fps (float, optional): 要求的攝影機 FPS, None 則使用攝影機預設值
+            fourcc (str, optional): 影像編碼, 預設為 "MJPG"
+            buffer_size (int, optional): OpenCV 內部緩衝區大小, 預設為 1
+        """
+        super().__init__(fps or 30.0, realtime=False)
+        self.capture = CameraCapture(device, width, height, fps=fps, fourcc=fourcc, buffer_size=buffer_size)
+
+    def read(self, timeout: Optional[float] = 1.0) -> Frame:
+        seq, timestamp, image = self.capture.read(timeout)
+        self.frames_read += 1
+        return Frame(seq, timestamp, image)
+
+    def stats(self) -> dict:
+        stats = self.capture.stats()
+        return {"read": self.frames_read, "captured": stats["captured"], "dropped": stats["dropped"]}
+
+    def release(self) -> None:
+        capture = getattr(self, "capture", None)
+        if capture is not None:
+            capture.release()
+
+class VideoFileSource(FrameSource):
+    """
+    影片檔畫面來源, 用來重播錄製的畫面
+    """
+
+    def __init__(self, path: str, realtime: bool = False, loop: bool = False):
+        """
+        Args:
+            path (str): 影片檔路徑
+            realtime (bool): 是否依照影片 FPS 輸出, 預設為 False (盡可能快速輸出)
+            loop (bool): 讀取到結尾時是否從頭開始, 預設為 False
+        """
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise FileNotFoundError(f"Cannot open video {path}")
+        super().__init__(self.cap.get(cv2.CAP_PROP_FPS) or 30.0, realtime)
+        self.loop = loop
+
+    def read(self, timeout: Optional[float] = 1.0) -> Frame:
+        ret, image = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, image = self.cap.read()
+        if not ret or image is None:
+            raise EOFError("End of video")
+        return self._emit(image)
+
+    def release(self) -> None:
+        cap = getattr(self, "cap", None)
+        if cap is not None:
+            cap.release()
+
+class ImageFolderSource(FrameSource):
+    """
+    圖片資料夾畫面來源, 依照檔名排序輸出資料夾 (包含子資料夾) 中的所有圖片
+    """
+
+    IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+    def __init__(self, path: str, fps: float = 30.0, realtime: bool = False, loop: bool = False):
+        """
+        Args:
+            path (str): 圖片資料夾路徑
+            fps (float): 即時模式下的輸出速度, 預設為 30
+            realtime (bool): 是否依照 fps 輸出, 預設為 False (盡可能快速輸出)
+            loop (bool): 讀取到結尾時是否從頭開始, 預設為 False
+        """
+        super().__init__(fps, realtime)
+        self.loop = loop
+        self.paths = sorted(os.path.join(root, file)
+                            for root, _, files in os.walk(path)
+                            for file in files if file.lower().endswith(self.IMAGE_EXTENSIONS))
+        if not self.paths:
+            raise FileNotFoundError(f"No images in {path}")
+        self._next = 0
+
+    def read(self, timeout: Optional[float] = 1.0) -> Frame:
+        while True:
+            if self._next >= len(self.paths):
+                if not self.loop:
+                    raise EOFError("End of image folder")
+                self._next = 0
+
+            path = self.paths[self._next]
+            self._next += 1
+            image = cv2.imread(path)
+            if image is not None:
+                return self._emit(image)
+            print(f"Error: Error in reading {path}")
+
+class SyntheticLandmarkSource(FrameSource):
+    """
+    合成手部關鍵點畫面來源
+
+    產生空白畫面並附上合成的原始手部關鍵點 (MediaPipe 影像座標, x / y 介於 0 ~ 1),
+    手會在畫面中緩慢移動並在張開與握拳之間切換, 讓即時迴圈可以在沒有攝影機與 MediaPipe 的情況下測試
+
+    Notes:
+        - getCoordData 收到附有 landmarks 的畫面時會略過 MediaPipe 偵測
+    """
+
+    # 每根手指 (拇指, 食指, 中指, 無名指, 小指) 的方向角度 (度) 與各指節長度
+    FINGER_ANGLES = (-150.0, -105.0, -90.0, -75.0, -60.0)
+    FINGER_LENGTHS = ((0.05, 0.04, 0.035, 0.03), (0.1, 0.045, 0.03, 0.025), (0.1, 0.05, 0.035, 0.025),
+                      (0.095, 0.045, 0.03, 0.025), (0.09, 0.035, 0.025, 0.02))
+
+    def __init__(self,
+                 n_frames: Optional[int] = None,
+                 fps: float = 30.0,
+                 realtime: bool = False,
+                 size: tuple[int, int] = (640, 480),
+                 gesture_period: float = 2.0,
+                 seed: int = 0,
+                 n_hands: int = 1):
+        """
+        Args:
+            n_frames (int, optional): 產生的畫面數量, None 則無限產生
+            fps (float): 合成畫面的 FPS, 用來計算手部動作與即時模式的輸出速度
+            realtime (bool): 是否依照 fps 輸出, 預設為 False (盡可能快速輸出)
+            size (tuple): 畫面大小 (寬, 高), 預設為 640x480
+            gesture_period (float): 張開與握拳切換的週期 (秒)
+            seed (int): 隨機種子
+            n_hands (int): 手的數量, 大於 1 時每隻手在畫面中各自的區域移動, 奇數編號的手左右鏡像, 預設為 1
+        """
+        super().__init__(fps, realtime)
+        self.n_frames = n_frames
+        self.size = size
+        self.gesture_period = gesture_period
+        self.rng = np.random.default_rng(seed)
+        self.n_hands = n_hands
+
+    def hand_pose(self, t: float, hand: int = 0) -> np.ndarray:
+        """
+        計算時間 t 的手部關鍵點
+
+        Args:
+            t (float): 合成時間 (秒)
+            hand (int): 手的編號, 預設為 0
+        Returns:
+            np.ndarray: 原始手部關鍵點, 形狀為 (21, 3)
+        """
+        # 手腕位置沿著圓形軌跡移動, 手指彎曲程度在 0 (張開) 與 1 (握拳) 之間切換,
+        # 多隻手時每隻手只在自己的區域內移動, 張開與握拳的切換錯開半個週期
+        center, amplitude = (hand + 0.5) / self.n_hands, 0.15 / self.n_hands
+        wrist = np.array([center + amplitude * np.cos(0.5 * t), 0.75 + 0.05 * np.sin(0.5 * t), 0.0])
+        curl = float(int(t / self.gesture_period + 0.5 * hand) % 2)
+        mirror = -1.0 if hand % 2 else 1.0
+
+        landmarks = np.zeros((21, 3))
+        landmarks[0] = wrist
+        for finger, (angle, lengths) in enumerate(zip(self.FINGER_ANGLES, self.FINGER_LENGTHS)):
+            point = wrist.copy()
+            direction = np.deg2rad(angle)
+            for joint, length in enumerate(lengths):
+                # 每個指節往手掌方向彎曲, 握拳時彎曲角度較大
+                if joint > 0:
+                    direction += np.deg2rad(75.0) * curl * (1 if finger > 0 else 0.5)
+                point = point + length * np.array([mirror * np.cos(direction), np.sin(direction), -0.01 * joint])
+                landmarks[1 + finger * 4 + joint] = point
+
+        return landmarks + self.rng.normal(0, 0.002, size=landmarks.shape)
+
+    def read(self, timeout: Optional[float] = 1.0) -> Frame:
+        if self.n_frames is not None and self.frames_read >= self.n_frames:
+            raise EOFError("End of synthetic frames")
+        width, height = self.size
+        image = np.zeros((height, width, 3), dtype=np.uint8)
+        t = self.frames_read / self.fps
+        if self.n_hands == 1:
+            return self._emit(image, self.hand_pose(t))
+        return self._emit(image, np.stack([self.hand_pose(t, hand) for hand in range(self.n_hands)]))
+
+def make_source(spec: Optional[str] = None, realtime: bool = False) -> FrameSource:
+    """
+    依照描述字串建立畫面來源
+
+    Args:
+        spec (str, optional): 畫面來源描述, None 則使用攝影機 0
+            - "camera" 或 "camera:<編號>": 攝影機
+            - "video:<路徑>": 影片檔
+            - "images:<資料夾>": 圖片資料夾
+            - "synthetic", "synthetic:<畫面數量>" 或 "synthetic:<畫面數量>:<手的數量>": 合成手部關鍵點
+            - 描述字串結尾加上 "?realtime" (例如 "video:session.mp4?realtime") 等同 realtime=True
+        realtime (bool): 影片、圖片與合成來源是否依照 FPS 輸出, 預設為 False (盡可能快速輸出)
+    Returns:
+        FrameSource: 畫面來源
+    """
+    if spec is None:
+        return CameraSource()
+
+    spec, _, options = spec.partition("?")
+    for option in filter(None, options.split("&")):
+        if option != "realtime":
+            raise ValueError(f"Unknown frame source option: {option}")
+        realtime = True
+
+    kind, _, arg = spec.partition(":")
+    if kind == "camera":
+        return CameraSource(int(arg) if arg else 0)
+    if kind == "video":
+        return VideoFileSource(arg, realtime=realtime)
+    if kind == "images":
+        return ImageFolderSource(arg, realtime=realtime)
+    if kind == "synthetic":
+        n_frames, _, n_hands = arg.partition(":")
+        return SyntheticLandmarkSource(int(n_frames) if n_frames else None, realtime=realtime,
+                                       n_hands=int(n_hands) if n_hands else 1)
+
+    raise ValueError(f"Unknown frame source: {spec}")
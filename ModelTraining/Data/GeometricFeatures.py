@@ -0,0 +1,209 @@
+import numpy as np
+from typing import Union
+
+# MediaPipe 手部關鍵點索引: 0 為手腕, 每根手指依序為 (根部 MCP, PIP, DIP, 指尖)
+WRIST = 0
+FINGERS = {
+    "thumb": (1, 2, 3, 4),
+    "index": (5, 6, 7, 8),
+    "middle": (9, 10, 11, 12),
+    "ring": (13, 14, 15, 16),
+    "pinky": (17, 18, 19, 20),
+}
+
+class GeometricFeatures:
+    """
+    手部幾何特徵擷取類別
+
+    將 21 個關鍵點 (63 個座標值) 轉換為與位置、旋轉與手的大小 (與攝影機距離) 無關的精簡特徵,
+    所有特徵都由預先計算的索引表以向量化運算取得, 可以一次處理整個資料集, 也可以在即時迴圈中處理單一手部
+
+    特徵 (預設共 28 個):
+    1. 指尖到掌心的距離 (5 個), 除以手掌大小
+    2. 手指關節角度 (15 個), 每根手指 3 個關節的彎曲角度 (弧度, 0 為伸直)
+    3. 相鄰手指的張開角度 (4 個), 以手指根部到指尖的方向計算
+    4. 相鄰指尖的距離 (4 個), 除以手掌大小
+
+    Attributes:
+        use_z (bool): 是否使用 z 座標 (MediaPipe 的深度估計雜訊較大)
+        feature_names (list[str]): 特徵名稱
+        n_features (int): 特徵數量
+    Notes:
+        - 掌心為手腕與四根手指根部 (5, 9, 13, 17) 的平均位置, 手掌大小為手腕到這四個根部的平均距離
+        - 輸入可以是原始座標或 Normalize_Landmark_Coords 正規化後的座標, 結果相同 (平移與旋轉不影響特徵)
+    """
+
+    def __init__(self, use_z: bool = True):
+        """
+        Args:
+            use_z (bool): 是否使用 z 座標, 預設為 True
+        """
+        self.use_z = use_z
+        fingers = list(FINGERS.values())
+
+        # 掌心與手掌大小使用的關鍵點
+        self.palm = np.array([WRIST, 5, 9, 13, 17])
+        self.palm_base = np.array([5, 9, 13, 17])
+
+        # 指尖
+        self.tips = np.array([finger[3] for finger in fingers])
+
+        # 關節角度: (前一點, 關節, 後一點), 每根手指的 3 個關節, 第一個關節的前一點為手腕
+        joints = []
+        for finger in fingers:
+            chain = (WRIST, *finger)
+            joints += [(chain[i - 1], chain[i], chain[i + 1]) for i in range(1, 4)]
+        self.joints = np.array(joints)
+
+        # 相鄰手指: 根部到指尖的方向與指尖距離
+        self.spread = np.array([(fingers[i][0], fingers[i][3], fingers[i + 1][0], fingers[i + 1][3])
+                                for i in range(len(fingers) - 1)])
+
+        names = list(FINGERS)
+        self.feature_names = ([f"{name}_tip_palm" for name in names] +
+                              [f"{name}_joint{j}" for name in names for j in range(1, 4)] +
+                              [f"{names[i]}_{names[i + 1]}_spread" for i in range(len(names) - 1)] +
+                              [f"{names[i]}_{names[i + 1]}_tip_gap" for i in range(len(names) - 1)])
+        self.n_features = len(self.feature_names)
+
+        # 將所有需要的向量 (終點 - 起點) 合併成一個線性映射矩陣, 每一列為 21 個關鍵點的權重,
+        # 一次矩陣乘法即可取得所有向量; 掌心以手掌關鍵點的平均權重表示
+        point = np.eye(21)
+        center = point[self.palm].mean(axis=0)
+        lengths = ([point[base] - point[WRIST] for base in self.palm_base] +       # 手腕到手指根部 (手掌大小)
+                   [point[tip] - center for tip in self.tips] +                    # 掌心到指尖
+                   [point[d] - point[b] for _, b, _, d in self.spread])            # 相鄰指尖
+        angle_a = ([point[b] - point[a] for a, b, _ in self.joints] +              # 關節前一段骨頭
+                   [point[b] - point[a] for a, b, _, _ in self.spread])            # 手指方向 (左)
+        angle_b = ([point[c] - point[b] for _, b, c in self.joints] +              # 關節後一段骨頭
+                   [point[d] - point[c] for _, _, c, d in self.spread])            # 手指方向 (右)
+        rows = lengths + angle_a + angle_b
+        self._matrix = np.array(rows)
+
+        # 映射結果中各段的位置
+        n_palm, n_tips, n_angles = len(self.palm_base), len(self.tips), len(angle_a)
+        self._palm_weights = np.r_[np.full(n_palm, 1.0 / n_palm), np.zeros(len(rows) - n_palm)]
+        self._distance_index = np.r_[n_palm:len(lengths)]
+        self._angle_a = slice(len(lengths), len(lengths) + n_angles)
+        self._angle_b = slice(len(lengths) + n_angles, len(rows))
+
+    def __call__(self, coords: np.ndarray) -> np.ndarray:
+        """擷取手部幾何特徵, 詳見 transform"""
+        return self.transform(coords)
+
+    def transform(self, coords: Union[np.ndarray, list]) -> np.ndarray:
+        """
+        擷取手部幾何特徵
+
+        Args:
+            coords: 單一手部 (21, 3) / (63,), 或多隻手 (N, 21, 3) / (N, 63) 的關鍵點座標
+        Returns:
+            np.ndarray: 單一手部回傳 (n_features,), 多隻手回傳 (N, n_features)
+        Notes:
+            - 單一手部與批次使用相同的運算 (約十個 numpy 呼叫), 呼叫次數不會隨特徵數量增加
+        """
+        coords = np.asarray(coords, dtype=np.float64)
+        single = coords.ndim == 1 or (coords.ndim == 2 and coords.shape == (21, 3))
+        hands = coords.reshape(-1, 21, 3)
+        if not self.use_z:
+            hands = hands[:, :, :2]
+
+        # 以一次矩陣乘法取得所有向量, 形狀為 (N, K, D), 並計算長度
+        vectors = self._matrix @ hands
+        lengths = np.sqrt(np.einsum("nkd,nkd->nk", vectors, vectors))
+
+        # 距離特徵除以手掌大小 (手腕到四個手指根部的平均距離, 避免除以 0)
+        palm_size = np.maximum(lengths @ self._palm_weights, 1e-9)
+        distances = lengths[:, self._distance_index] / palm_size[:, np.newaxis]
+
+        # 關節角度 (伸直時為 0) 與相鄰手指的張開角度
+        dot = np.einsum("nkd,nkd->nk", vectors[:, self._angle_a], vectors[:, self._angle_b])
+        norms = np.maximum(lengths[:, self._angle_a] * lengths[:, self._angle_b], 1e-12)
+        angles = np.arccos(np.clip(dot / norms, -1.0, 1.0))
+
+        # 依照 feature_names 的順序: 指尖到掌心距離, 關節與張開角度, 相鄰指尖距離
+        n_tips = len(self.tips)
+        features = np.concatenate([distances[:, :n_tips], angles, distances[:, n_tips:]], axis=1)
+        return features[0] if single else features
+
+if __name__ == "__main__":
+    # 比較使用原始座標 (63 個) 與幾何特徵的模型大小、準確率與單筆預測延遲, 例如: python -m ModelTraining.Data.GeometricFeatures 200
+    import sys
+    import time
+    import pickle
+    from sklearn.svm import SVC
+    from sklearn.cluster import KMeans
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import accuracy_score
+
+    from Models import _LoadSave as LoadSave
+    from Models import _FusedInference as FusedInference
+
+    X, y = LoadSave.load_dataset(1, dataset= sys.argv[1] if len(sys.argv) > 1 else None, mmap_mode= 'r')
+    X = np.asarray(X, dtype=np.float64).reshape(len(X), 21, 3)
+    y = np.asarray(y)
+    features = GeometricFeatures()
+
+    # 特徵擷取的延遲 (批次與單一手部)
+    start = time.perf_counter()
+    X_geometric = features.transform(X)
+    batch_us = (time.perf_counter() - start) / len(X) * 1e6
+    single = []
+    for hand in X:
+        start = time.perf_counter()
+        features(hand)
+        single.append(time.perf_counter() - start)
+    print(f"Geometric features: {features.n_features} values, batch {batch_us:.2f} us/hand, "
+          f"single p50 {np.median(single) * 1e6:.1f} us")
+
+    # 與 SVC_test 相同的切分
+    X_raw = X.reshape(len(X), -1)
+    split = train_test_split(np.arange(len(X)), test_size=0.2, random_state=1, stratify=y)
+
+    families = {
+        "KMeans_5": lambda: KMeans(n_clusters=5, random_state=0, n_init=10),
+        "RandomForest_100": lambda: RandomForestClassifier(n_estimators=100, max_depth=4, random_state=0,
+                                                           class_weight='balanced', min_samples_leaf=2),
+        "RandomForest_20": lambda: RandomForestClassifier(n_estimators=20, max_depth=4, random_state=0,
+                                                          class_weight='balanced', min_samples_leaf=2),
+        "SVC_rbf": lambda: SVC(random_state=1),
+    }
+
+    print(f"\n{'model':<18}{'features':<11}{'accuracy':>9}{'size KB':>9}{'SV/nodes':>10}{'fused p50 us':>14}{'+features us':>14}")
+    for name, factory in families.items():
+        for feature_type, data in (("raw", X_raw), ("geometric", X_geometric)):
+            train, test = split
+            scaler = StandardScaler().fit(data[train])
+            model = factory().fit(scaler.transform(data[train]), y[train])
+            predictor = FusedInference.compile_model(model, scaler)
+            predicted = predictor.predict(data[test])
+
+            # KMeans 沒有標籤, 每個群對應到訓練資料中該群最多的標籤
+            if hasattr(model, "cluster_centers_"):
+                labels = np.unique(y)
+                mapping = np.array([labels[np.argmax([(y[train][model.labels_ == c] == label).sum() for label in labels])]
+                                    for c in range(model.n_clusters)])
+                predicted = mapping[predicted]
+
+            size_kb = (len(pickle.dumps(model)) + len(pickle.dumps(scaler))) / 1024
+            if hasattr(model, "support_vectors_"):
+                complexity = len(model.support_vectors_)
+            elif hasattr(model, "estimators_"):
+                complexity = sum(tree.tree_.node_count for tree in model.estimators_)
+            else:
+                complexity = len(model.cluster_centers_)
+
+            # 單筆預測延遲 (融合預測器), 以及包含特徵擷取的總延遲
+            timings, total = [], []
+            for row, hand in zip(data[test], X[test]):
+                start = time.perf_counter()
+                predictor.predict(row)
+                timings.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                predictor.predict(features(hand) if feature_type == "geometric" else hand.reshape(-1))
+                total.append(time.perf_counter() - start)
+
+            print(f"{name:<18}{feature_type:<11}{accuracy_score(y[test], predicted):>9.4f}{size_kb:>9.1f}"
+                  f"{complexity:>10}{np.median(timings) * 1e6:>14.1f}{np.median(total) * 1e6:>14.1f}")
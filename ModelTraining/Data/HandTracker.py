@@ -0,0 +1,162 @@
+import numpy as np
+from typing import NamedTuple, Optional, Sequence, Union
+
+class Hand(NamedTuple):
+    """
+    單一畫面中偵測到的一隻手
+
+    Attributes:
+        track_id (int): 跨畫面穩定的追蹤編號, 手持續出現在畫面中時保持不變
+        handedness (str): MediaPipe 判斷的左右手 ("Left", "Right"), 無法判斷時為 "Unknown"
+        score (float): 左右手判斷的信心值, 無法判斷時為 0
+        coords (np.ndarray): 正規化後的座標, 形狀為 (63,)
+        Finger_pos (tuple): 食指關鍵點螢幕相對位置
+        center (np.ndarray): 手部中心點的畫面相對座標, 形狀為 (3,)
+    """
+    track_id: int
+    handedness: str
+    score: float
+    coords: np.ndarray
+    Finger_pos: tuple[float, float]
+    center: np.ndarray
+
+class HandTracker:
+    """
+    多手追蹤編號分配器
+
+    MediaPipe 每一幀回傳的手部順序不固定, 此類別以手部中心點的距離將每一幀的手對應到上一幀的追蹤中的手,
+    讓同一隻手在連續畫面中保持相同的追蹤編號
+
+    Attributes:
+        max_distance (float): 與追蹤中的手配對的最大中心點距離 (畫面相對座標)
+        max_missing (int): 追蹤中的手連續消失超過此幀數後移除
+        tracks (dict): 追蹤編號 -> [中心點 (x, y), 左右手, 連續消失幀數]
+    Notes:
+        - 以距離由小到大的順序貪婪配對, 左右手判斷都已知且不同時不會配對
+        - 沒有配對到的手分配新的追蹤編號, 編號只會遞增不會重複使用
+    """
+
+    def __init__(self, max_distance: float = 0.25, max_missing: int = 5):
+        """
+        Args:
+            max_distance (float): 最大配對距離, 預設為畫面寬度的 0.25
+            max_missing (int): 連續消失幀數上限, 預設為 5 幀
+        """
+        self.max_distance = max_distance
+        self.max_missing = max_missing
+        self.tracks: dict[int, list] = {}
+        self._next_id = 0
+
+    def reset(self) -> None:
+        """清除所有追蹤中的手 (追蹤編號持續遞增)"""
+        self.tracks.clear()
+
+    def update(self, centers: np.ndarray, handedness: Sequence[str]) -> list[int]:
+        """
+        將這一幀的手對應到追蹤中的手
+
+        Args:
+            centers (np.ndarray): 每隻手的中心點, 形狀為 (N, 2) 或 (N, 3), 只使用 x, y
+            handedness (Sequence[str]): 每隻手的左右手判斷
+        Returns:
+            list[int]: 每隻手的追蹤編號, 順序與輸入相同
+        """
+        centers = np.asarray(centers, dtype=np.float64).reshape(len(handedness), -1)[:, :2]
+        ids: list[Optional[int]] = [None] * len(centers)
+        track_ids = list(self.tracks)
+
+        if track_ids and len(centers):
+            # 所有 (這一幀的手, 追蹤中的手) 組合的距離, 左右手不同的組合設為無限大
+            previous = np.array([self.tracks[t][0] for t in track_ids])
+            distance = np.linalg.norm(centers[:, np.newaxis] - previous[np.newaxis], axis=2)
+            for i, side in enumerate(handedness):
+                for j, t in enumerate(track_ids):
+                    other = self.tracks[t][1]
+                    if "Unknown" not in (side, other) and side != other:
+                        distance[i, j] = np.inf
+
+            # 依照距離由小到大貪婪配對
+            for flat in np.argsort(distance, axis=None):
+                i, j = divmod(int(flat), len(track_ids))
+                if distance[i, j] > self.max_distance:
+                    break
+                if ids[i] is None and track_ids[j] not in ids:
+                    ids[i] = track_ids[j]
+
+        # 更新配對到的手, 沒有配對到的手分配新的編號
+        for i, (center, side) in enumerate(zip(centers, handedness)):
+            if ids[i] is None:
+                ids[i] = self._next_id
+                self._next_id += 1
+            self.tracks[ids[i]] = [center, side, 0]
+
+        # 這一幀沒有出現的手累計消失幀數, 超過上限後移除
+        for t in track_ids:
+            if t not in ids:
+                self.tracks[t][2] += 1
+                if self.tracks[t][2] > self.max_missing:
+                    del self.tracks[t]
+
+        return ids
+
+class ControlBinding:
+    """
+    選擇控制游標與工具的手
+
+    Attributes:
+        bind (str | int): 綁定方式
+            - "first": 最早出現 (追蹤編號最小) 的手
+            - "left" / "right": 指定左右手, 沒有任何手能判斷左右時改用 "first"
+            - int: 指定追蹤編號
+        track_id (int, optional): 目前控制中的手的追蹤編號
+    Notes:
+        - 控制中的手持續出現時不會切換, 避免第二隻手進入畫面或左右手判斷短暫錯誤時游標跳動
+    """
+
+    def __init__(self, bind: Union[str, int] = "first"):
+        """
+        Args:
+            bind (str | int): 綁定方式, 字串形式的數字視為追蹤編號, 預設為 "first"
+        """
+        if isinstance(bind, str):
+            bind = int(bind) if bind.isdigit() else bind.lower()
+        if not isinstance(bind, int) and bind not in ("first", "left", "right"):
+            raise ValueError(f"Unknown control hand: {bind}")
+        self.bind = bind
+        self.track_id: Optional[int] = None
+
+    def select(self, hands: Sequence[Hand]) -> Optional[int]:
+        """
+        從這一幀的手中選擇控制用的手
+
+        Args:
+            hands (Sequence[Hand]): 這一幀偵測到的手
+        Returns:
+            int: 控制用的手在 hands 中的索引, 沒有符合的手時回傳 None
+        """
+        if isinstance(self.bind, int):
+            return next((i for i, hand in enumerate(hands) if hand.track_id == self.bind), None)
+
+        # 控制中的手仍在畫面中 (且左右手判斷沒有明確不符) 時繼續使用
+        for i, hand in enumerate(hands):
+            if hand.track_id == self.track_id and self._matches(hand, allow_unknown=True):
+                return i
+
+        candidates = [i for i, hand in enumerate(hands) if self._matches(hand, allow_unknown=False)]
+        if not candidates and all(hand.handedness == "Unknown" for hand in hands):
+            candidates = list(range(len(hands)))
+        if not candidates:
+            self.track_id = None
+            return None
+
+        index = min(candidates, key=lambda i: hands[i].track_id)
+        self.track_id = hands[index].track_id
+        return index
+
+    def _matches(self, hand: Hand, allow_unknown: bool) -> bool:
+        """手是否符合綁定的左右手"""
+        if self.bind == "first":
+            return True
+        if hand.handedness == "Unknown":
+            return allow_unknown
+        return hand.handedness.lower() == self.bind
@@ -0,0 +1,147 @@
+import os
+import hashlib
+import numpy as np
+from typing import Optional, NamedTuple
+
+class CacheEntry(NamedTuple):
+    """
+    單張圖片的快取結果
+
+    Attributes:
+        raw (np.ndarray): 原始 (未正規化) 手部關鍵點, 形狀為 (n_hands, 21, 3)
+        normalized (np.ndarray): 正規化後的手部關鍵點, 形狀為 (n_hands, 21, 3)
+    Notes:
+        - n_hands 為 0 表示該圖片沒有偵測到手
+    """
+    raw: np.ndarray
+    normalized: np.ndarray
+
+class LandmarkCache:
+    """
+    以圖片內容雜湊值為索引的手部關鍵點快取
+
+    快取會記住每張圖片的原始與正規化關鍵點 (包含沒有偵測到手的結果),
+    重新建立資料集時只有新增或修改過的圖片需要重新執行 MediaPipe 偵測
+
+    Attributes:
+        path (str): 快取檔案路徑 (.npz)
+        config_key (str): 偵測與正規化設定的雜湊值, 設定改變時整個快取失效
+        hits (int): 命中次數
+        misses (int): 未命中次數
+    """
+
+    def __init__(self, path: str, config_key: str):
+        """
+        載入快取檔案, 如果檔案不存在或設定雜湊值不同則從空的快取開始
+
+        Args:
+            path (str): 快取檔案路徑 (.npz)
+            config_key (str): 偵測與正規化設定的雜湊值
+        """
+        self.path = path
+        self.config_key = config_key
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[str, CacheEntry] = {}
+        self._dirty = False
+
+        if os.path.exists(path):
+            self._load()
+
+    @staticmethod
+    def Key(content: bytes) -> str:
+        """
+        計算圖片內容的雜湊值
+
+        Args:
+            content (bytes): 圖片檔案內容
+        Returns:
+            str: SHA-1 十六進位雜湊值
+        """
+        return hashlib.sha1(content).hexdigest()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """
+        查詢快取, 並更新命中統計
+
+        Args:
+            key (str): 圖片內容雜湊值
+        Returns:
+            CacheEntry: 快取結果, 未命中則回傳 None
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, key: str, raw: np.ndarray, normalized: np.ndarray) -> None:
+        """
+        寫入快取
+
+        Args:
+            key (str): 圖片內容雜湊值
+            raw (np.ndarray): 原始手部關鍵點, 形狀為 (n_hands, 21, 3), 沒有手則為 (0, 21, 3)
+            normalized (np.ndarray): 正規化後的手部關鍵點, 形狀與 raw 相同
+        """
+        self._entries[key] = CacheEntry(np.asarray(raw, dtype=np.float64).reshape(-1, 21, 3),
+                                        np.asarray(normalized, dtype=np.float64).reshape(-1, 21, 3))
+        self._dirty = True
+
+    def stats(self) -> dict:
+        """
+        獲取快取統計資訊
+
+        Returns:
+            dict: 包含 hits, misses, hit_rate, entries, no_hand (沒有偵測到手的圖片數量)
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+            "no_hand": sum(1 for entry in self._entries.values() if len(entry.raw) == 0),
+        }
+
+    def save(self) -> None:
+        """
+        將快取寫入檔案, 沒有變更時不寫入
+        """
+        if not self._dirty:
+            return
+
+        keys = list(self._entries)
+        counts = np.array([len(self._entries[key].raw) for key in keys], dtype=np.int32)
+        raw = [self._entries[key].raw for key in keys]
+        normalized = [self._entries[key].normalized for key in keys]
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        # 先寫入暫存檔再取代, 避免中斷時留下損毀的快取
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path,
+                 config_key=np.array(self.config_key),
+                 keys=np.array(keys, dtype="U40"),
+                 counts=counts,
+                 raw=np.concatenate(raw) if raw else np.empty((0, 21, 3)),
+                 normalized=np.concatenate(normalized) if normalized else np.empty((0, 21, 3)))
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def _load(self) -> None:
+        """
+        從檔案載入快取, 設定雜湊值不同時捨棄所有內容
+        """
+        with np.load(self.path) as data:
+            if str(data['config_key']) != self.config_key:
+                print(f"Info: Landmark cache config changed, discarding {self.path}")
+                self._dirty = True
+                return
+
+            offsets = np.concatenate([[0], np.cumsum(data['counts'])])
+            raw, normalized = data['raw'], data['normalized']
+            for i, key in enumerate(data['keys']):
+                start, end = offsets[i], offsets[i + 1]
+                self._entries[str(key)] = CacheEntry(raw[start:end], normalized[start:end])
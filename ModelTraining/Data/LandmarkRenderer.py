@@ -0,0 +1,159 @@
+import cv2
+import numpy as np
+from typing import Optional, Sequence, Tuple
+
+class LandmarkRenderer:
+    """
+    手部關鍵點繪製器
+
+    取代每一幀都複製畫面、以 Python 迴圈呼叫 cv2.circle 並 hconcat 出新畫面的作法:
+    1. 並排畫面使用預先配置的輸出緩衝區 (環形使用多個緩衝區, 避免顯示中的畫面被下一幀覆寫)
+    2. 以向量化運算計算所有關鍵點的像素座標, 並一次蓋上所有圓點 (預先計算的圓形遮罩)
+    3. 可選擇繪製模式, 以及每 N 幀才繪製一次
+
+    Attributes:
+        mode (str): 繪製模式
+            - "off": 不繪製
+            - "overlay": 直接在畫面上繪製處理後與原始關鍵點 (不複製畫面)
+            - "side_by_side": 左邊為處理後的關鍵點, 右邊為原始關鍵點
+        every_n (int): 每 N 幀繪製一次
+        size (tuple): 單一畫面的大小 (寬, 高)
+        reuse_buffers (bool): 並排畫面是否環形使用預先配置的緩衝區, False 則每一幀配置新的輸出畫面
+    Notes:
+        - 處理後的關鍵點使用綠色 (128, 255, 0), 原始關鍵點使用黃色 (0, 255, 255), 手部中心點使用藍色 (255, 0, 0)
+        - 在 Pipeline 中使用時需要設定 reuse_buffers=False: 佇列已滿時會丟棄舊的畫面, 繪製的畫面數量可以遠多於
+          同時存在的畫面數量, 環形緩衝區無論多大都可能覆寫仍在佇列中或顯示中的畫面
+    """
+
+    MODES = ("off", "overlay", "side_by_side")
+
+    PROCESSED_COLOR = (128, 255, 0)
+    ORIGIN_COLOR = (0, 255, 255)
+    CENTER_COLOR = (255, 0, 0)
+
+    def __init__(self,
+                 mode: str = "side_by_side",
+                 every_n: int = 1,
+                 size: Tuple[int, int] = (640, 480),
+                 radius: int = 5,
+                 buffers: int = 4,
+                 reuse_buffers: bool = True):
+        """
+        Args:
+            mode (str): 繪製模式 ("off", "overlay", "side_by_side"), 預設為 "side_by_side"
+            every_n (int): 每 N 幀繪製一次, 預設為 1 (每幀都繪製)
+            size (tuple): 單一畫面的大小 (寬, 高), 預設為 640x480
+            radius (int): 關鍵點圓點半徑 (像素), 預設為 5
+            buffers (int): 並排畫面輸出緩衝區的數量, 需要大於同時被引用的畫面數量 (依序處理時為 1), 預設為 4
+            reuse_buffers (bool): 是否環形使用輸出緩衝區, 預設為 True; 在 Pipeline 中使用時設定為 False
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown render mode: {mode}, expected one of {self.MODES}")
+        self.mode = mode
+        self.every_n = max(1, every_n)
+        self.size = tuple(size)
+        self.reuse_buffers = reuse_buffers
+
+        # 預先計算圓形遮罩中每個像素相對圓心的位移, 形狀為 (K, 2), 順序為 (x, y)
+        ys, xs = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+        inside = xs ** 2 + ys ** 2 <= radius ** 2
+        self._disc = np.stack([xs[inside], ys[inside]], axis= 1)
+
+        width, height = self.size
+        self._buffers = [np.zeros((height, width * 2, 3), dtype=np.uint8) for _ in range(max(1, buffers))]
+        self._next_buffer = 0
+        self._frame_count = 0
+
+    def begin_frame(self) -> bool:
+        """
+        開始新的一幀, 並回傳這一幀是否需要繪製 (模式不為 off 且為第 N 幀)
+        """
+        self._frame_count += 1
+        return self.mode != "off" and (self._frame_count - 1) % self.every_n == 0
+
+    def render(self,
+               frame: np.ndarray,
+               center: Sequence[float],
+               coords: np.ndarray,
+               origin_coords: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """
+        繪製手部關鍵點
+
+        Args:
+            frame (numpy.ndarray): BGR 畫面
+            center (Sequence): 手部中心點的三維座標 (x, y, z), 為畫面的相對座標
+            coords (numpy.ndarray): 處理後的手部關鍵點座標 (相對於中心點), 形狀為 (n, 3)
+            origin_coords (numpy.ndarray, optional): 原始手部關鍵點座標 (相對於中心點), 形狀為 (n, 3)
+        Returns:
+            numpy.ndarray: 繪製後的畫面, 模式為 off 時回傳 None
+            - overlay: 直接繪製在傳入的畫面上並回傳該畫面
+            - side_by_side: 回傳輸出緩衝區 (寬度為兩倍), reuse_buffers=False 時回傳新配置的畫面
+        """
+        if self.mode == "off":
+            return None
+
+        height, width = frame.shape[:2]
+        center = np.asarray(center, dtype=np.float64)[:2]
+        processed = self._Pixel_Coords(center, coords, width, height)
+        origin = None if origin_coords is None else self._Pixel_Coords(center, origin_coords, width, height)
+        center_px = (center * (width, height)).astype(np.int32)[np.newaxis]
+
+        if self.mode == "overlay":
+            self._Stamp(frame, center_px, self.CENTER_COLOR)
+            self._Stamp(frame, processed, self.PROCESSED_COLOR)
+            if origin is not None:
+                self._Stamp(frame, origin, self.ORIGIN_COLOR)
+            return frame
+
+        # 並排畫面: 將畫面複製到輸出緩衝區的左右兩半, 再分別繪製
+        out_width, out_height = self.size
+        if self.reuse_buffers:
+            output = self._buffers[self._next_buffer]
+            self._next_buffer = (self._next_buffer + 1) % len(self._buffers)
+        else:
+            output = np.empty((out_height, out_width * 2, 3), dtype=np.uint8)
+
+        if (width, height) != self.size:
+            # 關鍵點座標依照縮放比例換算
+            scale = np.array([out_width / width, out_height / height])
+            processed = (processed * scale).astype(np.int32)
+            center_px = (center_px * scale).astype(np.int32)
+            origin = None if origin is None else (origin * scale).astype(np.int32)
+            frame = cv2.resize(frame, self.size)
+
+        left, right = output[:, :out_width], output[:, out_width:]
+        np.copyto(left, frame)
+        np.copyto(right, frame)
+
+        self._Stamp(left, center_px, self.CENTER_COLOR)
+        self._Stamp(left, processed, self.PROCESSED_COLOR)
+        self._Stamp(right, center_px, self.CENTER_COLOR)
+        if origin is not None:
+            self._Stamp(right, origin, self.ORIGIN_COLOR)
+
+        return output
+
+    @staticmethod
+    def _Pixel_Coords(center: np.ndarray, coords: np.ndarray, width: int, height: int) -> np.ndarray:
+        """
+        將相對於中心點的座標轉換為像素座標
+
+        Returns:
+            numpy.ndarray: 像素座標 (x, y), 形狀為 (n, 2)
+        """
+        return ((center + np.asarray(coords)[:, :2]) * (width, height)).astype(np.int32)
+
+    def _Stamp(self, image: np.ndarray, points: np.ndarray, color: Tuple[int, int, int]) -> None:
+        """
+        以圓形遮罩一次蓋上所有圓點, 超出畫面的像素會被略過
+
+        Args:
+            image (numpy.ndarray): 要繪製的畫面 (可以是緩衝區的一部分)
+            points (numpy.ndarray): 圓心像素座標 (x, y), 形狀為 (n, 2)
+            color (tuple): BGR 顏色
+        """
+        height, width = image.shape[:2]
+        pixels = (points[:, np.newaxis, :] + self._disc[np.newaxis]).reshape(-1, 2)
+        valid = (pixels[:, 0] >= 0) & (pixels[:, 0] < width) & (pixels[:, 1] >= 0) & (pixels[:, 1] < height)
+        pixels = pixels[valid]
+        image[pixels[:, 1], pixels[:, 0]] = color
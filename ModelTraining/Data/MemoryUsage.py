@@ -0,0 +1,43 @@
+import sys
+from typing import Optional
+
+def peak_memory_mb() -> Optional[float]:
+    """
+    獲取行程的記憶體峰值 (MB), 無法取得時回傳 None
+
+    Notes:
+        - 峰值是整個行程從啟動以來的最大值, 不會因為釋放記憶體而下降
+    """
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 的單位為 bytes, Linux 為 KB
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+def current_memory_mb() -> Optional[float]:
+    """
+    獲取行程目前的常駐記憶體 (RSS, MB), 無法取得時回傳 None
+
+    Notes:
+        - 與 peak_memory_mb 不同, 可以在一段程式碼前後各讀取一次, 以差值估計該段程式碼增加的記憶體
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            pages = int(file.read().split()[1])
+        import resource
+        return pages * resource.getpagesize() / (1024 * 1024)
+    except (OSError, ImportError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        return None
@@ -0,0 +1,277 @@
+import sys
+import json
+import time
+import threading
+import numpy as np
+from queue import Empty
+from collections import deque
+from typing import Any, Callable, Iterator, NamedTuple, Optional, Sequence, TextIO
+
+class Packet(NamedTuple):
+    """
+    在管線中傳遞的資料
+
+    Attributes:
+        seq (int): 畫面序號, 由畫面來源決定並在所有階段中保持不變
+        timestamp (float): 畫面擷取時間 (time.perf_counter 秒數), 用來計算端到端延遲
+        value (Any): 上一個階段的輸出
+    """
+    seq: int
+    timestamp: float
+    value: Any
+
+class DropOldestQueue:
+    """
+    有界佇列, 佇列已滿時丟棄最舊的資料, 讓下游永遠處理最新的畫面
+
+    Attributes:
+        maxsize (int): 最大長度
+        dropped (int): 被丟棄的資料數量
+        max_depth (int): 曾經到達的最大長度
+    """
+
+    def __init__(self, maxsize: int = 2):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.max_depth = 0
+        self._items: deque = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, item: Any) -> None:
+        """
+        放入資料, 佇列已滿時丟棄最舊的資料
+        """
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self.max_depth = max(self.max_depth, len(self._items))
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """
+        取出最舊的資料
+
+        Args:
+            timeout (float, optional): 最長等待秒數, None 則一直等待
+        Returns:
+            Any: 取出的資料
+        Notes:
+            - 等待逾時拋出 queue.Empty, 佇列已關閉且沒有剩餘資料時拋出 EOFError
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                raise Empty
+            if self._items:
+                return self._items.popleft()
+            raise EOFError("Queue closed")
+
+    def close(self) -> None:
+        """關閉佇列, 剩餘的資料仍然可以取出"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+class _StageStats:
+    """單一階段的統計資訊 (處理數量、忙碌時間與最近 window 次的處理時間)"""
+
+    def __init__(self, window: int):
+        self.processed = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.samples = np.full(window, np.nan)
+
+    def record(self, elapsed: float) -> None:
+        self.samples[self.processed % len(self.samples)] = elapsed
+        self.processed += 1
+        self.busy += elapsed
+
+class Pipeline:
+    """
+    多階段管線執行器
+
+    畫面來源與每個處理階段各自在獨立的執行緒中執行, 階段之間以丟棄最舊資料的有界佇列連接,
+    整體速度由最慢的階段決定, 而不是所有階段的總和; 最後一個階段的輸出由呼叫端 (通常是主執行緒) 以 get() 取出
+
+    Attributes:
+        stages (list[str]): 階段名稱 (不包含畫面來源)
+        report_interval (float): 輸出摘要的間隔秒數
+        reporting (bool): 是否定期輸出摘要
+    Notes:
+        - 每個階段只有一個執行緒, 因此資料在每個階段中的處理順序與畫面序號相同 (例如 MediaPipe 的影片模式)
+        - 階段函式拋出例外時只會丟棄該筆資料並輸出錯誤訊息, 管線會繼續執行
+        - 畫面來源拋出 EOFError 時, 管線會處理完佇列中剩餘的資料後結束
+    """
+
+    def __init__(self,
+                 source: Callable[[], Any],
+                 stages: Sequence[tuple[str, Callable[[Packet], Any]]],
+                 queue_size: int = 2,
+                 window: int = 300,
+                 report_interval: float = 5.0,
+                 reporting: bool = False,
+                 stream: Optional[TextIO] = None):
+        """
+        Args:
+            source (Callable): 畫面來源函式, 每次呼叫回傳一筆資料, 回傳值有 seq / timestamp 屬性時 (例如 Frame) 沿用其序號與時間
+            stages (Sequence): (名稱, 處理函式) 的列表, 處理函式接收上一個階段輸出的 Packet (包含畫面序號與擷取時間),
+                               並回傳這個階段的輸出 (下一個 Packet 的 value)
+            queue_size (int): 每個佇列的最大長度, 預設為 2
+            window (int): 計算百分位數所使用的最近資料數量, 預設為 300
+            report_interval (float): 輸出摘要的間隔秒數, 預設為 5 秒
+            reporting (bool): 是否定期輸出摘要 (由 get() 觸發), 預設為 False
+            stream (TextIO, optional): 摘要輸出位置, 預設為 sys.stderr
+        """
+        self.source = source
+        self.stages = [name for name, _ in stages]
+        self.report_interval = report_interval
+        self.reporting = reporting
+        self.stream = stream
+
+        self._functions = [fn for _, fn in stages]
+        # queues[i] 為第 i 個階段的輸入, 最後一個佇列為管線的輸出
+        self._queues = [DropOldestQueue(queue_size) for _ in range(len(stages) + 1)]
+        self._stats = {name: _StageStats(window) for name in ["source", *self.stages]}
+        self._latency = np.full(window, np.nan)
+        self._delivered = 0
+        self._threads: list[threading.Thread] = []
+        self._running = False
+        self._start_time = 0.0
+        self._last_report = 0.0
+        self._delivered_since_report = 0
+
+    def start(self) -> "Pipeline":
+        """啟動畫面來源與所有階段的執行緒"""
+        self._running = True
+        self._start_time = self._last_report = time.perf_counter()
+        self._threads = [threading.Thread(target=self._run_source, name="Pipeline-source", daemon=True)]
+        self._threads += [threading.Thread(target=self._run_stage, args=(i,), name=f"Pipeline-{name}", daemon=True)
+                          for i, name in enumerate(self.stages)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """停止所有執行緒"""
+        self._running = False
+        for queue in self._queues:
+            queue.close()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def get(self, timeout: Optional[float] = None) -> Packet:
+        """
+        取出最後一個階段的輸出
+
+        Args:
+            timeout (float, optional): 最長等待秒數, None 則一直等待
+        Returns:
+            Packet: (seq, timestamp, value)
+        Notes:
+            - 等待逾時拋出 queue.Empty, 管線結束時拋出 EOFError
+        """
+        packet = self._queues[-1].get(timeout)
+        now = time.perf_counter()
+        self._latency[self._delivered % len(self._latency)] = now - packet.timestamp
+        self._delivered += 1
+        self._delivered_since_report += 1
+
+        if self.reporting and now - self._last_report >= self.report_interval:
+            self.report(now)
+        return packet
+
+    def __iter__(self) -> Iterator[Packet]:
+        """依序取出輸出, 直到管線結束"""
+        while True:
+            try:
+                yield self.get()
+            except EOFError:
+                return
+
+    def _run_source(self) -> None:
+        """畫面來源執行緒: 讀取資料並放入第一個佇列"""
+        stats, output = self._stats["source"], self._queues[0]
+        count = 0
+        while self._running:
+            start = time.perf_counter()
+            try:
+                value = self.source()
+            except EOFError:
+                break
+            except Exception as e:
+                print(f"Error: pipeline source: {e}", file=sys.stderr)
+                stats.errors += 1
+                time.sleep(0.01)
+                continue
+            count += 1
+            stats.record(time.perf_counter() - start)
+            output.put(Packet(getattr(value, "seq", count), getattr(value, "timestamp", start), value))
+        output.close()
+
+    def _run_stage(self, index: int) -> None:
+        """階段執行緒: 從輸入佇列取出資料, 處理後放入下一個佇列"""
+        stats, fn = self._stats[self.stages[index]], self._functions[index]
+        source, output = self._queues[index], self._queues[index + 1]
+        while True:
+            try:
+                packet = source.get()
+            except EOFError:
+                break
+
+            start = time.perf_counter()
+            try:
+                value = fn(packet)
+            except Exception as e:
+                print(f"Error: pipeline stage {self.stages[index]} (frame {packet.seq}): {e}", file=sys.stderr)
+                stats.errors += 1
+                continue
+            stats.record(time.perf_counter() - start)
+            output.put(Packet(packet.seq, packet.timestamp, value))
+        output.close()
+
+    def stats(self) -> dict:
+        """
+        獲取管線統計資訊
+
+        Returns:
+            dict: delivered (輸出數量), latency (端到端延遲 p50 / p95 毫秒),
+                  stages (每個階段的處理數量、錯誤數量、輸入佇列長度、最大長度、丟棄數量、使用率與處理時間 p50 / p95 毫秒)
+        """
+        elapsed = max(time.perf_counter() - self._start_time, 1e-9)
+        stages = {}
+        for i, (name, stats) in enumerate(self._stats.items()):
+            samples = stats.samples[np.isfinite(stats.samples)] * 1000
+            p50, p95 = np.percentile(samples, [50, 95]) if len(samples) else (0.0, 0.0)
+            stages[name] = {"processed": stats.processed, "errors": stats.errors,
+                            "utilization": round(stats.busy / elapsed, 3),
+                            "p50": round(float(p50), 3), "p95": round(float(p95), 3)}
+
+            # 畫面來源沒有輸入佇列, 其他階段的輸入佇列為 queues[i - 1]
+            if name != "source":
+                queue = self._queues[i - 1]
+                stages[name].update({"queue_depth": len(queue), "max_depth": queue.max_depth,
+                                     "dropped": queue.dropped})
+
+        latency = self._latency[np.isfinite(self._latency)] * 1000
+        p50, p95 = np.percentile(latency, [50, 95]) if len(latency) else (0.0, 0.0)
+        return {"delivered": self._delivered, "output_dropped": self._queues[-1].dropped,
+                "latency": {"p50": round(float(p50), 3), "p95": round(float(p95), 3)}, "stages": stages}
+
+    def report(self, now: Optional[float] = None) -> None:
+        """
+        輸出一行 JSON 摘要到 stream
+
+        Args:
+            now (float, optional): 目前的 perf_counter 時間
+        """
+        now = time.perf_counter() if now is None else now
+        summary = self.stats()
+        summary["fps"] = round(self._delivered_since_report / max(now - self._last_report, 1e-9), 2)
+        self._last_report = now
+        self._delivered_since_report = 0
+        print(json.dumps({"type": "pipeline", **summary}), file=self.stream or sys.stderr, flush=True)
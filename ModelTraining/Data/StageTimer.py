@@ -0,0 +1,160 @@
+import sys
+import json
+import time
+import numpy as np
+from typing import Optional, TextIO, Sequence
+
+class StageTimer:
+    """
+    每幀處理階段計時器
+
+    在即時迴圈中以 mark(stage) 標記每個階段的結束時間, 計時器會記錄自上一次標記以來經過的時間,
+    並以固定長度的環形緩衝區保留最近 window 幀的資料, 定期輸出 p50 / p95 / p99 與 FPS 的 JSON 摘要
+
+    Attributes:
+        stages (list[str]): 階段名稱
+        enabled (bool): 是否啟用計時, 停用時 mark / begin_frame / end_frame 會立即返回
+        window (int): 計算百分位數所使用的最近幀數
+        report_interval (float): 輸出摘要的間隔秒數
+        name (str, optional): 計時器名稱, 同一個程式有多個計時器時 (例如管線中每個執行緒一個) 用來區分摘要
+    Notes:
+        - 摘要輸出到 stream (預設 stderr), 與 stdout 上的手勢結果分開, 避免干擾 Electron 端的解析
+        - 同一幀中沒有執行的階段 (例如沒有偵測到手時的預測) 不會被記錄
+        - 一個計時器同時只能記錄一幀, 多執行緒管線中每個執行緒應使用自己的計時器
+    """
+
+    def __init__(self,
+                 stages: Sequence[str],
+                 window: int = 300,
+                 report_interval: float = 5.0,
+                 stream: Optional[TextIO] = None,
+                 enabled: bool = False,
+                 name: Optional[str] = None):
+        """
+        Args:
+            stages (Sequence[str]): 階段名稱
+            window (int): 計算百分位數所使用的最近幀數, 預設為 300
+            report_interval (float): 輸出摘要的間隔秒數, 0 或負數則不自動輸出, 預設為 5 秒
+            stream (TextIO, optional): 摘要輸出位置, 預設為 sys.stderr
+            enabled (bool): 是否啟用計時, 預設為 False
+            name (str, optional): 計時器名稱, 會加入摘要的 "name" 欄位
+        """
+        self.stages = list(stages)
+        self.window = window
+        self.report_interval = report_interval
+        self.stream = stream
+        self.enabled = enabled
+        self.name = name
+
+        self._index = {stage: i for i, stage in enumerate(self.stages)}
+        self._reset()
+
+    def _reset(self) -> None:
+        """清除所有紀錄"""
+        # 每個階段一個環形緩衝區, NaN 表示該幀沒有執行此階段
+        self._samples = np.full((self.window, len(self.stages)), np.nan)
+        self._frame_times = np.full(self.window, np.nan)
+        self._cursor = -1
+        self._count = 0
+        self._frame_start = 0.0
+        self._last_mark = 0.0
+        self._last_report = time.perf_counter()
+        self._frames_since_report = 0
+
+    def toggle(self) -> bool:
+        """
+        切換啟用狀態, 重新啟用時清除舊的紀錄
+
+        Returns:
+            bool: 切換後的啟用狀態
+        """
+        self.enabled = not self.enabled
+        if self.enabled:
+            self._reset()
+        name = f" ({self.name})" if self.name is not None else ""
+        print(f"Info: Stage timing{name} {'enabled' if self.enabled else 'disabled'}", file=self.stream or sys.stderr)
+        return self.enabled
+
+    def begin_frame(self) -> None:
+        """標記一幀的開始"""
+        if not self.enabled:
+            return
+        self._cursor = (self._cursor + 1) % self.window
+        self._samples[self._cursor] = np.nan
+        self._frame_start = self._last_mark = time.perf_counter()
+
+    def mark(self, stage: str) -> None:
+        """
+        標記一個階段的結束, 記錄自上一次標記以來經過的時間, 同一幀中的多次標記會累加
+
+        Args:
+            stage (str): 階段名稱
+        """
+        if not self.enabled or self._cursor < 0:
+            return
+        now = time.perf_counter()
+        row, i = self._samples[self._cursor], self._index[stage]
+
+        # 同一幀中多次標記同一個階段時累加 (NaN 表示尚未記錄)
+        row[i] = now - self._last_mark if row[i] != row[i] else row[i] + (now - self._last_mark)
+        self._last_mark = now
+
+    def end_frame(self) -> None:
+        """標記一幀的結束, 到達輸出間隔時輸出摘要"""
+        if not self.enabled or self._cursor < 0:
+            return
+        now = time.perf_counter()
+        self._frame_times[self._cursor] = now - self._frame_start
+        self._count += 1
+        self._frames_since_report += 1
+
+        if self.report_interval > 0 and now - self._last_report >= self.report_interval:
+            self.report(now)
+
+    def summary(self) -> dict:
+        """
+        計算最近 window 幀的統計資訊
+
+        Returns:
+            dict: frames (總幀數), fps (最近幀的平均 FPS), frame (整幀延遲),
+                  stages (每個階段的 p50 / p95 / p99 毫秒與執行次數)
+        """
+        frame_times = self._frame_times[np.isfinite(self._frame_times)]
+        stages = {}
+        for i, stage in enumerate(self.stages):
+            samples = self._samples[:, i]
+            samples = samples[np.isfinite(samples)]
+            if len(samples):
+                p50, p95, p99 = np.percentile(samples * 1000, [50, 95, 99])
+                stages[stage] = {"n": int(len(samples)), "p50": round(float(p50), 3),
+                                 "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
+
+        frame = {}
+        if len(frame_times):
+            p50, p95, p99 = np.percentile(frame_times * 1000, [50, 95, 99])
+            frame = {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
+
+        return {
+            "frames": self._count,
+            "fps": round(float(len(frame_times) / frame_times.sum()), 2) if len(frame_times) else 0.0,
+            "frame": frame,
+            "stages": stages,
+        }
+
+    def report(self, now: Optional[float] = None) -> None:
+        """
+        輸出一行 JSON 摘要到 stream
+
+        Args:
+            now (float, optional): 目前的 perf_counter 時間
+        """
+        now = time.perf_counter() if now is None else now
+        summary = self.summary()
+
+        # 以兩次輸出之間實際經過的時間計算 FPS (包含階段以外的時間)
+        summary["loop_fps"] = round(self._frames_since_report / max(now - self._last_report, 1e-9), 2)
+        self._last_report = now
+        self._frames_since_report = 0
+
+        header = {"type": "timing"} if self.name is None else {"type": "timing", "name": self.name}
+        print(json.dumps({**header, **summary}), file=self.stream or sys.stderr, flush=True)
@@ -0,0 +1,278 @@
+"""
+離線模型評估
+
+載入 Models 資料夾中所有儲存的模型 (組合包或舊格式的 {name}_Model / {name}_Scaler),
+以同一份資料集進行向量化的批次預測, 並將每個模型的結果並排比較:
+- 準確率 (accuracy)、macro F1 與混淆矩陣
+- 批次吞吐量 (rows/s) 與單筆預測延遲 (sklearn 路徑與融合預測器)
+- 前處理不一致的檢查, 例如 Pipeline 已經包含 StandardScaler 卻又在外部套用一次標準化器 (舊版 SVC_LiveTest 的作法)、
+  模型以 LabelEncoder 的整數標籤訓練而資料集為字串標籤、組合包的正規化設定與目前不同
+
+使用方式:
+    python -m ModelTraining.Testing.Model_Evaluation                         # 評估所有模型, 使用最大的資料集
+    python -m ModelTraining.Testing.Model_Evaluation --dataset 200 --holdout # 只使用與 SVC_test 相同切分的測試資料
+    python -m ModelTraining.Testing.Model_Evaluation --models SVC_1 --output eval.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from typing import Any, Optional
+
+from sklearn.metrics import accuracy_score, f1_score, confusion_matrix
+from sklearn.model_selection import train_test_split
+
+from Models import _LoadSave as LoadSave
+from Models import _FusedInference as FusedInference
+
+import warnings
+warnings.filterwarnings("ignore", category= UserWarning)
+
+MODELS_PATH = os.path.dirname(os.path.abspath(LoadSave.__file__))
+
+def list_models() -> list[str]:
+    """
+    列出 Models 資料夾中所有儲存的模型名稱 (組合包與舊格式的模型檔)
+
+    Returns:
+        list[str]: 排序後的模型名稱, 例如 ["KMeans_2", "RandomForest_100", "SVC_1"]
+    """
+    names = set()
+    for file_name in os.listdir(MODELS_PATH):
+        for suffix in ("_Bundle.joblib", "_Model.joblib"):
+            if file_name.endswith(suffix):
+                names.add(file_name[:-len(suffix)])
+    return sorted(names)
+
+def _has_internal_scaler(model: Any) -> bool:
+    """模型是否為已包含標準化步驟的 Pipeline"""
+    return hasattr(model, "steps") and any(hasattr(step, "scale_") for _, step in model.steps[:-1])
+
+def _final_estimator(model: Any) -> Any:
+    """Pipeline 的最後一個估計器, 不是 Pipeline 時為模型本身"""
+    return model.steps[-1][1] if hasattr(model, "steps") else model
+
+def _load_legacy_scaler(name: str) -> Optional[Any]:
+    """載入舊格式的 {name}_Scaler (即時測試腳本使用的標準化器), 不存在時回傳 None"""
+    if not os.path.exists(os.path.join(MODELS_PATH, name + "_Scaler.joblib")):
+        return None
+    return LoadSave.load_scaler(name)
+
+def label_mapper(model: Any, raw: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, Optional[str]]:
+    """
+    建立模型輸出到資料集標籤的對應
+
+    Args:
+        model: 模型 (可為 Pipeline)
+        raw (np.ndarray): 模型在評估資料上的原始輸出
+        y (np.ndarray): 評估資料的標籤
+    Returns:
+        tuple: (mapping, note)
+        - mapping (np.ndarray): 以模型輸出索引的標籤陣列, 長度為模型輸出的數量
+        - note (str, optional): 對應方式的說明, 直接使用模型輸出時為 None
+    Notes:
+        - KMeans 沒有標籤, 每個群對應到該群中最多的資料集標籤 (以評估資料本身建立, 分數偏樂觀)
+        - 模型輸出為整數而資料集為字串標籤時, 視為 LabelEncoder 編碼 (排序後的類別索引)
+    """
+    classes = np.unique(y)
+    estimator = _final_estimator(model)
+
+    if hasattr(estimator, "cluster_centers_"):
+        n_clusters = len(estimator.cluster_centers_)
+        mapping = np.empty(n_clusters, dtype=classes.dtype)
+        for cluster in range(n_clusters):
+            members = y[raw == cluster]
+            values, counts = np.unique(members, return_counts=True) if len(members) else (classes, np.zeros(len(classes)))
+            mapping[cluster] = values[np.argmax(counts)]
+        note = "clusters mapped to their majority label on the evaluated data"
+        return mapping, note
+
+    model_classes = np.asarray(estimator.classes_)
+    if np.issubdtype(model_classes.dtype, np.integer) and not np.issubdtype(classes.dtype, np.integer):
+        if model_classes.min() < 0 or model_classes.max() >= len(classes):
+            raise ValueError(f"Model classes {model_classes.tolist()} cannot be mapped to dataset labels {classes.tolist()}")
+        mapping = np.empty(model_classes.max() + 1, dtype=classes.dtype)
+        mapping[model_classes] = classes[model_classes]
+        return mapping, "integer outputs decoded as LabelEncoder indices of the dataset labels"
+
+    return None, None
+
+def _batch_throughput(fn, X: np.ndarray, min_rows: int, repeat: int) -> float:
+    """
+    批次吞吐量 (rows/s), 資料不足 min_rows 時重複串接, 取多次重複中最快的一次
+    """
+    batch = np.tile(X, (max(1, -(-min_rows // len(X))), 1))
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(batch)
+        best = min(best, time.perf_counter() - start)
+    return len(batch) / best
+
+def _single_latency(fn, X: np.ndarray, rows: int) -> dict:
+    """
+    單筆預測延遲 (微秒), 以輸入形狀 (63,) 逐筆呼叫
+
+    Returns:
+        dict: p50, p95, mean
+    """
+    samples = np.empty(min(rows, len(X)))
+    for i in range(len(samples)):
+        row = X[i]
+        start = time.perf_counter()
+        fn(row)
+        samples[i] = time.perf_counter() - start
+    p50, p95 = np.percentile(samples * 1e6, [50, 95])
+    return {"p50": round(float(p50), 2), "p95": round(float(p95), 2), "mean": round(float(samples.mean() * 1e6), 2)}
+
+def evaluate_model(name: str,
+                   X: np.ndarray,
+                   y: np.ndarray,
+                   repeat: int = 3,
+                   min_rows: int = 10000,
+                   latency_rows: int = 200) -> dict:
+    """
+    評估單一模型
+
+    Args:
+        name (str): 模型名稱
+        X (np.ndarray): 評估資料, 形狀為 (n, 63)
+        y (np.ndarray): 評估資料的標籤
+        repeat (int): 批次吞吐量的重複次數
+        min_rows (int): 批次吞吐量最少使用的資料數量
+        latency_rows (int): 測量單筆延遲的資料數量
+    Returns:
+        dict: 模型的評估結果, 包含 metrics / confusion_matrix / throughput / latency / issues
+    """
+    # 組合包會排除 Pipeline 中重複的標準化器 (舊格式的模型也以相同規則建立組合包)
+    bundle = LoadSave.load_bundle(name)
+    model, scaler = bundle["model"], bundle["scaler"]
+    estimator = _final_estimator(model)
+    if hasattr(estimator, "verbose"):
+        estimator.verbose = 0
+    # 融合預測器不支援的模型 (例如核函數近似的 Pipeline) 只評估 sklearn 路徑
+    try:
+        predictor = FusedInference.compile_model(model, scaler)
+    except FusedInference.UnsupportedModelError:
+        predictor = None
+
+    def sklearn_predict(batch: np.ndarray) -> np.ndarray:
+        batch = np.asarray(batch).reshape(-1, X.shape[1])
+        return model.predict(scaler.transform(batch) if scaler is not None else batch)
+
+    issues = []
+    n_features = getattr(scaler if scaler is not None else model, "n_features_in_", X.shape[1])
+    if n_features != X.shape[1]:
+        raise ValueError(f"{name} expects {n_features} features, dataset has {X.shape[1]}")
+    if bundle.get("normalization_hash") != LoadSave.normalization_hash():
+        issues.append("bundle was trained with a different normalization config")
+
+    # 批次預測, 並確認融合預測器與 sklearn 路徑的結果相同
+    raw_sklearn = sklearn_predict(X)
+    raw = predictor.predict(X) if predictor is not None else raw_sklearn
+    if not np.array_equal(raw, raw_sklearn):
+        issues.append(f"fused predictor disagrees with sklearn on {int(np.sum(raw != raw_sklearn))} rows")
+
+    mapping, mapping_note = label_mapper(model, raw, y)
+    y_pred = raw if mapping is None else mapping[raw]
+    if mapping_note is not None and not hasattr(estimator, "cluster_centers_"):
+        issues.append(f"label mismatch: model outputs {np.unique(raw).tolist()}, dataset labels are strings; {mapping_note}")
+
+    classes = np.unique(y)
+    result = {
+        "model": name,
+        "estimator": type(estimator).__name__,
+        "predictor": type(predictor).__name__ if predictor is not None else None,
+        "label_mapping": mapping_note,
+        "metrics": {"accuracy": float(accuracy_score(y, y_pred)),
+                    "f1_macro": float(f1_score(y, y_pred, labels=classes, average="macro", zero_division=0))},
+        "labels": classes.tolist(),
+        "confusion_matrix": confusion_matrix(y, y_pred, labels=classes).tolist(),
+    }
+
+    # 直接以 compile_model(model, {name}_Scaler) 預測 (舊版即時測試腳本的作法), Pipeline 已包含標準化器時會標準化兩次
+    legacy_scaler = _load_legacy_scaler(name) if _has_internal_scaler(model) and scaler is None else None
+    if legacy_scaler is not None:
+        doubled = FusedInference.compile_model(model, legacy_scaler).predict(X)
+        doubled_pred = doubled if mapping is None else mapping[doubled]
+        issues.append(f"double scaling: pipeline already contains a StandardScaler; applying {name}_Scaler again "
+                      f"changes {float(np.mean(doubled != raw)) * 100:.1f}% of predictions "
+                      f"(accuracy {result['metrics']['accuracy']:.4f} -> {accuracy_score(y, doubled_pred):.4f})")
+
+    result["throughput"] = {"sklearn": round(_batch_throughput(sklearn_predict, X, min_rows, repeat), 1), "fused": None}
+    result["latency_us"] = {"sklearn": _single_latency(sklearn_predict, X, latency_rows), "fused": None}
+    if predictor is not None:
+        result["throughput"]["fused"] = round(_batch_throughput(predictor.predict, X, min_rows, repeat), 1)
+        result["latency_us"]["fused"] = _single_latency(predictor.predict, X, latency_rows)
+    result["issues"] = issues
+    return result
+
+def print_report(results: list[dict]) -> None:
+    """
+    以表格並排輸出所有模型的評估結果、混淆矩陣與發現的問題
+    """
+    header = f"{'model':<26}{'accuracy':>10}{'f1_macro':>10}{'sklearn rows/s':>16}{'fused rows/s':>14}" \
+             f"{'sklearn p50 us':>16}{'fused p50 us':>14}"
+    print("\n" + header)
+    print("-" * len(header))
+    for r in results:
+        # 融合預測器不支援的模型顯示 "-"
+        fused = r["throughput"]["fused"] is not None
+        fused_throughput = f"{r['throughput']['fused']:.0f}" if fused else "-"
+        fused_latency = f"{r['latency_us']['fused']['p50']:.1f}" if fused else "-"
+        print(f"{r['model']:<26}{r['metrics']['accuracy']:>10.4f}{r['metrics']['f1_macro']:>10.4f}"
+              f"{r['throughput']['sklearn']:>16.0f}{fused_throughput:>14}"
+              f"{r['latency_us']['sklearn']['p50']:>16.1f}{fused_latency:>14}")
+
+    for r in results:
+        print(f"\n{r['model']} ({r['estimator']}) confusion matrix (rows: answer, columns: predict)")
+        if r["label_mapping"]:
+            print(f"  note: {r['label_mapping']}")
+        width = max(len(str(label)) for label in r["labels"]) + 2
+        print(" " * width + "".join(f"{str(label):>{width}}" for label in r["labels"]))
+        for label, row in zip(r["labels"], r["confusion_matrix"]):
+            print(f"{str(label):<{width}}" + "".join(f"{count:>{width}}" for count in row))
+
+    issues = [(r["model"], issue) for r in results for issue in r["issues"]]
+    print("\nPreprocessing checks:" if issues else "\nPreprocessing checks: no issues found")
+    for model, issue in issues:
+        print(f"  [{model}] {issue}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline evaluation and throughput report for all saved models")
+    parser.add_argument("--dataset", help="dataset name or size (default: largest dataset)")
+    parser.add_argument("--models", nargs="+", help="saved model names (default: every model in Models/)")
+    parser.add_argument("--holdout", action="store_true",
+                        help="evaluate only the 20%% test split used by SVC_test (random_state=1, stratified)")
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions for the batch throughput measurement")
+    parser.add_argument("--rows", type=int, default=10000, help="minimum rows per throughput batch")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    X, y = LoadSave.load_dataset(1, dataset= args.dataset)
+    X = np.asarray(X, dtype=np.float64).reshape(len(X), -1)
+    y = np.asarray(y)
+    if args.holdout:
+        _, X, _, y = train_test_split(X, y, test_size=0.2, random_state=1, stratify=y)
+    print(f"Evaluating on {len(X)} rows, {len(np.unique(y))} classes")
+
+    results = []
+    for name in args.models or list_models():
+        try:
+            results.append(evaluate_model(name, X, y, repeat=args.repeat, min_rows=args.rows))
+        except Exception as e:
+            print(f"Error: cannot evaluate {name}: {e}", file=sys.stderr)
+
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "rows": len(X),
+                       "holdout": args.holdout, "results": results}, file, ensure_ascii=False, indent=2)
+        print(f"\nEvaluation results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
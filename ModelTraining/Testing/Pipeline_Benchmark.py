@@ -0,0 +1,240 @@
+"""
+不需要攝影機的端到端延遲測試
+
+將錄製的影片或 RawImgs 中的圖片依序送入與即時迴圈相同的流程:
+PrepareFrame (旋轉/縮放/轉色) → MediaPipe → Normalize_Landmark_Coords → scaler → model → 滑鼠指令 (記錄後端, 不實際移動滑鼠)
+並輸出每個階段的延遲百分位數、每秒處理畫面數與每個模型增加的記憶體 (JSON 格式, 方便比較不同版本)
+
+使用方式:
+    python -m ModelTraining.Testing.Pipeline_Benchmark                       # 使用 RawImgs 中的所有圖片 (不包含 .NoHand)
+    python -m ModelTraining.Testing.Pipeline_Benchmark --include-nohand      # 包含沒有手的圖片, 測試沒有偵測到手的路徑
+    python -m ModelTraining.Testing.Pipeline_Benchmark --video session.mp4   # 使用錄製的影片
+"""
+
+import os
+import cv2
+import json
+import time
+import platform
+import argparse
+import subprocess
+import numpy as np
+from typing import Optional
+
+from Models import _LoadSave as LoadSave
+from Models import _FusedInference as FusedInference
+from ModelTraining.Data.DataProcessBase import DataProcessBase
+from ModelTraining.Data.MemoryUsage import peak_memory_mb, current_memory_mb
+from CanvasApp.python.mouse_control import MouseController, MouseActuator, RecordingBackend
+
+import warnings
+warnings.filterwarnings("ignore", category= UserWarning)
+
+DIR_PATH = os.path.dirname(os.path.abspath(__file__))
+RAWIMGS_PATH = os.path.join(DIR_PATH, "..", "Data", "RawImgs")
+RESULTS_PATH = os.path.join(DIR_PATH, "BenchmarkResults")
+
+# 測試的模型與即時迴圈中的處理階段
+MODEL_NAMES = ["KMeans_2", "RandomForest_100", "SVC_1"]
+STAGES = ["prepare", "mediapipe", "normalize", "scale", "predict", "mouse"]
+
+def load_frames(video: Optional[str] = None, limit: Optional[int] = None, include_nohand: bool = False) -> list[np.ndarray]:
+    """
+    載入要重播的畫面
+
+    Args:
+        video (str, optional): 錄製的影片路徑, None 則使用 RawImgs 中的所有圖片
+        limit (int, optional): 最多載入的畫面數量
+        include_nohand (bool): 是否包含 RawImgs/.NoHand 中沒有手的圖片, 預設為 False
+    Returns:
+        list[np.ndarray]: BGR 畫面
+    Notes:
+        - .NoHand 排序在所有類別之前, 包含時搭配 limit 可能只載入沒有手的圖片, 使偵測之後的階段沒有樣本
+    """
+    frames = []
+    if video is not None:
+        cap = cv2.VideoCapture(video)
+        while limit is None or len(frames) < limit:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+    else:
+        for category in sorted(os.listdir(RAWIMGS_PATH)):
+            category_path = os.path.join(RAWIMGS_PATH, category)
+            if not os.path.isdir(category_path) or (category == ".NoHand" and not include_nohand):
+                continue
+            for img in sorted(os.listdir(category_path)):
+                frame = cv2.imread(os.path.join(category_path, img))
+                if frame is not None:
+                    frames.append(frame)
+        frames = frames[:limit]
+
+    if not frames:
+        raise FileNotFoundError("No frames to replay")
+    return frames
+
+def summarize(samples: np.ndarray) -> Optional[dict]:
+    """
+    計算延遲統計 (毫秒)
+
+    Args:
+        samples (np.ndarray): 每一幀的延遲 (秒), 沒有執行該階段的畫面為 NaN
+    Returns:
+        dict: count, mean, p50, p90, p95, p99, max (毫秒), 所有畫面都沒有執行該階段時回傳 None
+    """
+    ms = samples[np.isfinite(samples)] * 1000
+    if len(ms) == 0:
+        return None
+    p50, p90, p95, p99 = np.percentile(ms, [50, 90, 95, 99])
+    return {"count": int(len(ms)), "mean": float(ms.mean()), "p50": float(p50), "p90": float(p90),
+            "p95": float(p95), "p99": float(p99), "max": float(ms.max())}
+
+def run_model(name: str, frames: list[np.ndarray], predictor_type: str, repeat: int = 1,
+              mouse_log: Optional[str] = None) -> dict:
+    """
+    以指定的模型重播所有畫面, 並測量每個階段的延遲
+
+    Args:
+        name (str): 模型名稱
+        frames (list[np.ndarray]): 要重播的畫面
+        predictor_type (str): "sklearn" (scaler.transform + model.predict) 或 "fused" (融合預測器)
+        repeat (int): 重播次數
+        mouse_log (str, optional): 將記錄的滑鼠事件寫入的 JSON Lines 檔案
+    Returns:
+        dict: 該模型的測試結果
+    Notes:
+        - memory_delta_mb 為載入模型到重播結束之間增加的常駐記憶體, peak_memory_mb 為整個行程的峰值 (所有模型共用)
+        - 滑鼠階段與即時迴圈相同使用 MouseActuator, 測量的是更新目標的時間, 按鍵只有狀態改變時才會送出
+    """
+    memory_before = current_memory_mb()
+    model = LoadSave.load_model(name)
+    scaler = LoadSave.load_scaler(name)
+    if hasattr(model, "verbose"):
+        model.verbose = 0
+    predictor = FusedInference.compile_model(model, scaler) if predictor_type == "fused" else None
+
+    # 與即時迴圈相同, 使用影片模式 (非靜態圖片模式) 的 MediaPipe
+    processor = DataProcessBase(static_image_mode= False)
+    # 記錄後端只以時間戳記錄滑鼠事件, 可以在沒有顯示器的環境執行
+    backend = RecordingBackend(path= mouse_log)
+    mouse = MouseActuator(MouseController(backend= backend))
+
+    n_frames = len(frames) * repeat
+    timings = np.zeros((n_frames, len(STAGES)))
+    detected = 0
+
+    start = time.perf_counter()
+    for i in range(n_frames):
+        frame = frames[i % len(frames)]
+        t0 = time.perf_counter()
+
+        frame, imgRGB = processor.PrepareFrame(frame)
+        t1 = time.perf_counter()
+
+        result = processor.DetectHands(imgRGB)
+        t2 = time.perf_counter()
+
+        # 沒有偵測到手時, 即時迴圈只會放開滑鼠按鍵
+        if result.multi_hand_landmarks is None:
+            mouse.release()
+            t3 = time.perf_counter()
+            timings[i] = [t1 - t0, t2 - t1, np.nan, np.nan, np.nan, t3 - t2]
+            continue
+        detected += 1
+
+        landmarks = result.multi_hand_landmarks[0]
+        Finger_pos = (landmarks.landmark[8].x, landmarks.landmark[8].y)
+        _, coords = processor.Normalize_Landmark_Coords(landmarks)
+        coords = coords.reshape(-1)
+        t3 = time.perf_counter()
+
+        if predictor is None:
+            scaled = scaler.transform([coords])
+            t4 = time.perf_counter()
+            model.predict(scaled)
+        else:
+            t4 = time.perf_counter()
+            predictor.predict(coords)
+        t5 = time.perf_counter()
+
+        mouse.press(button="left")
+        mouse.move_to(int(Finger_pos[0] * mouse.screen_width), int(Finger_pos[1] * mouse.screen_height))
+        t6 = time.perf_counter()
+
+        timings[i] = [t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4, t6 - t5]
+    elapsed = time.perf_counter() - start
+    memory_after = current_memory_mb()
+    mouse_stats = mouse.stats()
+    mouse.close()
+
+    return {
+        "model": name,
+        "predictor": predictor_type,
+        "frames": n_frames,
+        "detected": detected,
+        "fps": n_frames / elapsed,
+        "stages": {stage: summarize(timings[:, j]) for j, stage in enumerate(STAGES)},
+        "total": summarize(np.nansum(timings, axis=1)),
+        "mouse_commands": len(backend.events),
+        "mouse": mouse_stats,
+        "memory_delta_mb": None if memory_before is None or memory_after is None else memory_after - memory_before,
+        "peak_memory_mb": peak_memory_mb(),
+    }
+
+def git_commit() -> Optional[str]:
+    """獲取目前的 git commit, 無法取得時回傳 None"""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=DIR_PATH,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Camera-free end-to-end latency benchmark")
+    parser.add_argument("--video", help="recorded video to replay (default: RawImgs images)")
+    parser.add_argument("--models", nargs="+", default=MODEL_NAMES, help="saved model names")
+    parser.add_argument("--predictor", choices=["sklearn", "fused", "both"], default="both")
+    parser.add_argument("--repeat", type=int, default=1, help="number of times to replay the frames")
+    parser.add_argument("--limit", type=int, help="maximum number of frames to load")
+    parser.add_argument("--include-nohand", action="store_true", help="also replay the RawImgs/.NoHand images")
+    parser.add_argument("--mouse-log", help="write the recorded mouse events of the last run to this JSON Lines file")
+    parser.add_argument("--output", help="output JSON path (default: BenchmarkResults/<time>_<commit>.json)")
+    args = parser.parse_args()
+
+    frames = load_frames(args.video, args.limit, args.include_nohand)
+    predictor_types = ["sklearn", "fused"] if args.predictor == "both" else [args.predictor]
+
+    results = []
+    for name in args.models:
+        for predictor_type in predictor_types:
+            result = run_model(name, frames, predictor_type, args.repeat, args.mouse_log)
+            results.append(result)
+
+            stages = ", ".join(f"{stage} {stats['p50']:.2f}/{stats['p95']:.2f}"
+                               for stage, stats in result["stages"].items() if stats is not None)
+            print(f"{name} [{predictor_type}]: {result['fps']:.1f} fps, "
+                  f"total p50 {result['total']['p50']:.2f} ms, p95 {result['total']['p95']:.2f} ms "
+                  f"(stage p50/p95 ms: {stages})")
+
+    # 將結果與執行環境資訊寫入 JSON
+    commit = git_commit()
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "source": args.video or "RawImgs",
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_PATH, f"{time.strftime('%Y%m%d_%H%M%S')}_{commit or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"\nBenchmark results saved to {output}")
+
+if __name__ == "__main__":
+    main()
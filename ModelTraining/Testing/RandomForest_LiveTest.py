@@ -1,15 +1,19 @@
+import sys
 import cv2
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
 
 from Models import _LoadSave as LoadSave
+from Models import _FusedInference as FusedInference
 from ModelTraining.Testing.LiveTest_DataProcessing import LiveTest_DataProcessor as DataProcessor
+from ModelTraining.Data.Pipeline import Pipeline, Packet
 
 class GestureCanvas_RandomForest:
-    def __init__(self):
+    def __init__(self, source= None):
         self.model: RandomForestClassifier = LoadSave.load_model("RandomForest_100")
         self.scaler: StandardScaler = LoadSave.load_scaler("RandomForest_100")
-        self.DataProcessing = DataProcessor()
+        self.predictor = FusedInference.compile_model(self.model, self.scaler)
+        self.DataProcessing = DataProcessor(source= source)
 
         self.model.verbose = 0  # 關閉詳細輸出
 
@@ -18,25 +22,41 @@ class GestureCanvas_RandomForest:
     def __del__(self):
         cv2.destroyAllWindows()
 
+    def classify(self, packet: Packet) -> tuple:
+        """分類階段: 使用融合預測器 (標準化已折疊進模型) 進行預測"""
+        frame, coords, Finger_pos = packet.value
+        prediction = None if coords is None else self.predictor.predict(coords)
+        return frame, prediction
+
     def startCanvas(self):
         print("Start Canvas")
 
-        while True:
-            frame, coords, Finger_pos = self.DataProcessing.getCoordData(draw=True)
-            if frame is not None:
-                cv2.imshow("Hand Recognition", frame)
-                
-            if cv2.waitKey(10) == ord('q'):
-                break
-
-            if coords is None:
-                continue
-
-            coords = self.scaler.transform([coords])
-
-            prediction = self.model.predict(coords)
-            print(*prediction)
+        # 畫面擷取、偵測與分類各自在獨立的執行緒中執行, 主執行緒只負責顯示畫面與輸出結果
+        # 佇列中的畫面可能被丟棄, 並排畫面不能環形重複使用緩衝區, 每一幀配置新的輸出畫面
+        self.DataProcessing.renderer.reuse_buffers = False
+        pipeline = Pipeline(self.DataProcessing.source.read,
+                            [("detect", lambda packet: self.DataProcessing.processFrame(packet.value, draw=True)),
+                             ("classify", self.classify)])
+        pipeline.start()
+
+        try:
+            for packet in pipeline:
+                frame, prediction = packet.value
+                if frame is not None:
+                    cv2.imshow("Hand Recognition", frame)
+                if prediction is not None:
+                    print(*prediction)
+
+                if cv2.waitKey(1) == ord('q'):
+                    break
+        finally:
+            # 影片、圖片或合成來源讀取完畢, 或按下 q 結束
+            pipeline.stop()
+            print("Capture stats:", self.DataProcessing.captureStats())
+            print("Hand stats:", self.DataProcessing.handStats())
+            print("Pipeline stats:", pipeline.stats())
 
 if __name__ == "__main__":
-    canvas = GestureCanvas_RandomForest()
+    # 可以傳入畫面來源描述, 例如 video:session.mp4, images:<資料夾>, synthetic
+    canvas = GestureCanvas_RandomForest(sys.argv[1] if len(sys.argv) > 1 else None)
     canvas.startCanvas()
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+import sys
 import numpy as np
 from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import KMeans
@@ -9,7 +10,9 @@ from Models import _LoadSave as LoadSave
 dir_path = os.path.dirname(os.path.abspath(__file__))
 np.set_printoptions(suppress=True)
 
-X, y = LoadSave.load_dataset(1)
+# 可以指定資料集名稱或資料數量, 例如: python KMeans_test.py 200
+# 沒有指定時, 在非互動環境中會自動選擇最大的資料集 (標準化需要完整資料, 因此直接載入記憶體)
+X, y = LoadSave.load_dataset(1, dataset= sys.argv[1] if len(sys.argv) > 1 else None)
 X_flatten = X.reshape(X.shape[0], -1)
 print(X_flatten.shape)
 # print(data_flatten)
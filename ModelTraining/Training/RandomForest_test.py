@@ -1,9 +1,12 @@
+import sys
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
 
 from Models import _LoadSave as LoadSave
 
-X, y = LoadSave.load_dataset(1)
+# 可以指定資料集名稱或資料數量, 例如: python RandomForest_test.py 200
+# 沒有指定時, 在非互動環境中會自動選擇最大的資料集 (標準化需要完整資料, 因此直接載入記憶體)
+X, y = LoadSave.load_dataset(1, dataset= sys.argv[1] if len(sys.argv) > 1 else None)
 
 # 數據標準化
 X_flatten = X.reshape(X.shape[0], -1)
@@ -0,0 +1,356 @@
+"""
+串流 (out-of-core) 訓練
+
+不將整個 (增強後的) 資料集載入記憶體, 而是從硬碟分批讀取關鍵點資料, 在每一批上即時進行資料增強,
+並以支援 partial_fit 的模型逐批訓練, 記憶體用量只與批次大小有關, 不隨資料集大小增加:
+1. 第一次讀取: 以 StandardScaler.partial_fit 累積標準化參數, 並以蓄水池抽樣保留少量資料 (核函數近似使用)
+2. 每個 epoch: 以隨機順序讀取資料區塊 → 資料增強 → 標準化 → (核函數近似) → partial_fit
+3. 每個 epoch 結束時以保留的驗證資料 (每 k 筆取 1 筆, 不增強) 評估
+
+模型:
+- sgd_linear: 線性 SGDClassifier (可以編譯成融合預測器)
+- sgd_rbf: RBFSampler (隨機傅立葉特徵) + SGDClassifier, 近似 RBF 核 SVC
+- sgd_nystroem: Nystroem + SGDClassifier, 以抽樣資料近似 RBF 核 SVC
+- minibatch_kmeans: MiniBatchKMeans (可以編譯成融合預測器)
+
+使用方式:
+    python -m ModelTraining.Training.Streaming_train --model sgd_rbf --dataset 200 --variants 10 --epochs 5
+    python -m ModelTraining.Training.Streaming_train --dataset 200 --export    # npz 資料集先轉換為 npy 格式
+"""
+
+import os
+import time
+import argparse
+import numpy as np
+from typing import Any, Iterator, Optional
+
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.linear_model import SGDClassifier
+from sklearn.kernel_approximation import RBFSampler, Nystroem
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from Models import _LoadSave as LoadSave
+from ModelTraining.Data.DataAugmentation import BatchAugmentation
+from ModelTraining.Data.MemoryUsage import peak_memory_mb
+
+MODELS = ("sgd_linear", "sgd_rbf", "sgd_nystroem", "minibatch_kmeans")
+
+class NpyReader:
+    """
+    以檔案讀取 (而不是 mmap) 讀取 npy 檔案中連續的資料列
+
+    mmap 讀取過的分頁會留在行程的常駐記憶體中, 讀完整個資料集後常駐記憶體會與資料集一樣大;
+    以 seek + np.fromfile 讀取則只有目前的區塊在記憶體中
+
+    Attributes:
+        shape (tuple): 陣列形狀
+        dtype (np.dtype): 陣列型別
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        version = np.lib.format.read_magic(self.file)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        self.shape, fortran_order, self.dtype = read_header(self.file)
+        if fortran_order:
+            raise ValueError(f"Fortran-ordered arrays are not supported: {path}")
+        self.offset = self.file.tell()
+        self.row_shape = self.shape[1:]
+        self.row_size = int(np.prod(self.row_shape, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def read(self, start: int, count: int) -> np.ndarray:
+        """讀取第 start 列開始的 count 列"""
+        count = max(0, min(count, len(self) - start))
+        self.file.seek(self.offset + start * self.row_size * self.dtype.itemsize)
+        return np.fromfile(self.file, dtype=self.dtype, count=count * self.row_size).reshape(count, *self.row_shape)
+
+    def close(self) -> None:
+        self.file.close()
+
+class BlockStream:
+    """
+    分區塊讀取 npy 格式的資料集
+
+    資料集 (通常依照類別排序) 被切成固定大小的區塊, 每一批由數個隨機位置的區塊組成並打亂順序,
+    讓每一批都包含多個類別, 同時每次只有一批資料在記憶體中
+
+    驗證資料以資料列交錯保留 (每 k 筆取 1 筆, k = round(1 / holdout)), 而不是保留整個區塊:
+    依照類別排序的資料集中, 整個區塊保留會讓某些類別完全沒有進入訓練資料, 交錯保留則與類別比例相同
+
+    Attributes:
+        X (NpyReader): 特徵, 形狀為 (n, 21, 3)
+        y (NpyReader): 標籤
+        block_size (int): 區塊大小
+        blocks (np.ndarray): 所有區塊的起始索引
+        val_every (int): 每 val_every 筆資料保留 1 筆作為驗證資料, 0 表示不保留
+        val_offset (int): 驗證資料的索引除以 val_every 的餘數
+        classes (np.ndarray): 所有類別 (分批讀取標籤取得)
+        train_classes (np.ndarray): 訓練資料中出現的類別
+        val_classes (np.ndarray): 驗證資料中出現的類別
+        n_val (int): 驗證資料數量
+    """
+
+    def __init__(self,
+                 dataset: Optional[str] = None,
+                 block_size: int = 64,
+                 holdout: float = 0.1,
+                 seed: int = 0,
+                 export: bool = False):
+        """
+        Args:
+            dataset (str, optional): 資料集名稱或資料數量, 詳見 LoadSave.find_dataset
+            block_size (int): 區塊大小, 預設為 64
+            holdout (float): 保留作為驗證資料的比例, 預設為 0.1 (每 10 筆取 1 筆)
+            seed (int): 驗證資料的起始位置與讀取順序的亂數種子
+            export (bool): 資料集為 npz 格式時, 是否先以 export_dataset_npy 轉換為 npy 格式 (寫入 DataSets 資料夾),
+                           預設為 False, npz 格式會拋出 ValueError
+        """
+        selected = LoadSave.find_dataset(dataset)
+        if selected["layout"] != "npy":
+            if not export:
+                raise ValueError(f"Dataset {selected['name']} is stored as npz and cannot be streamed; "
+                                 "pass export=True (--export) or call LoadSave.export_dataset_npy first.")
+            selected = LoadSave.find_dataset(LoadSave.export_dataset_npy(selected["name"]), layout="npy")
+        self.name = selected["name"]
+        self.X = NpyReader(os.path.join(selected["path"], "data.npy"))
+        self.y = NpyReader(os.path.join(selected["path"], "labels.npy"))
+        self.block_size = block_size
+        self.seed = seed
+        self.blocks = np.arange(0, len(self.X), block_size)
+
+        # 每 val_every 筆資料保留 1 筆作為驗證資料, 起始位置由種子決定
+        self.val_every = max(2, round(1 / holdout)) if holdout > 0 else 0
+        self.val_offset = int(np.random.default_rng(seed).integers(self.val_every)) if self.val_every else 0
+
+        # 分批讀取標籤取得所有類別與訓練、驗證資料各自的類別, 不將整個標籤陣列複製到記憶體
+        train_classes, val_classes = set(), set()
+        self.n_val = 0
+        for begin in range(0, len(self.y), 1 << 16):
+            y = self.y.read(begin, 1 << 16)
+            is_val = self._val_mask(begin, len(y))
+            train_classes.update(np.unique(y[~is_val]).tolist())
+            val_classes.update(np.unique(y[is_val]).tolist())
+            self.n_val += int(is_val.sum())
+        self.classes = np.array(sorted(train_classes | val_classes))
+        self.train_classes = np.array(sorted(train_classes))
+        self.val_classes = np.array(sorted(val_classes))
+
+    def _val_mask(self, start: int, count: int) -> np.ndarray:
+        """第 start 筆開始的 count 筆資料中, 哪些是驗證資料"""
+        if not self.val_every:
+            return np.zeros(count, dtype=bool)
+        return (np.arange(start, start + count) - self.val_offset) % self.val_every == 0
+
+    def missing_classes(self) -> np.ndarray:
+        """沒有出現在訓練資料中的類別 (例如某個類別的資料少於 val_every 筆)"""
+        return np.setdiff1d(self.classes, self.train_classes)
+
+    def batches(self, split: str = "train", batch_size: int = 1024, epoch: int = 0) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        """
+        讀取一個 epoch 的所有批次
+
+        Args:
+            split (str): "train" (隨機順序並打亂) 或 "val" (依序讀取)
+            batch_size (int): 每批資料數量 (增強前), 驗證資料每批為區塊中保留的資料列
+            epoch (int): epoch 編號, 與種子一起決定讀取順序
+        Yields:
+            tuple: (X_batch, y_batch), 形狀為 (b, 21, 3) 與 (b,)
+        """
+        if split == "val" and not self.n_val:
+            return
+        blocks = self.blocks
+        rng = np.random.default_rng([self.seed, epoch])
+        if split == "train":
+            blocks = rng.permutation(blocks)
+
+        per_batch = max(1, batch_size // self.block_size)
+        for i in range(0, len(blocks), per_batch):
+            X = np.concatenate([self.X.read(start, self.block_size) for start in blocks[i:i + per_batch]])
+            y = np.concatenate([self.y.read(start, self.block_size) for start in blocks[i:i + per_batch]])
+            is_val = np.concatenate([self._val_mask(start, min(self.block_size, len(self.X) - start))
+                                     for start in blocks[i:i + per_batch]])
+            keep = is_val if split == "val" else ~is_val
+            X, y = X[keep], y[keep]
+            if not len(X):
+                continue
+            if split == "train":
+                order = rng.permutation(len(X))
+                X, y = X[order], y[order]
+            yield np.asarray(X, dtype=np.float64), np.asarray(y)
+
+class StreamingTrainer:
+    """
+    串流訓練器
+
+    Attributes:
+        model_type (str): 模型種類, 詳見 MODELS
+        scaler (StandardScaler): 以 partial_fit 逐批更新的標準化器
+        feature_map: 核函數近似 (RBFSampler / Nystroem), 線性模型與 KMeans 為 None
+        estimator: 以 partial_fit 訓練的模型
+        augmentation (BatchAugmentation): 每批即時進行的資料增強
+    """
+
+    def __init__(self,
+                 model_type: str = "sgd_rbf",
+                 variants: int = 5,
+                 seed: int = 0,
+                 n_components: int = 300,
+                 gamma: float = 0.02,
+                 alpha: float = 1e-4,
+                 n_clusters: int = 5,
+                 reservoir_size: int = 2000):
+        """
+        Args:
+            model_type (str): 模型種類, 預設為 "sgd_rbf"
+            variants (int): 每筆資料即時產生的增強版本數量, 0 則不增強, 預設為 5
+            seed (int): 亂數種子
+            n_components (int): 核函數近似的維度, 預設為 300
+            gamma (float): RBF 核的 gamma (標準化後的 63 維特徵), 預設為 0.02
+            alpha (float): SGDClassifier 的正規化強度, 預設為 1e-4
+            n_clusters (int): MiniBatchKMeans 的群數, 預設為 5
+            reservoir_size (int): Nystroem 抽樣使用的最大資料數量, 預設為 2000
+        """
+        if model_type not in MODELS:
+            raise ValueError(f"Unknown model type: {model_type}, expected one of {MODELS}")
+        self.model_type = model_type
+        self.seed = seed
+        self.reservoir_size = reservoir_size
+        self.augmentation = BatchAugmentation(variants= variants, seed= seed) if variants > 0 else None
+
+        self.scaler = StandardScaler()
+        self.feature_map = None
+        if model_type == "sgd_rbf":
+            self.feature_map = RBFSampler(gamma=gamma, n_components=n_components, random_state=seed)
+        elif model_type == "sgd_nystroem":
+            self.feature_map = Nystroem(kernel="rbf", gamma=gamma, n_components=n_components, random_state=seed)
+
+        if model_type == "minibatch_kmeans":
+            self.estimator = MiniBatchKMeans(n_clusters=n_clusters, random_state=seed, n_init=3)
+        else:
+            self.estimator = SGDClassifier(loss="hinge", alpha=alpha, random_state=seed)
+
+    def _augment(self, X: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """即時資料增強並攤平成 (b * multiplicity, 63)"""
+        if self.augmentation is None:
+            return X.reshape(len(X), -1), y
+        return self.augmentation(X).reshape(-1, 63), np.repeat(y, self.augmentation.multiplicity)
+
+    def _features(self, X: np.ndarray) -> np.ndarray:
+        """標準化並套用核函數近似"""
+        Z = self.scaler.transform(X)
+        return self.feature_map.transform(Z) if self.feature_map is not None else Z
+
+    def fit_scaler(self, stream: BlockStream, batch_size: int = 1024) -> None:
+        """
+        第一次讀取: 以 partial_fit 累積標準化參數, 並以蓄水池抽樣保留最多 reservoir_size 筆資料擬合核函數近似
+        """
+        rng = np.random.default_rng(self.seed)
+        reservoir = np.empty((self.reservoir_size, 63))
+        seen = 0
+        for X, y in stream.batches("train", batch_size):
+            X, _ = self._augment(X, y)
+            self.scaler.partial_fit(X)
+
+            # 蓄水池抽樣 (向量化): 先填滿蓄水池, 之後第 i 筆資料以 reservoir_size / (i + 1) 的機率取代其中一筆
+            fill = min(max(self.reservoir_size - seen, 0), len(X))
+            reservoir[seen:seen + fill] = X[:fill]
+            slots = rng.integers(0, np.arange(seen + fill, seen + len(X)) + 1)
+            replace = slots < self.reservoir_size
+            reservoir[slots[replace]] = X[fill:][replace]
+            seen += len(X)
+
+        if self.feature_map is not None:
+            self.feature_map.fit(self.scaler.transform(reservoir[:min(seen, self.reservoir_size)]))
+
+    def partial_fit(self, X: np.ndarray, y: np.ndarray, classes: np.ndarray) -> None:
+        """以一批資料 (增強前) 更新模型"""
+        X, y = self._augment(X, y)
+        Z = self._features(X)
+        if self.model_type == "minibatch_kmeans":
+            self.estimator.partial_fit(Z)
+        else:
+            self.estimator.partial_fit(Z, y, classes=classes)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """預測 (增強前的) 資料, 形狀為 (b, 21, 3) 或 (b, 63)"""
+        return self.estimator.predict(self._features(np.asarray(X).reshape(len(X), -1)))
+
+    def evaluate(self, stream: BlockStream, batch_size: int = 1024) -> Optional[float]:
+        """
+        以驗證區塊評估準確率, KMeans 回傳每個群對應到最多標籤時的準確率, 沒有驗證資料時回傳 None
+        """
+        predictions, labels = [], []
+        for X, y in stream.batches("val", batch_size):
+            predictions.append(self.predict(X))
+            labels.append(y)
+        if not labels:
+            return None
+        predicted, y = np.concatenate(predictions), np.concatenate(labels)
+
+        if self.model_type == "minibatch_kmeans":
+            correct = sum(np.max(np.unique(y[predicted == c], return_counts=True)[1], initial=0)
+                          for c in np.unique(predicted))
+            return float(correct / len(y))
+        return float(np.mean(predicted == y))
+
+    def bundle_model(self) -> Any:
+        """組合包中的模型 (核函數近似時為 Pipeline(feature_map, estimator), 標準化器另外儲存)"""
+        return make_pipeline(self.feature_map, self.estimator) if self.feature_map is not None else self.estimator
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Out-of-core streaming training with on-the-fly augmentation")
+    parser.add_argument("--model", choices=MODELS, default="sgd_rbf")
+    parser.add_argument("--dataset", help="dataset name or size (default: largest dataset)")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=1024, help="rows per batch before augmentation")
+    parser.add_argument("--block-size", type=int, default=64, help="contiguous rows read per random block")
+    parser.add_argument("--variants", type=int, default=5, help="augmented variants per row (0 disables)")
+    parser.add_argument("--holdout", type=float, default=0.1, help="fraction of rows kept for validation (interleaved)")
+    parser.add_argument("--components", type=int, default=300, help="kernel approximation dimension")
+    parser.add_argument("--gamma", type=float, default=0.02)
+    parser.add_argument("--clusters", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--name", help="bundle name (default: Stream_<model>)")
+    parser.add_argument("--export", action="store_true", help="convert an npz dataset to the npy layout in DataSets first")
+    args = parser.parse_args()
+
+    try:
+        stream = BlockStream(args.dataset, block_size=args.block_size, holdout=args.holdout, seed=args.seed,
+                             export=args.export)
+    except ValueError as error:
+        raise SystemExit(f"Error: {error}")
+    print(f"Streaming {stream.name}: {len(stream.X)} rows in {len(stream.blocks)} blocks, "
+          f"{len(stream.X) - stream.n_val} train / {stream.n_val} validation rows, classes {stream.classes.tolist()}")
+
+    # 有類別沒有出現在訓練資料中時, 驗證結果沒有意義, 也不能儲存缺少類別的模型
+    missing = stream.missing_classes()
+    if len(missing):
+        raise SystemExit(f"Error: classes {missing.tolist()} have no training rows (holdout {args.holdout}), "
+                         "refusing to train; lower --holdout or add data")
+
+    trainer = StreamingTrainer(args.model, variants=args.variants, seed=args.seed, n_components=args.components,
+                               gamma=args.gamma, n_clusters=args.clusters)
+    start = time.perf_counter()
+    trainer.fit_scaler(stream, args.batch_size)
+
+    history = []
+    for epoch in range(args.epochs):
+        for X, y in stream.batches("train", args.batch_size, epoch):
+            trainer.partial_fit(X, y, stream.classes)
+        accuracy = trainer.evaluate(stream, args.batch_size)
+        history.append(accuracy)
+        print(f"epoch {epoch + 1}/{args.epochs}: validation accuracy "
+              f"{'n/a' if accuracy is None else f'{accuracy:.4f}'}, peak memory {peak_memory_mb() or 0:.1f} MB")
+
+    metrics = {"source": "streaming", "model_type": args.model, "dataset": stream.name, "epochs": args.epochs,
+               "variants": args.variants, "seed": args.seed, "validation_accuracy": history,
+               "train_seconds": round(time.perf_counter() - start, 2), "peak_memory_mb": peak_memory_mb()}
+    LoadSave.save_bundle(LoadSave.make_bundle(trainer.bundle_model(), trainer.scaler, metrics=metrics),
+                         args.name or f"Stream_{args.model}")
+
+if __name__ == "__main__":
+    main()
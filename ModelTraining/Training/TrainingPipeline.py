@@ -0,0 +1,346 @@
+"""
+可快取、可續跑的訓練流程
+
+取代每次執行都完整跑一次 GridSearchCV 的訓練腳本 (SVC_test / RandomForest_test / KMeans_test):
+1. 以連續減半 (successive halving) 搜尋超參數: 先以少量資料評估所有組合, 每一輪只保留最好的 1/factor 並增加資料量
+2. 每一輪的交叉驗證折只擬合一次標準化器 (以 joblib.Memory 快取在硬碟), 所有參數組合共用, 不會每個組合重新擬合
+3. 每個參數組合的分數寫入 JSON 紀錄檔, 中斷後重新執行會略過已評估的組合
+4. 以資料集雜湊值、程式碼版本與搜尋設定建立訓練紀錄 (Models/Training_Manifest.json), 都沒有改變時略過重新訓練
+5. 最佳參數以完整資料重新訓練後, 以模型組合包 (模型、標準化器、標籤與指標) 儲存
+
+使用方式:
+    python -m ModelTraining.Training.TrainingPipeline                          # 訓練所有模型家族, 使用最大的資料集
+    python -m ModelTraining.Training.TrainingPipeline --families svc --dataset 200
+    python -m ModelTraining.Training.TrainingPipeline --force                  # 忽略訓練紀錄, 重新搜尋 (仍使用快取)
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import hashlib
+import argparse
+import itertools
+import numpy as np
+from typing import Any, Callable, Optional
+
+import sklearn
+from joblib import Memory
+from sklearn.svm import SVC
+from sklearn.cluster import KMeans
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from sklearn.metrics import f1_score, silhouette_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+
+from Models import _LoadSave as LoadSave
+from ModelTraining.Data.DataProcessBase import config_hash
+
+DIR_PATH = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.path.join(DIR_PATH, "Cache")
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(LoadSave.__file__)), "Training_Manifest.json")
+
+# 擬合結果的硬碟快取, 以函式程式碼與參數 (包含陣列內容) 的雜湊值為鍵
+memory = Memory(os.path.join(CACHE_PATH, "joblib"), verbose=0)
+
+def _f1_macro(estimator: Any, X: np.ndarray, y: np.ndarray) -> float:
+    """分類模型的 macro F1 分數"""
+    return float(f1_score(y, estimator.predict(X), average="macro", zero_division=0))
+
+def _silhouette(estimator: Any, X: np.ndarray, y: np.ndarray) -> float:
+    """分群模型的輪廓係數 (不使用標籤), 只有一個群時回傳 -1"""
+    clusters = estimator.predict(X)
+    if len(np.unique(clusters)) < 2 or len(np.unique(clusters)) >= len(X):
+        return -1.0
+    return float(silhouette_score(X, clusters))
+
+# 模型家族: 估計器、固定參數、搜尋的參數網格、評分方式與預設的組合包名稱
+FAMILIES: dict[str, dict] = {
+    "svc": {
+        "estimator": SVC,
+        "base": {"random_state": 1},
+        "grid": [{"kernel": ["linear"], "C": [0.01, 0.1, 1.0, 10.0]},
+                 {"kernel": ["rbf"], "C": [0.01, 0.1, 1.0, 10.0], "gamma": [0.01, 0.1, 1.0, 10.0]}],
+        "scorer": _f1_macro,
+        "bundle": "SVC_Tuned",
+    },
+    "random_forest": {
+        "estimator": RandomForestClassifier,
+        "base": {"random_state": 0, "criterion": "gini", "class_weight": "balanced", "n_jobs": -1,
+                 "min_samples_split": 5, "min_samples_leaf": 2, "max_features": "sqrt", "max_samples": 0.8},
+        "grid": [{"n_estimators": [50, 100, 200], "max_depth": [4, 8, None], "ccp_alpha": [0.0, 0.01]}],
+        "scorer": _f1_macro,
+        "bundle": "RandomForest_Tuned",
+    },
+    "kmeans": {
+        "estimator": KMeans,
+        "base": {"random_state": 0, "n_init": 10},
+        "grid": [{"n_clusters": [2, 3, 4, 5, 6]}],
+        "scorer": _silhouette,
+        "bundle": "KMeans_Tuned",
+    },
+}
+
+def expand_grid(grid: list[dict]) -> list[dict]:
+    """
+    將參數網格展開為參數組合列表 (與 GridSearchCV 的 param_grid 格式相同)
+    """
+    candidates = []
+    for subgrid in grid:
+        keys = sorted(subgrid)
+        for values in itertools.product(*(subgrid[key] for key in keys)):
+            candidates.append(dict(zip(keys, values)))
+    return candidates
+
+def dataset_hash(X: np.ndarray, y: np.ndarray) -> str:
+    """
+    計算資料集內容的雜湊值 (特徵與標籤)
+    """
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(X, dtype=np.float64).tobytes())
+    digest.update(json.dumps(np.asarray(y).tolist()).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+def code_hash() -> str:
+    """
+    計算訓練程式碼版本的雜湊值 (此檔案內容、sklearn 版本與正規化設定)
+    """
+    with open(os.path.abspath(__file__), "rb") as file:
+        source = hashlib.sha256(file.read()).hexdigest()
+    return config_hash({"source": source, "sklearn": sklearn.__version__,
+                        "normalization": LoadSave.normalization_hash()})
+
+@memory.cache
+def _fit_scaler(X: np.ndarray) -> StandardScaler:
+    """擬合標準化器 (快取在硬碟)"""
+    return StandardScaler().fit(X)
+
+@memory.cache
+def _fit_final(estimator: type, params: dict, X: np.ndarray, y: np.ndarray) -> Any:
+    """
+    以完整資料擬合最佳參數的模型 (快取在硬碟)
+
+    快取鍵只包含函式參數, 因此估計器類別與完整參數 (固定參數與最佳參數合併) 都必須由呼叫端傳入,
+    不能在函式內讀取 FAMILIES, 否則修改固定參數後仍會取得舊的快取模型
+    """
+    return estimator(**params).fit(X, y)
+
+class SearchJournal:
+    """
+    參數搜尋紀錄檔, 記錄每一輪每個參數組合的分數, 中斷後重新執行時略過已評估的組合
+
+    Attributes:
+        path (str): 紀錄檔路徑
+        scores (dict): 鍵為 "{輪次}:{參數雜湊值}", 值為分數
+    """
+
+    def __init__(self, path: str, search_key: str):
+        self.path = path
+        self.search_key = search_key
+        self.scores: dict[str, float] = {}
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                journal = json.load(file)
+            # 搜尋設定不同 (資料集、程式碼或參數網格改變) 時不沿用舊的分數
+            if journal.get("search_key") == search_key:
+                self.scores = journal.get("scores", {})
+
+    @staticmethod
+    def key(round_index: int, params: dict) -> str:
+        return f"{round_index}:{config_hash(params)}"
+
+    def get(self, round_index: int, params: dict) -> Optional[float]:
+        return self.scores.get(self.key(round_index, params))
+
+    def record(self, round_index: int, params: dict, score: float) -> None:
+        """記錄分數並立即寫入檔案 (先寫入暫存檔再取代, 中斷時不會留下損壞的紀錄檔)"""
+        self.scores[self.key(round_index, params)] = score
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"search_key": self.search_key, "scores": self.scores}, file, indent=2)
+        os.replace(temp_path, self.path)
+
+def _stratified_subset(y: np.ndarray, size: int, seed: int) -> np.ndarray:
+    """依照標籤比例選出 size 筆資料的索引, size 不小於資料數量時回傳所有索引"""
+    indices = np.arange(len(y))
+    if size >= len(y):
+        return indices
+    subset, _ = train_test_split(indices, train_size=size, stratify=y, random_state=seed)
+    return np.sort(subset)
+
+def successive_halving(family: str,
+                       X: np.ndarray,
+                       y: np.ndarray,
+                       journal: SearchJournal,
+                       factor: int = 3,
+                       n_splits: int = 5,
+                       seed: int = 1,
+                       log: Callable[[str], None] = print) -> tuple[dict, float, list[dict]]:
+    """
+    以連續減半搜尋最佳參數
+
+    Args:
+        family (str): 模型家族, 詳見 FAMILIES
+        X (np.ndarray): 特徵, 形狀為 (n, 63)
+        y (np.ndarray): 標籤
+        journal (SearchJournal): 搜尋紀錄檔
+        factor (int): 每一輪保留 1/factor 的參數組合, 並將資料量乘以 factor
+        n_splits (int): 交叉驗證折數
+        seed (int): 資料子集與交叉驗證的亂數種子
+        log (Callable): 輸出進度的函式
+    Returns:
+        tuple: (best_params, best_score, rounds)
+        - rounds (list[dict]): 每一輪的資料量、參數組合數量與最佳分數
+    Notes:
+        - 第一輪的資料量為 n / factor^(輪數-1), 但至少為 2 * n_splits * 類別數, 最後一輪使用完整資料
+        - 同一輪中每個交叉驗證折的標準化器只擬合一次, 所有參數組合共用
+    """
+    spec = FAMILIES[family]
+    candidates = expand_grid(spec["grid"])
+    n_classes = len(np.unique(y))
+    n_rounds = max(1, math.ceil(math.log(len(candidates), factor))) if len(candidates) > 1 else 1
+    min_resources = 2 * n_splits * n_classes
+
+    rounds = []
+    for round_index in range(n_rounds):
+        resources = max(min_resources, len(X) // factor ** (n_rounds - 1 - round_index))
+        subset = _stratified_subset(y, resources, seed)
+        X_round, y_round = X[subset], y[subset]
+
+        # 每一折的標準化器只擬合一次 (硬碟快取, 重新執行時直接載入)
+        folds = []
+        for train, test in StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=seed).split(X_round, y_round):
+            scaler = _fit_scaler(X_round[train])
+            folds.append((scaler.transform(X_round[train]), y_round[train], scaler.transform(X_round[test]), y_round[test]))
+
+        scores = []
+        for params in candidates:
+            score = journal.get(round_index, params)
+            if score is None:
+                fold_scores = [spec["scorer"](spec["estimator"](**spec["base"], **params).fit(X_train, y_train), X_test, y_test)
+                               for X_train, y_train, X_test, y_test in folds]
+                score = float(np.mean(fold_scores))
+                journal.record(round_index, params, score)
+            scores.append(score)
+
+        # 依照分數排序 (分數相同時保留網格中較前面的組合), 保留最好的 1/factor
+        order = sorted(range(len(candidates)), key=lambda i: -scores[i])
+        rounds.append({"round": round_index, "resources": len(subset), "candidates": len(candidates),
+                       "best_score": scores[order[0]], "best_params": candidates[order[0]]})
+        log(f"  round {round_index}: {len(candidates)} candidates on {len(subset)} rows, "
+            f"best {scores[order[0]]:.4f} {candidates[order[0]]}")
+
+        if round_index == n_rounds - 1:
+            return candidates[order[0]], scores[order[0]], rounds
+        candidates = [candidates[i] for i in order[:max(1, math.ceil(len(candidates) / factor))]]
+
+def load_manifest() -> dict:
+    """載入訓練紀錄, 不存在時回傳空字典"""
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    with open(MANIFEST_PATH, encoding="utf-8") as file:
+        return json.load(file)
+
+def save_manifest(manifest: dict) -> None:
+    """儲存訓練紀錄"""
+    with open(MANIFEST_PATH, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=2, default=str)
+
+def train_family(family: str,
+                 X: np.ndarray,
+                 y: np.ndarray,
+                 dataset_name: str,
+                 bundle_name: Optional[str] = None,
+                 factor: int = 3,
+                 n_splits: int = 5,
+                 seed: int = 1,
+                 force: bool = False) -> dict:
+    """
+    搜尋、訓練並儲存一個模型家族的最佳模型
+
+    Args:
+        family (str): 模型家族, 詳見 FAMILIES
+        X (np.ndarray): 特徵, 形狀為 (n, 63)
+        y (np.ndarray): 標籤
+        dataset_name (str): 資料集名稱 (記錄在訓練紀錄中)
+        bundle_name (str, optional): 組合包名稱, None 則使用 FAMILIES 中的預設名稱
+        factor, n_splits, seed: 連續減半搜尋的設定, 詳見 successive_halving
+        force (bool): 是否忽略訓練紀錄重新搜尋
+    Returns:
+        dict: 訓練紀錄 (資料集 / 程式碼 / 搜尋設定的雜湊值、最佳參數與指標)
+    Notes:
+        - 資料集、程式碼版本與搜尋設定都沒有改變且組合包存在時, 直接回傳既有的訓練紀錄
+    """
+    spec = FAMILIES[family]
+    bundle_name = bundle_name or spec["bundle"]
+    data_key, code_key = dataset_hash(X, y), code_hash()
+    search_config = {"family": family, "base": spec["base"], "grid": spec["grid"],
+                     "factor": factor, "n_splits": n_splits, "seed": seed}
+    search_key = config_hash({"dataset": data_key, "code": code_key, "search": search_config})
+
+    manifest = load_manifest()
+    bundle_path = os.path.join(os.path.dirname(MANIFEST_PATH), bundle_name + "_Bundle.joblib")
+    previous = manifest.get(bundle_name)
+    if not force and previous is not None and previous.get("search_key") == search_key and os.path.exists(bundle_path):
+        print(f"{bundle_name}: dataset, code and parameters unchanged, skipping retraining")
+        return previous
+
+    start = time.perf_counter()
+    print(f"{bundle_name}: searching {len(expand_grid(spec['grid']))} candidates ({family})")
+    journal = SearchJournal(os.path.join(CACHE_PATH, f"{bundle_name}_{search_key}.journal.json"), search_key)
+    best_params, best_score, rounds = successive_halving(family, X, y, journal, factor, n_splits, seed)
+
+    # 以完整資料重新擬合標準化器與最佳參數的模型, 標準化器在組合包中與模型分開儲存 (即時迴圈以融合預測器折疊)
+    scaler = _fit_scaler(X)
+    model = _fit_final(spec["estimator"], {**spec["base"], **best_params}, scaler.transform(X), y)
+    elapsed = time.perf_counter() - start
+
+    record = {
+        "family": family,
+        "dataset": dataset_name,
+        "dataset_hash": data_key,
+        "code_hash": code_key,
+        "params_hash": config_hash(search_config),
+        "search_key": search_key,
+        "best_params": best_params,
+        "cv_score": best_score,
+        "scorer": spec["scorer"].__name__.lstrip("_"),
+        "rounds": rounds,
+        "train_seconds": round(elapsed, 2),
+        "trained": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    LoadSave.save_bundle(LoadSave.make_bundle(model, scaler, metrics=record), bundle_name)
+
+    manifest[bundle_name] = record
+    save_manifest(manifest)
+    print(f"{bundle_name}: best {record['scorer']} {best_score:.4f} with {best_params} ({elapsed:.1f}s)")
+    return record
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cached, resumable successive-halving training for all model families")
+    parser.add_argument("--families", nargs="+", choices=list(FAMILIES), default=list(FAMILIES))
+    parser.add_argument("--dataset", help="dataset name or size (default: largest dataset)")
+    parser.add_argument("--factor", type=int, default=3, help="keep 1/factor of the candidates per round")
+    parser.add_argument("--splits", type=int, default=5, help="cross-validation folds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--force", action="store_true", help="search again even if nothing changed")
+    args = parser.parse_args()
+
+    selected = LoadSave.find_dataset(args.dataset) if args.dataset else LoadSave.find_dataset(size=max(
+        d["size"] for d in LoadSave.list_datasets()))
+    X, y = LoadSave.load_dataset(1, dataset= selected["name"], mmap_mode= 'r')
+    X = np.asarray(X, dtype=np.float64).reshape(len(X), -1)
+    y = np.asarray(y)
+
+    for family in args.families:
+        try:
+            train_family(family, X, y, selected["name"], factor=args.factor, n_splits=args.splits,
+                         seed=args.seed, force=args.force)
+        except Exception as e:
+            print(f"Error: training {family} failed: {e}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
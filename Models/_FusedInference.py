@@ -0,0 +1,491 @@
+"""
+融合推論引擎
+
+將儲存的標準化器 (StandardScaler) 與模型 (KMeans / SVC / RandomForest) 編譯成只依賴 numpy 的預測器,
+讓即時迴圈不需要每一幀都經過 sklearn 的輸入檢查與分派 (scaler.transform + model.predict)
+
+- KMeans: 將標準化折疊進群中心, 以預先計算的範數做最近群中心查找
+- SVC: 將標準化折疊進線性權重 (linear) 或支持向量 (rbf / poly / sigmoid), 以 one-vs-one 投票預測
+- RandomForest: 將所有決策樹攤平成連續的節點陣列, 以向量化方式同時走訪所有樹
+- 線性分類器 (例如 SGDClassifier): 將標準化折疊進權重, 預測只需要一次矩陣乘法
+
+編譯後的預測器可以用 save_compiled 存成未壓縮的 joblib 檔, 其他程序以 load_compiled (mmap_mode='r') 載入時,
+所有陣列都對應到同一份唯讀的檔案分頁, 多個程序共用一份記憶體
+"""
+
+import os
+import time
+import numpy as np
+from typing import Any, Optional, Sequence
+
+# 編譯後預測器的儲存資料夾
+COMPILED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Compiled")
+
+class UnsupportedModelError(TypeError):
+    """融合預測器不支援的模型類型、前處理步驟或 SVC 核函數"""
+
+def _scaler_chain(model: Any, scaler: Any = None) -> tuple[Any, list[tuple[np.ndarray, np.ndarray]]]:
+    """
+    取出模型前所有 StandardScaler 的 (mean, scale), 並回傳最終的估計器
+
+    Args:
+        model: sklearn 模型或 Pipeline
+        scaler: 在模型之外另外套用的 StandardScaler, 可為 None
+    Returns:
+        tuple: (estimator, chain)
+        - estimator: Pipeline 的最後一個估計器 (若不是 Pipeline 則為模型本身)
+        - chain (list): 依序套用的 (mean, scale) 列表
+    """
+
+    # 外部標準化器與 Pipeline 內的標準化器依序串接 (即時迴圈中先套用外部標準化器, 再進入 Pipeline)
+    scalers = [scaler] if scaler is not None else []
+    estimator = model
+    if hasattr(model, "steps"):
+        scalers += [step for _, step in model.steps[:-1]]
+        estimator = model.steps[-1][1]
+
+    chain = []
+    for step in scalers:
+        if not (hasattr(step, "mean_") and hasattr(step, "scale_")):
+            raise UnsupportedModelError(f"Unsupported preprocessing step: {type(step).__name__}")
+        n_features = step.n_features_in_
+        mean = step.mean_ if step.mean_ is not None else np.zeros(n_features)
+        scale = step.scale_ if step.scale_ is not None else np.ones(n_features)
+        chain.append((np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)))
+
+    return estimator, chain
+
+def _fold_affine(chain: list[tuple[np.ndarray, np.ndarray]], n_features: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    將多個標準化步驟合併成單一的 (mean, scale), 使 z = (x - mean) / scale
+    """
+    mean = np.zeros(n_features)
+    scale = np.ones(n_features)
+    for m, s in chain:
+        # ((x - mean) / scale - m) / s = (x - (mean + m * scale)) / (scale * s)
+        mean = mean + m * scale
+        scale = scale * s
+    return mean, scale
+
+class FusedPredictor:
+    """
+    融合預測器基類
+
+    Attributes:
+        classes_ (np.ndarray): 預測標籤, predict 回傳的值取自此陣列
+        n_features_in_ (int): 輸入特徵數量
+    """
+
+    classes_: np.ndarray
+    n_features_in_: int
+
+    def _as_2d(self, X: Any) -> np.ndarray:
+        """將單筆 (63,) 或多筆 (n, 63) 輸入統一轉換為二維 float64 陣列"""
+        X = np.asarray(X, dtype=np.float64)
+        return X.reshape(1, -1) if X.ndim == 1 else X
+
+    def predict(self, X: Any) -> np.ndarray:
+        """
+        預測標籤
+
+        Args:
+            X: 單筆 (63,) 或多筆 (n, 63) 未標準化的特徵
+        Returns:
+            np.ndarray: 預測標籤, 形狀為 (n,)
+        """
+        return self.classes_[self._predict_index(self._as_2d(X))]
+
+    def predict_confidence(self, X: Any) -> tuple[np.ndarray, np.ndarray]:
+        """
+        預測標籤與信心值
+
+        Args:
+            X: 單筆 (63,) 或多筆 (n, 63) 未標準化的特徵
+        Returns:
+            tuple: (labels, confidence)
+            - labels (np.ndarray): 預測標籤, 形狀為 (n,), 與 predict 相同
+            - confidence (np.ndarray): 預測類別的分數 (0 ~ 1), 形狀為 (n,), 定義見各預測器的 class_scores
+        """
+        scores = self.class_scores(self._as_2d(X))
+        index = np.argmax(scores, axis=1)
+        return self.classes_[index], scores[np.arange(len(scores)), index]
+
+    def class_scores(self, X: Any) -> np.ndarray:
+        """
+        每個類別的分數 (0 ~ 1), 最大值的位置與 predict 相同
+
+        Returns:
+            np.ndarray: 形狀為 (n, n_classes)
+        """
+        raise NotImplementedError
+
+    def _predict_index(self, X: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+def _softmax(scores: np.ndarray) -> np.ndarray:
+    """每列的 softmax"""
+    scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+    return scores / scores.sum(axis=1, keepdims=True)
+
+class FusedKMeans(FusedPredictor):
+    """
+    折疊標準化的 KMeans 最近群中心預測器
+
+    對標準化後的輸入 z = (x - m) / s 與群中心 c:
+        ||z - c||^2 = ||z||^2 - 2 z·c + ||c||^2
+    其中 ||z||^2 與群中心無關可略去, 且 z·c = x·(c / s) - (m / s)·c,
+    因此預測只需要一次矩陣乘法: argmin(bias - x @ W.T)
+    """
+
+    def __init__(self, estimator: Any, chain: list[tuple[np.ndarray, np.ndarray]]):
+        centers = np.asarray(estimator.cluster_centers_, dtype=np.float64)
+        self.n_features_in_ = centers.shape[1]
+        mean, scale = _fold_affine(chain, self.n_features_in_)
+
+        # 預先計算折疊後的權重與偏差 (包含群中心範數)
+        self.W = 2.0 * centers / scale
+        self.bias = np.einsum("ij,ij->i", centers, centers) + 2.0 * (centers @ (mean / scale))
+        self.classes_ = np.arange(len(centers), dtype=np.int32)
+
+        # 信心值需要完整的距離 (包含 ||z||^2), 保留標準化參數
+        self.mean = mean
+        self.inv_scale = 1.0 / scale
+
+    def _predict_index(self, X: np.ndarray) -> np.ndarray:
+        return np.argmin(self.bias - X @ self.W.T, axis=1)
+
+    def class_scores(self, X: Any) -> np.ndarray:
+        """標準化空間中到每個群中心的平方距離倒數, 正規化為總和 1 (只有一個群很近時接近 1, 位於兩群中間時接近 0.5)"""
+        X = self._as_2d(X)
+        Z = (X - self.mean) * self.inv_scale
+        sq_dist = np.maximum(np.einsum("ij,ij->i", Z, Z)[:, np.newaxis] + self.bias - X @ self.W.T, 1e-12)
+        inverse = 1.0 / sq_dist
+        return inverse / inverse.sum(axis=1, keepdims=True)
+
+class FusedSVC(FusedPredictor):
+    """
+    折疊標準化的 SVC one-vs-one 預測器
+
+    - linear: 每一對類別的權重 w_ij 預先由支持向量計算, 並折疊標準化, 預測只需要一次矩陣乘法
+    - rbf / poly / sigmoid: 將標準化折疊進支持向量, 計算核函數後以對偶係數得到每一對類別的決策值
+    預測規則與 libsvm 相同: 決策值 > 0 投票給類別 i, 否則投票給類別 j, 票數相同時取索引較小的類別
+    """
+
+    def __init__(self, estimator: Any, chain: list[tuple[np.ndarray, np.ndarray]]):
+        self.kernel = estimator.kernel
+        if self.kernel not in ("linear", "rbf", "poly", "sigmoid"):
+            raise UnsupportedModelError(f"Unsupported SVC kernel: {self.kernel}")
+
+        support_vectors = np.asarray(estimator.support_vectors_, dtype=np.float64)
+        dual_coef = np.asarray(estimator._dual_coef_, dtype=np.float64)
+        intercept = np.asarray(estimator._intercept_, dtype=np.float64)
+        n_support = np.asarray(estimator._n_support)
+        n_classes = len(n_support)
+
+        self.n_features_in_ = support_vectors.shape[1]
+        self.classes_ = np.asarray(estimator.classes_)
+        self.gamma = float(estimator._gamma)
+        self.coef0 = float(estimator.coef0)
+        self.degree = int(estimator.degree)
+        mean, scale = _fold_affine(chain, self.n_features_in_)
+
+        # 依照 libsvm 的順序建立每一對類別 (i, j) 與其支持向量區段
+        starts = np.concatenate([[0], np.cumsum(n_support)])
+        self.pairs = np.array([(i, j) for i in range(n_classes) for j in range(i + 1, n_classes)], dtype=np.intp)
+        self.n_classes = n_classes
+
+        # 每一對類別的對偶係數展開為 (n_pairs, n_SV), 不屬於該對類別的支持向量係數為 0
+        pair_coef = np.zeros((len(self.pairs), len(support_vectors)))
+        for p, (i, j) in enumerate(self.pairs):
+            pair_coef[p, starts[i]:starts[i + 1]] = dual_coef[j - 1, starts[i]:starts[i + 1]]
+            pair_coef[p, starts[j]:starts[j + 1]] = dual_coef[i, starts[j]:starts[j + 1]]
+
+        if self.kernel == "linear":
+            # w_ij·z + b = (w_ij / s)·x + (b - w_ij·(m / s))
+            w = pair_coef @ support_vectors
+            self.W = w / scale
+            self.bias = intercept - w @ (mean / scale)
+        else:
+            # 將標準化折疊進支持向量:
+            # rbf: z - sv = x / s - (m / s + sv)
+            # poly / sigmoid: z·sv = (x / s)·sv - (m / s)·sv
+            self.inv_scale = 1.0 / scale
+            if self.kernel == "rbf":
+                self.support_vectors = mean / scale + support_vectors
+                self.sv_offset = np.einsum("ij,ij->i", self.support_vectors, self.support_vectors)
+            else:
+                self.support_vectors = support_vectors
+                self.sv_offset = support_vectors @ (mean / scale)
+            self.pair_coef = pair_coef
+            self.bias = intercept
+
+    def decision_function(self, X: Any) -> np.ndarray:
+        """
+        計算每一對類別的決策值 (與 libsvm 相同的 one-vs-one 決策值)
+
+        Returns:
+            np.ndarray: 形狀為 (n, n_pairs)
+        """
+        X = self._as_2d(X)
+        if self.kernel == "linear":
+            return X @ self.W.T + self.bias
+
+        Xs = X * self.inv_scale
+        if self.kernel == "rbf":
+            sq_dist = np.einsum("ij,ij->i", Xs, Xs)[:, np.newaxis] - 2.0 * (Xs @ self.support_vectors.T) + self.sv_offset
+            K = np.exp(-self.gamma * np.maximum(sq_dist, 0.0))
+        elif self.kernel == "poly":
+            K = (self.gamma * (Xs @ self.support_vectors.T - self.sv_offset) + self.coef0) ** self.degree
+        else:
+            K = np.tanh(self.gamma * (Xs @ self.support_vectors.T - self.sv_offset) + self.coef0)
+        return K @ self.pair_coef.T + self.bias
+
+    def _predict_index(self, X: np.ndarray) -> np.ndarray:
+        dec = self.decision_function(X)
+
+        # one-vs-one 投票, 決策值 > 0 投票給 i, 否則投票給 j
+        winners = np.where(dec > 0, self.pairs[:, 0], self.pairs[:, 1])
+        votes = np.zeros((len(X), self.n_classes), dtype=np.intp)
+        np.add.at(votes, (np.arange(len(X))[:, np.newaxis], winners), 1)
+        return np.argmax(votes, axis=1)
+
+    def class_scores(self, X: Any) -> np.ndarray:
+        """one-vs-one 投票比例 (每個類別得到的票數 / 可以得到的最多票數 n_classes - 1)"""
+        X = self._as_2d(X)
+        dec = self.decision_function(X)
+        winners = np.where(dec > 0, self.pairs[:, 0], self.pairs[:, 1])
+        votes = np.zeros((len(X), self.n_classes))
+        np.add.at(votes, (np.arange(len(X))[:, np.newaxis], winners), 1.0)
+        return votes / (self.n_classes - 1)
+
+class FusedRandomForest(FusedPredictor):
+    """
+    攤平成連續節點陣列的隨機森林預測器
+
+    所有決策樹的節點依序串接成 feature / threshold / left / right / value 陣列,
+    葉節點的左右子節點指向自己, 因此只要走訪 max_depth 次即可同時得到所有樹的葉節點
+
+    Notes:
+        - sklearn 在樹中以 float32 比較特徵與門檻值, 為了得到完全相同的結果,
+          標準化在輸入上依序套用後轉為 float32, 而不是折疊進門檻值
+    """
+
+    def __init__(self, estimator: Any, chain: list[tuple[np.ndarray, np.ndarray]]):
+        self.chain = chain
+        self.classes_ = np.asarray(estimator.classes_)
+        self.n_features_in_ = int(estimator.n_features_in_)
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for tree in (est.tree_ for est in estimator.estimators_):
+            n_nodes = tree.node_count
+            left = tree.children_left.astype(np.intp)
+            right = tree.children_right.astype(np.intp)
+            is_leaf = left == -1
+            node_ids = np.arange(n_nodes)
+
+            # 葉節點指向自己, 門檻值設為無限大
+            lefts.append(np.where(is_leaf, node_ids, left) + offset)
+            rights.append(np.where(is_leaf, node_ids, right) + offset)
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.intp))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+
+            # 與 sklearn 相同, 將節點數值正規化為機率
+            value = tree.value[:, 0, :len(self.classes_)].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+
+            roots.append(offset)
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        self.feature = np.concatenate(features)
+        self.threshold = np.concatenate(thresholds)
+        self.left = np.concatenate(lefts)
+        self.right = np.concatenate(rights)
+        self.value = np.concatenate(values)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.max_depth = max_depth
+
+    def predict_proba(self, X: Any) -> np.ndarray:
+        """
+        預測每個類別的機率 (所有樹的平均)
+
+        Returns:
+            np.ndarray: 形狀為 (n, n_classes)
+        """
+        Z = self._as_2d(X)
+        for mean, scale in self.chain:
+            Z = (Z - mean) / scale
+        Z = Z.astype(np.float32)
+
+        # 同時走訪所有列與所有樹, 形狀為 (n, n_trees)
+        rows = np.arange(len(Z))[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (len(Z), len(self.roots)))
+        for _ in range(self.max_depth):
+            go_left = Z[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return self.value[nodes].sum(axis=1) / len(self.roots)
+
+    def _predict_index(self, X: np.ndarray) -> np.ndarray:
+        return np.argmax(self.predict_proba(X), axis=1)
+
+    def class_scores(self, X: Any) -> np.ndarray:
+        """所有樹的平均機率 (predict_proba)"""
+        return self.predict_proba(X)
+
+class FusedLinear(FusedPredictor):
+    """
+    折疊標準化的線性分類器預測器 (SGDClassifier / LogisticRegression / LinearSVC 等具有 coef_ 與 intercept_ 的模型)
+
+    w·z + b = (w / s)·x + (b - w·(m / s)), 預測只需要一次矩陣乘法:
+    多類別時取決策值最大的類別 (one-vs-rest), 二元分類時決策值 > 0 為 classes_[1]
+    """
+
+    def __init__(self, estimator: Any, chain: list[tuple[np.ndarray, np.ndarray]]):
+        coef = np.atleast_2d(np.asarray(estimator.coef_, dtype=np.float64))
+        intercept = np.atleast_1d(np.asarray(estimator.intercept_, dtype=np.float64))
+        self.n_features_in_ = coef.shape[1]
+        self.classes_ = np.asarray(estimator.classes_)
+        mean, scale = _fold_affine(chain, self.n_features_in_)
+
+        self.W = coef / scale
+        self.bias = intercept - coef @ (mean / scale)
+
+    def decision_function(self, X: Any) -> np.ndarray:
+        """
+        計算決策值
+
+        Returns:
+            np.ndarray: 多類別時形狀為 (n, n_classes), 二元分類時為 (n, 1)
+        """
+        return self._as_2d(X) @ self.W.T + self.bias
+
+    def _predict_index(self, X: np.ndarray) -> np.ndarray:
+        dec = self.decision_function(X)
+        if dec.shape[1] == 1:
+            return (dec[:, 0] > 0).astype(np.intp)
+        return np.argmax(dec, axis=1)
+
+    def class_scores(self, X: Any) -> np.ndarray:
+        """決策值的 softmax (二元分類時為 sigmoid)"""
+        dec = self.decision_function(X)
+        if dec.shape[1] == 1:
+            dec = np.hstack([np.zeros_like(dec), dec])
+        return _softmax(dec)
+
+def compile_model(model: Any, scaler: Any = None) -> FusedPredictor:
+    """
+    將 sklearn 模型與標準化器編譯成融合預測器
+
+    Args:
+        model: KMeans / SVC / RandomForestClassifier / 線性分類器, 或以 StandardScaler 開頭的 Pipeline
+        scaler (StandardScaler, optional): 在模型之前套用的標準化器
+    Returns:
+        FusedPredictor: 只依賴 numpy 的預測器, predict 的輸入為未標準化的特徵
+    Notes:
+        - 不支援的模型類型、前處理步驟或 SVC 核函數拋出 UnsupportedModelError (TypeError 的子類別)
+    """
+    estimator, chain = _scaler_chain(model, scaler)
+
+    if hasattr(estimator, "cluster_centers_"):
+        return FusedKMeans(estimator, chain)
+    if hasattr(estimator, "support_vectors_"):
+        return FusedSVC(estimator, chain)
+    if hasattr(estimator, "estimators_") and hasattr(estimator.estimators_[0], "tree_"):
+        return FusedRandomForest(estimator, chain)
+    if hasattr(estimator, "coef_") and hasattr(estimator, "classes_"):
+        return FusedLinear(estimator, chain)
+
+    raise UnsupportedModelError(f"Unsupported model type: {type(estimator).__name__}")
+
+def compile_saved(name: str) -> FusedPredictor:
+    """
+    載入 Models 資料夾中儲存的 {name}_Model / {name}_Scaler, 並編譯成融合預測器
+
+    Args:
+        name (str): 模型名稱, 例如 "KMeans_2"
+    Returns:
+        FusedPredictor: 融合預測器
+    """
+    from Models import _LoadSave as LoadSave
+
+    return compile_model(LoadSave.load_model(name), LoadSave.load_scaler(name))
+
+def save_compiled(predictor: FusedPredictor, name: str) -> str:
+    """
+    將融合預測器儲存為未壓縮的 joblib 檔, 路徑 Models/Compiled/{name}_Fused.joblib
+
+    Args:
+        predictor (FusedPredictor): 融合預測器
+        name (str): 預測器名稱, 例如組合包名稱 "KMeans_2"
+    Returns:
+        str: 儲存路徑
+    Notes:
+        - 先寫入暫存檔再取代, 已經以 mmap 載入舊檔案的程序不會讀到寫到一半的檔案
+    """
+    from joblib import dump
+
+    os.makedirs(COMPILED_PATH, exist_ok=True)
+    path = os.path.join(COMPILED_PATH, name + "_Fused.joblib")
+    dump(predictor, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    return path
+
+def load_compiled(name: str, mmap_mode: Optional[str] = 'r') -> FusedPredictor:
+    """
+    載入 save_compiled 儲存的融合預測器
+
+    Args:
+        name (str): 預測器名稱或 .joblib 檔案路徑
+        mmap_mode (str, optional): 傳入 joblib.load 的 mmap_mode, 預設為 'r' (唯讀共用分頁), None 則完整載入
+    Returns:
+        FusedPredictor: 融合預測器, mmap 載入時陣列為唯讀的 np.memmap
+    """
+    from joblib import load
+
+    path = name if name.endswith(".joblib") else os.path.join(COMPILED_PATH, name + "_Fused.joblib")
+    return load(path, mmap_mode=mmap_mode)
+
+def _time_per_call(fn, rows: Sequence[np.ndarray], repeat: int = 3) -> float:
+    """回傳單筆呼叫的平均延遲 (微秒), 取多次重複中最快的一次"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for row in rows:
+            fn(row)
+        best = min(best, (time.perf_counter() - start) / len(rows))
+    return best * 1e6
+
+if __name__ == "__main__":
+    import os
+    from Models import _LoadSave as LoadSave
+
+    # 使用 handData_200_.npz 驗證融合預測器與 sklearn 路徑的結果完全相同
+    dir_path = os.path.dirname(os.path.abspath(__file__))
+    data = np.load(os.path.join(dir_path, "..", "ModelTraining", "Data", "DataSets", "handData_200_.npz"))
+    X = data['data'].reshape(len(data['data']), -1)
+
+    for name in ["KMeans_2", "RandomForest_100", "SVC_1"]:
+        model = LoadSave.load_model(name)
+        scaler = LoadSave.load_scaler(name)
+        if hasattr(model, "verbose"):
+            model.verbose = 0
+
+        predictor = compile_model(model, scaler)
+
+        # 比較所有資料的預測結果 (sklearn 路徑與即時迴圈相同: scaler.transform 後 model.predict)
+        sklearn_labels = np.concatenate([model.predict(scaler.transform([row])) for row in X])
+        fused_labels = np.concatenate([predictor.predict(row) for row in X])
+        identical = np.array_equal(sklearn_labels, fused_labels)
+
+        # 單筆呼叫延遲
+        sklearn_us = _time_per_call(lambda row: model.predict(scaler.transform([row])), X)
+        fused_us = _time_per_call(predictor.predict, X)
+
+        print(f"{name}: identical={identical} ({np.sum(sklearn_labels != fused_labels)} mismatches), "
+              f"sklearn {sklearn_us:.1f} us/call, fused {fused_us:.1f} us/call, "
+              f"speedup {sklearn_us / fused_us:.1f}x")
@@ -1,32 +1,122 @@
 import os
+import sys
+import json
+import time
+import hashlib
+import warnings
 import numpy as np
+from typing import Any, Iterator, Optional
 
-def load_dataset(info: int= 0) -> tuple[np.ndarray, np.ndarray]:
+# 資料集資料夾路徑
+DATASETS_PATH = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ModelTraining", "Data", "DataSets"))
+
+def list_datasets() -> list[dict]:
     """
-    載入資料集, 回傳資料集的特徵features與標籤labels (Features, Labels)
+    列出所有資料集
+
+    資料集名稱格式為 handData_{資料數量}_{版本}, 支援兩種儲存格式:
+    - npz: handData_{N}_{版本}.npz
+    - npy: handData_{N}_{版本}/ 資料夾, 內含 data.npy 與 labels.npy, 可使用 mmap_mode 零複製載入
+
+    Returns:
+        list[dict]: 每個資料集的 name (名稱), size (資料數量), version (版本), layout (儲存格式), path (路徑),
+                    依照資料數量與版本排序
+    """
+    datasets = []
+    for entry in os.listdir(DATASETS_PATH):
+        path = os.path.join(DATASETS_PATH, entry)
+        if entry.endswith('.npz') and os.path.isfile(path):
+            name, layout = entry[:-len('.npz')], "npz"
+        elif os.path.isfile(os.path.join(path, "data.npy")) and os.path.isfile(os.path.join(path, "labels.npy")):
+            name, layout = entry, "npy"
+        else:
+            continue
+
+        # 解析名稱中的資料數量與版本, 格式不符的檔案略過
+        parts = name.split('_')
+        if len(parts) < 3 or not parts[1].isdigit():
+            continue
+        datasets.append({"name": name, "size": int(parts[1]), "version": '_'.join(parts[2:]),
+                         "layout": layout, "path": path})
+
+    # 同名資料集優先使用 npy 格式 (可 mmap 載入)
+    datasets.sort(key=lambda d: (d["size"], d["version"], d["layout"] != "npy"))
+    return datasets
+
+def find_dataset(dataset: Optional[str] = None,
+                 size: Optional[int] = None,
+                 version: Optional[str] = None,
+                 layout: Optional[str] = None) -> dict:
+    """
+    依照名稱、資料數量或版本選擇資料集
 
     Args:
-        info (int, optional): 顯示資料集的資訊. 預設為0 - 顯示模式 0: 顯示載入完成, 1: 顯示資料集形狀, 2: 顯示資料集內容
+        dataset (str, optional): 資料集名稱 (例如 "handData_200_") 或資料數量字串 (例如 "200")
+        size (int, optional): 資料數量
+        version (str, optional): 版本
+        layout (str, optional): 儲存格式 "npz" 或 "npy"
+    Returns:
+        dict: 資料集資訊, 詳見 list_datasets
+    Notes:
+        - 沒有指定任何條件時, 如果在互動終端機中則讓使用者輸入資料數量選擇, 否則選擇資料數量最多、版本最新的資料集
+        - 有多個符合條件的資料集時, 選擇資料數量最多、版本最新的資料集
     """
+    datasets = list_datasets()
+    if not datasets:
+        raise FileNotFoundError(f"No dataset found in {DATASETS_PATH}")
 
-    # 獲取資料集路徑
-    dir_path = os.path.dirname(os.path.abspath(__file__))
-    data_path = os.path.join(dir_path, "..", "ModelTraining", "Data", "DataSets")
+    # 沒有指定條件時, 在互動終端機中讓使用者選擇資料集 (輸入選擇的的數字為資料集的資料數量)
+    if dataset is None and size is None and version is None and sys.stdin is not None and sys.stdin.isatty():
+        dataset = input(f"Choose a dataset to load: {sorted({d['name'] for d in datasets})}\n")
 
-    # 獲取資料夾內所有資料集 (.npz檔)
-    datasets = [dataset for dataset in os.listdir(data_path) if dataset.endswith('.npz')]
+    candidates = datasets
+    if dataset is not None:
+        dataset = os.path.splitext(os.path.basename(dataset))[0]
+        candidates = [d for d in candidates if d["name"] == dataset or str(d["size"]) == dataset]
+    if size is not None:
+        candidates = [d for d in candidates if d["size"] == size]
+    if version is not None:
+        candidates = [d for d in candidates if d["version"] == version]
+    if layout is not None:
+        candidates = [d for d in candidates if d["layout"] == layout]
 
-    # 顯示資料集名稱, 讓使用者選擇要載入的資料集
-    choose = input(f"Choose a dataset to load: {datasets}\n")
-    
-    # 利用使用者輸入的資料集名稱, 獲取資料集路徑 (輸入選擇的的數字為資料集的資料數量)
-    data_path = os.path.join(data_path, [dataset for dataset in datasets if dataset.split('_')[1] == choose][0])
-    print(f"Loading {data_path}...")
+    if not candidates:
+        raise FileNotFoundError(f"No dataset matches dataset={dataset}, size={size}, version={version}, layout={layout}")
+
+    # 資料數量最多、版本最新的資料集 (同名時優先使用 npy 格式)
+    best = max((d["size"], d["version"]) for d in candidates)
+    return [d for d in candidates if (d["size"], d["version"]) == best][0]
+
+def load_dataset(info: int= 0,
+                 dataset: Optional[str] = None,
+                 size: Optional[int] = None,
+                 version: Optional[str] = None,
+                 mmap_mode: Optional[str] = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    載入資料集, 回傳資料集的特徵features與標籤labels (Features, Labels)
+
+    Args:
+        info (int, optional): 顯示資料集的資訊. 預設為0 - 顯示模式 0: 顯示載入完成, 1: 顯示資料集形狀, 2: 顯示資料集內容
+        dataset (str, optional): 資料集名稱或資料數量字串, 詳見 find_dataset
+        size (int, optional): 資料數量
+        version (str, optional): 版本
+        mmap_mode (str, optional): 傳入 np.load 的 mmap_mode (例如 'r'), 只對 npy 格式有效, npz 格式會完整載入
+    Returns:
+        tuple: (X, y), 使用 mmap_mode 載入 npy 格式時為 np.memmap, 切片時才從硬碟讀取
+    """
+
+    # 選擇資料集, 沒有指定條件時會詢問使用者 (互動終端機) 或選擇最大的資料集
+    selected = find_dataset(dataset, size, version)
+    print(f"Loading {selected['path']}...")
 
     # 載入資料集, 並將資料集的特徵features與標籤labels分開
-    data = np.load(data_path)
-    X: np.ndarray = data['data']
-    y: np.ndarray = data['labels']
+    if selected["layout"] == "npy":
+        X: np.ndarray = np.load(os.path.join(selected["path"], "data.npy"), mmap_mode=mmap_mode)
+        y: np.ndarray = np.load(os.path.join(selected["path"], "labels.npy"), mmap_mode=mmap_mode)
+    else:
+        with np.load(selected["path"]) as data:
+            X = data['data']
+            y = data['labels']
 
     # 設定 info 參數, 顯示資料集的資訊
     if info >= 0:
@@ -38,6 +128,77 @@ def load_dataset(info: int= 0) -> tuple[np.ndarray, np.ndarray]:
 
     return X, y
 
+def iter_dataset(batch_size: int = 1024,
+                 dataset: Optional[str] = None,
+                 size: Optional[int] = None,
+                 version: Optional[str] = None,
+                 start: int = 0,
+                 stop: Optional[int] = None,
+                 export: bool = False) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """
+    分批讀取資料集, npy 格式不會一次將整個資料集載入記憶體
+
+    Args:
+        batch_size (int): 每批資料數量
+        dataset, size, version: 選擇資料集的條件, 詳見 find_dataset
+        start (int): 起始索引
+        stop (int, optional): 結束索引 (不包含), None 則讀到資料集結尾
+        export (bool): 選擇的資料集為 npz 格式時, 是否先以 export_dataset_npy 轉換為 npy 格式 (寫入 DataSets 資料夾), 預設為 False
+    Yields:
+        tuple: (X_batch, y_batch), 每批都是複製出來的一般陣列
+    Notes:
+        - npz 格式無法 mmap, export=False 時會發出警告並完整載入後分批, 不會寫入任何檔案
+    """
+    selected = find_dataset(dataset, size, version)
+    if selected["layout"] != "npy" and export:
+        selected = find_dataset(export_dataset_npy(selected["name"]), layout="npy")
+
+    if selected["layout"] == "npy":
+        X = np.load(os.path.join(selected["path"], "data.npy"), mmap_mode='r')
+        y = np.load(os.path.join(selected["path"], "labels.npy"), mmap_mode='r')
+    else:
+        warnings.warn(f"Dataset {selected['name']} is stored as npz and is loaded into memory; "
+                      "pass export=True or call export_dataset_npy to stream it with mmap.")
+        with np.load(selected["path"]) as data:
+            X, y = data['data'], data['labels']
+    stop = len(X) if stop is None else min(stop, len(X))
+
+    for begin in range(start, stop, batch_size):
+        end = min(begin + batch_size, stop)
+        yield np.array(X[begin:end]), np.array(y[begin:end])
+
+def save_dataset_npy(name: str, data: np.ndarray, labels: Any) -> str:
+    """
+    以 npy 資料夾格式儲存資料集, 之後可使用 mmap_mode 零複製載入
+
+    Args:
+        name (str): 資料集名稱, 例如 "handData_200_"
+        data (np.ndarray): 特徵資料
+        labels: 標籤
+    Returns:
+        str: 資料集資料夾路徑
+    """
+    path = os.path.join(DATASETS_PATH, name)
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "data.npy"), np.ascontiguousarray(data))
+    np.save(os.path.join(path, "labels.npy"), np.asarray(labels))
+    print(f"Storing dataset to {path}")
+    return path
+
+def export_dataset_npy(dataset: str) -> str:
+    """
+    將 npz 格式的資料集轉換為 npy 資料夾格式
+
+    Args:
+        dataset (str): 資料集名稱或資料數量字串
+    Returns:
+        str: 轉換後的資料集名稱
+    """
+    selected = find_dataset(dataset, layout="npz")
+    with np.load(selected["path"]) as data:
+        save_dataset_npy(selected["name"], data['data'], data['labels'])
+    return selected["name"]
+
 from joblib import dump, load
 
 def save_model(model, model_name: str) -> None:
@@ -104,6 +265,9 @@ def save_scaler(scaler, scaler_name: str) -> None:
 
     return
 
+# 已載入的標準化器快取, 鍵為路徑, 值為 (檔案修改時間, 標準化器)
+_scaler_cache: dict[str, tuple[float, StandardScaler]] = {}
+
 def load_scaler(scaler_name: str) -> StandardScaler:
     """
     載入標準化器, 將標準化器載入為 StandardScaler 物件
@@ -112,14 +276,201 @@ def load_scaler(scaler_name: str) -> StandardScaler:
         scaler_name (str): 標準化器名稱
     Returns:
         StandardScaler: 載入的標準化器
+    Notes:
+        - 檔案沒有修改時回傳快取的標準化器 (例如建立組合包與評估時各載入一次), 回傳的物件不應被修改
     """
 
     # 設定標準化器載入路徑, 路徑 .Models/{ScalerName}_Scaler.joblib
     dir_path = os.path.dirname(os.path.abspath(__file__))
     scaler_path = os.path.join(dir_path, scaler_name + "_Scaler.joblib")
 
+    # 檔案沒有修改時直接回傳快取
+    mtime = os.path.getmtime(scaler_path)
+    if scaler_path in _scaler_cache and _scaler_cache[scaler_path][0] == mtime:
+        return _scaler_cache[scaler_path][1]
+
     # 顯示載入路徑
     print(f"Loading scaler from {scaler_path}")
 
     # 使用設定路徑載入標準化器並回傳
-    return load(scaler_path)
\ No newline at end of file
+    scaler = load(scaler_path)
+    _scaler_cache[scaler_path] = (mtime, scaler)
+    return scaler
+
+
+# 模型組合包格式版本, 組合包內容結構改變時需要遞增
+BUNDLE_FORMAT_VERSION = 1
+
+# 已載入的模型組合包快取, 鍵為 (路徑, mmap_mode), 值為 (檔案修改時間, 組合包)
+_bundle_cache: dict[tuple[str, Optional[str]], tuple[float, dict]] = {}
+
+# 最近一次載入組合包的耗時紀錄, 供啟動時間報告使用
+load_timings: dict[str, float] = {}
+
+def normalization_hash() -> str:
+    """
+    獲取目前正規化流程設定的雜湊值, 用來檢查模型訓練時與目前使用的正規化流程是否一致
+    """
+    from ModelTraining.Data.DataProcessBase import NORMALIZATION_VERSION, config_hash
+
+    return config_hash({"normalization_version": NORMALIZATION_VERSION})
+
+def _file_sha256(path: str) -> str:
+    """計算檔案的 SHA-256 雜湊值"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def make_bundle(model,
+                scaler = None,
+                labels: Optional[list] = None,
+                metrics: Optional[dict] = None,
+                norm_hash: Optional[str] = None) -> dict:
+    """
+    建立模型組合包, 將模型、標準化器、類別標籤、正規化設定雜湊值與訓練指標放在一起
+
+    Args:
+        model (object): 模型 (可為 Pipeline)
+        scaler (StandardScaler, optional): 在模型之前套用的標準化器, 模型為已包含 StandardScaler 的 Pipeline 時應為 None
+        labels (list, optional): 模型輸出對應的類別標籤, None 則使用 model.classes_ 或群數
+        metrics (dict, optional): 訓練指標
+        norm_hash (str, optional): 正規化設定雜湊值, None 則使用目前的 normalization_hash()
+    Returns:
+        dict: 模型組合包
+    """
+
+    # 如果 Pipeline 已經包含 StandardScaler, 則外部標準化器會造成重複標準化
+    if scaler is not None and hasattr(model, "steps") and any(hasattr(step, "scale_") for _, step in model.steps[:-1]):
+        warnings.warn("Model pipeline already contains a scaler; the external scaler is applied twice.")
+
+    if labels is None:
+        estimator = model.steps[-1][1] if hasattr(model, "steps") else model
+        if hasattr(estimator, "classes_"):
+            labels = estimator.classes_.tolist()
+        elif hasattr(estimator, "n_clusters"):
+            labels = list(range(estimator.n_clusters))
+
+    return {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "model": model,
+        "scaler": scaler,
+        "labels": labels,
+        "normalization_hash": norm_hash if norm_hash is not None else normalization_hash(),
+        "metrics": metrics or {},
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def save_bundle(bundle: dict, bundle_name: str) -> None:
+    """
+    儲存模型組合包, 組合包儲存為單一 .joblib 檔案, 並另外儲存一個 .json 說明檔 (包含檔案雜湊值)
+
+    Args:
+        bundle (dict): 由 make_bundle 建立的模型組合包
+        bundle_name (str): 組合包名稱
+    """
+
+    # 設定組合包儲存路徑, 路徑 .Models/{BundleName}_Bundle.joblib
+    dir_path = os.path.dirname(os.path.abspath(__file__))
+    bundle_path = os.path.join(dir_path, bundle_name + "_Bundle.joblib")
+
+    # 不壓縮儲存, 讓大型模型 (例如隨機森林) 可以使用 mmap_mode 載入
+    dump(bundle, bundle_path)
+
+    # 儲存說明檔, 包含完整性檢查用的檔案雜湊值
+    manifest = {key: value for key, value in bundle.items() if key not in ("model", "scaler")}
+    manifest["sha256"] = _file_sha256(bundle_path)
+    with open(os.path.join(dir_path, bundle_name + "_Bundle.json"), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=2, default=str)
+
+    # 顯示儲存路徑
+    print(f"Storing bundle to {bundle_path}")
+
+def load_bundle(bundle_name: str, mmap_mode: Optional[str] = None, verify: bool = True) -> dict:
+    """
+    載入模型組合包, 同一個行程中重複載入時直接回傳快取
+
+    Args:
+        bundle_name (str): 組合包名稱
+        mmap_mode (str, optional): 傳入 joblib.load 的 mmap_mode (例如 'r'), 讓大型模型的陣列以 mmap 載入
+        verify (bool): 是否以說明檔中的雜湊值檢查檔案完整性 (只在第一次載入時檢查)
+    Returns:
+        dict: 模型組合包, 詳見 make_bundle
+    Notes:
+        - 如果組合包不存在, 則由舊格式的 {name}_Model / {name}_Scaler 建立 (不會寫入檔案)
+        - 組合包的正規化設定雜湊值與目前不一致時會發出警告
+        - 每次載入的耗時記錄在 load_timings 中
+    """
+    start = time.perf_counter()
+
+    dir_path = os.path.dirname(os.path.abspath(__file__))
+    bundle_path = os.path.join(dir_path, bundle_name + "_Bundle.joblib")
+
+    # 組合包不存在時, 由舊格式的模型與標準化器建立
+    if not os.path.exists(bundle_path):
+        cache_key = (os.path.join(dir_path, bundle_name + "_Model.joblib"), mmap_mode)
+        mtime = os.path.getmtime(cache_key[0])
+        if cache_key in _bundle_cache and _bundle_cache[cache_key][0] == mtime:
+            load_timings[bundle_name] = time.perf_counter() - start
+            return _bundle_cache[cache_key][1]
+
+        bundle = bundle_from_legacy(bundle_name)
+        _bundle_cache[cache_key] = (mtime, bundle)
+        load_timings[bundle_name] = time.perf_counter() - start
+        return bundle
+
+    # 檔案沒有修改時直接回傳快取
+    cache_key = (bundle_path, mmap_mode)
+    mtime = os.path.getmtime(bundle_path)
+    if cache_key in _bundle_cache and _bundle_cache[cache_key][0] == mtime:
+        load_timings[bundle_name] = time.perf_counter() - start
+        return _bundle_cache[cache_key][1]
+
+    # 以說明檔中的雜湊值檢查檔案完整性
+    manifest_path = os.path.join(dir_path, bundle_name + "_Bundle.json")
+    if verify and os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as file:
+            expected = json.load(file).get("sha256")
+        if expected is not None and _file_sha256(bundle_path) != expected:
+            raise ValueError(f"Bundle {bundle_path} does not match its manifest checksum")
+
+    # 顯示載入路徑
+    print(f"Loading bundle from {bundle_path}")
+    bundle = load(bundle_path, mmap_mode=mmap_mode)
+
+    if bundle.get("format_version") != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported bundle format version: {bundle.get('format_version')}")
+    if bundle.get("normalization_hash") != normalization_hash():
+        warnings.warn(f"Bundle {bundle_name} was trained with a different normalization config.")
+
+    _bundle_cache[cache_key] = (mtime, bundle)
+    load_timings[bundle_name] = time.perf_counter() - start
+    return bundle
+
+def bundle_from_legacy(name: str) -> dict:
+    """
+    由舊格式的 {name}_Model.joblib / {name}_Scaler.joblib 建立模型組合包
+
+    Args:
+        name (str): 模型名稱
+    Returns:
+        dict: 模型組合包
+    Notes:
+        - 如果模型為已包含 StandardScaler 的 Pipeline (例如 SVC), 則不使用外部標準化器, 避免重複標準化
+    """
+    model = load_model(name)
+    scaler = load_scaler(name)
+
+    if hasattr(model, "steps") and any(hasattr(step, "scale_") for _, step in model.steps[:-1]):
+        scaler = None
+
+    return make_bundle(model, scaler, metrics={"source": "legacy"})
+
+if __name__ == "__main__":
+    # 將 Models 資料夾中所有舊格式的模型轉換為組合包, 例如: python -m Models._LoadSave
+    dir_path = os.path.dirname(os.path.abspath(__file__))
+    for file_name in sorted(os.listdir(dir_path)):
+        if file_name.endswith("_Model.joblib"):
+            name = file_name[:-len("_Model.joblib")]
+            save_bundle(bundle_from_legacy(name), name)
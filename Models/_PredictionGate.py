@@ -0,0 +1,183 @@
+"""
+動作閘門預測
+
+手勢維持不動時 (例如持續保持畫筆或橡皮擦手勢), 正規化後的關鍵點幾乎不會改變,
+此時重新執行 scaler.transform + model.predict 只會得到相同的結果
+
+PredictionGate 放在預測器前面, 將新的 63 維正規化座標與上一次實際預測時的座標比較,
+距離小於門檻且快取結果尚未超過最大存活時間 (秒數與幀數) 時直接回傳上一次的標籤
+"""
+
+import time
+import numpy as np
+from typing import Any, Optional, Sequence
+
+class PredictionGate:
+    """
+    以手部動作距離決定是否重新預測的快取閘門
+
+    Attributes:
+        predictor: 具有 predict(X) 方法的預測器 (sklearn 模型或融合預測器)
+        threshold (float): 與上一次預測座標的歐氏距離門檻, 小於門檻視為手勢沒有改變
+        max_age (float): 快取標籤的最大存活秒數, 超過後一定重新預測
+        max_frames (int, optional): 快取標籤最多連續重複使用的幀數, None 則不限制
+        hits (int): 回傳快取標籤的次數
+        misses (int): 實際執行預測的次數
+    Notes:
+        - 比較對象是上一次「實際預測」時的座標, 而不是上一幀的座標, 緩慢的累積移動最終仍會觸發重新預測
+        - 手離開畫面時應呼叫 reset(), 避免手重新出現時沿用舊的標籤
+    """
+
+    def __init__(self,
+                 predictor: Any,
+                 threshold: float = 0.05,
+                 max_age: float = 0.2,
+                 max_frames: Optional[int] = None):
+        """
+        Args:
+            predictor: 具有 predict(X) 方法的預測器
+            threshold (float): 歐氏距離門檻, 0 則停用快取, 預設為 0.05
+            max_age (float): 快取標籤的最大存活秒數, 預設為 0.2 秒
+            max_frames (int, optional): 快取標籤最多連續重複使用的幀數, 預設不限制
+        """
+        self.predictor = predictor
+        self.threshold = threshold
+        self.max_age = max_age
+        self.max_frames = max_frames
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.reset()
+
+    def reset(self) -> None:
+        """清除快取的座標與標籤 (不清除統計)"""
+        self._coords: Optional[np.ndarray] = None
+        self._prediction: Optional[np.ndarray] = None
+        self._time = 0.0
+        self._reused = 0
+
+        # 多手模式 (predict_batch) 每個追蹤編號的快取: 追蹤編號 -> [座標, 標籤, 時間, 重複使用次數]
+        self._tracks: dict = {}
+
+    def predict(self, coords: np.ndarray, now: Optional[float] = None) -> np.ndarray:
+        """
+        預測單筆座標的標籤, 手勢沒有改變時回傳快取的標籤
+
+        Args:
+            coords (np.ndarray): 正規化後的座標, 形狀為 (63,)
+            now (float, optional): 目前時間 (time.perf_counter 秒數), 例如畫面擷取時間, 預設為目前時間
+        Returns:
+            np.ndarray: 預測標籤, 形狀為 (1,), 與 predictor.predict 相同
+        """
+        now = time.perf_counter() if now is None else now
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1)
+
+        if self._prediction is not None:
+            fresh = now - self._time <= self.max_age and (self.max_frames is None or self._reused < self.max_frames)
+            if fresh and np.linalg.norm(coords - self._coords) < self.threshold:
+                self.hits += 1
+                self._reused += 1
+                return self._prediction
+            if not fresh:
+                self.expired += 1
+
+        # 手勢改變或快取過期, 重新預測並記錄這次的座標與時間
+        self.misses += 1
+        self._prediction = self.predictor.predict(coords)
+        self._coords = coords.copy()
+        self._time = now
+        self._reused = 0
+        return self._prediction
+
+    def predict_batch(self, coords: np.ndarray, keys: Sequence[Any], now: Optional[float] = None) -> np.ndarray:
+        """
+        預測多隻手的標籤, 每隻手以追蹤編號各自快取, 手勢改變或過期的手合併為一次 predict 呼叫
+
+        Args:
+            coords (np.ndarray): 正規化後的座標, 形狀為 (N, 63)
+            keys (Sequence): 每隻手的追蹤編號 (例如 Hand.track_id)
+            now (float, optional): 目前時間, 預設為目前時間
+        Returns:
+            np.ndarray: 預測標籤, 形狀為 (N,)
+        Notes:
+            - 這一次沒有出現的追蹤編號會清除快取, 手重新出現時一定重新預測
+            - 與 predict 的單手快取互相獨立
+        """
+        now = time.perf_counter() if now is None else now
+        coords = np.asarray(coords, dtype=np.float64).reshape(len(keys), -1)
+        self._tracks = {key: self._tracks[key] for key in keys if key in self._tracks}
+
+        # 找出需要重新預測的手
+        stale = []
+        for i, key in enumerate(keys):
+            cached = self._tracks.get(key)
+            if cached is not None:
+                fresh = now - cached[2] <= self.max_age and (self.max_frames is None or cached[3] < self.max_frames)
+                if fresh and np.linalg.norm(coords[i] - cached[0]) < self.threshold:
+                    self.hits += 1
+                    cached[3] += 1
+                    continue
+                if not fresh:
+                    self.expired += 1
+            stale.append(i)
+
+        # 所有需要重新預測的手以一次批次預測處理
+        if stale:
+            self.misses += len(stale)
+            predictions = self.predictor.predict(coords[stale])
+            for i, prediction in zip(stale, predictions):
+                self._tracks[keys[i]] = [coords[i].copy(), prediction, now, 0]
+
+        return np.array([self._tracks[key][1] for key in keys])
+
+    def age(self, now: Optional[float] = None) -> float:
+        """
+        獲取快取標籤的存活秒數, 沒有快取時回傳 0
+        """
+        if self._prediction is None:
+            return 0.0
+        return (time.perf_counter() if now is None else now) - self._time
+
+    def stats(self) -> dict:
+        """
+        獲取閘門統計資訊
+
+        Returns:
+            dict: hits, misses, hit_rate, expired (因超過存活時間而重新預測的次數)
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "expired": self.expired,
+        }
+
+if __name__ == "__main__":
+    import sys
+    from Models import _LoadSave as LoadSave
+    from Models import _FusedInference as FusedInference
+    from ModelTraining.Data.FrameSource import SyntheticLandmarkSource
+    from ModelTraining.Data.DataProcessBase import DataProcessBase
+
+    # 以合成手部關鍵點 (30 FPS) 驗證: 快取標籤的存活時間不超過 max_age, 並比較與每幀預測的結果
+    bundle = LoadSave.load_bundle(sys.argv[1] if len(sys.argv) > 1 else "KMeans_2")
+    predictor = FusedInference.compile_model(bundle["model"], bundle["scaler"])
+    gate = PredictionGate(predictor)
+    source = SyntheticLandmarkSource(n_frames=3000)
+
+    agree, max_age = 0, 0.0
+    for i in range(source.n_frames):
+        frame = source.read()
+        coords = DataProcessBase.Normalize_Landmark_Batch(frame.landmarks[np.newaxis])[0].reshape(-1)
+
+        # 以合成時間 (而非實際經過的時間) 模擬 30 FPS 的即時迴圈
+        now = i / source.fps
+        label = gate.predict(coords, now= now)
+        max_age = max(max_age, gate.age(now))
+        agree += int(label[0] == predictor.predict(coords)[0])
+
+    assert max_age <= gate.max_age, f"Stale label served for {max_age:.3f}s"
+    print(f"Gate stats: {gate.stats()}, max label age {max_age:.3f}s (limit {gate.max_age}s), "
+          f"agreement with per-frame prediction {agree / source.n_frames:.2%}")